@@ -0,0 +1,157 @@
+import sys
+import time
+
+# =========================================================
+# 📊 Agregat inventaris per owner (materialized view PostgreSQL)
+# =========================================================
+# Semua query export menjumlah equipment_inventories per (owner, equipment). Materialized view
+# ini menyimpan jumlah tersebut sekali; query export tetap sama (SUM/GROUP BY atas baris yang
+# sudah dijumlah), hanya sumber tabelnya yang diganti lewat inventory_source(engine).
+# Isi view = kondisi saat REFRESH terakhir: jalankan exporter dengan --refresh-aggregates
+# (atau `python aggregates.py refresh`) setelah data inventaris berubah. View hanya dipakai jika
+# MAX(updated_at)-nya tidak tertinggal dari tabel mentah (dicek ulang setiap SOURCE_TTL detik);
+# baris yang dihapus tidak terdeteksi, jadi snapshot riwayat/diff selalu membaca tabel mentah.
+RAW_INVENTORY_TABLE = "equipment_inventories"
+AGGREGATE_VIEW = "equipment_inventory_totals"
+SOURCE_TTL = 60
+
+CREATE_SQL = [
+    f"""
+    CREATE MATERIALIZED VIEW IF NOT EXISTS {AGGREGATE_VIEW} AS
+    SELECT owner_type, owner_id, equipment_id,
+           SUM(baik)::integer AS baik,
+           SUM(rusak_ringan)::integer AS rusak_ringan,
+           SUM(rusak_berat)::integer AS rusak_berat,
+           MAX(updated_at) AS updated_at
+    FROM {RAW_INVENTORY_TABLE}
+    GROUP BY owner_type, owner_id, equipment_id
+    """,
+    # Unique index wajib untuk REFRESH ... CONCURRENTLY, sekaligus index lookup per owner
+    f"CREATE UNIQUE INDEX IF NOT EXISTS {AGGREGATE_VIEW}_owner_equipment ON {AGGREGATE_VIEW} (owner_type, owner_id, equipment_id)",
+    f"CREATE INDEX IF NOT EXISTS {AGGREGATE_VIEW}_equipment ON {AGGREGATE_VIEW} (equipment_id)",
+    # MAX(updated_at) view vs tabel mentah lewat index (cek kesegaran tanpa scan tabel)
+    f"CREATE INDEX IF NOT EXISTS {AGGREGATE_VIEW}_updated_at ON {AGGREGATE_VIEW} (updated_at)",
+    f"CREATE INDEX IF NOT EXISTS {RAW_INVENTORY_TABLE}_updated_at ON {RAW_INVENTORY_TABLE} (updated_at)",
+    f"ANALYZE {AGGREGATE_VIEW}",
+]
+
+# Sumber inventaris per database (url engine): (nama tabel, waktu cek), dicek ulang setelah SOURCE_TTL
+_sources = {}
+
+def _execute(engine, statements):
+    """Jalankan DDL di luar transaksi (REFRESH CONCURRENTLY tidak boleh di dalam blok transaksi)"""
+    from sqlalchemy import text
+
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for statement in statements:
+            conn.execute(text(statement))
+
+def aggregate_status(engine):
+    """None (tidak ada / bukan PostgreSQL), False (dibuat WITH NO DATA), True (siap dipakai)"""
+    if engine.dialect.name != "postgresql":
+        return None
+    from sqlalchemy import text
+
+    with engine.connect() as conn:
+        return conn.execute(
+            text("SELECT ispopulated FROM pg_matviews WHERE matviewname = :name"), {"name": AGGREGATE_VIEW}
+        ).scalar()
+
+def aggregate_lag(engine):
+    """(updated_at terakhir di view, di tabel mentah); view tertinggal jika yang kedua lebih baru"""
+    from sqlalchemy import text
+
+    with engine.connect() as conn:
+        row = conn.execute(text(f"""
+            SELECT (SELECT MAX(updated_at) FROM {AGGREGATE_VIEW}),
+                   (SELECT MAX(updated_at) FROM {RAW_INVENTORY_TABLE})
+        """)).one()
+    return row[0], row[1]
+
+def aggregate_fresh(engine):
+    """True jika view terisi dan tidak tertinggal dari perubahan inventaris terakhir"""
+    from sqlalchemy.exc import DBAPIError
+
+    if not aggregate_status(engine):
+        return False
+    try:
+        view_updated_at, raw_updated_at = aggregate_lag(engine)
+    except DBAPIError:
+        print(f"⚠️ {AGGREGATE_VIEW} dibuat versi lama (tanpa kolom updated_at), buat ulang: python aggregates.py drop && python aggregates.py create")
+        return False
+    if raw_updated_at is not None and (view_updated_at is None or raw_updated_at > view_updated_at):
+        print(f"⚠️ {AGGREGATE_VIEW} tertinggal (isi per {view_updated_at}, perubahan terakhir {raw_updated_at}), "
+              f"query memakai {RAW_INVENTORY_TABLE}; jalankan dengan --refresh-aggregates")
+        return False
+    return True
+
+def inventory_source(engine):
+    """Nama tabel untuk query inventaris: materialized view jika terisi & tidak tertinggal, selain itu tabel mentah"""
+    # Connection (mis. snapshot baca) → engine-nya; status view dicek di koneksi terpisah
+    engine = getattr(engine, "engine", engine)
+    key = str(engine.url)
+    cached = _sources.get(key)
+    now = time.monotonic()
+    if cached is None or now - cached[1] > SOURCE_TTL:
+        _sources[key] = cached = (AGGREGATE_VIEW if aggregate_fresh(engine) else RAW_INVENTORY_TABLE, now)
+    return cached[0]
+
+def create_aggregates(engine):
+    _execute(engine, CREATE_SQL)
+    _sources.pop(str(engine.url), None)
+
+def refresh_aggregates(engine, concurrently=True):
+    """Refresh view; CONCURRENTLY agar export yang sedang berjalan tetap bisa membaca. False jika view belum ada"""
+    status = aggregate_status(engine)
+    if status is None:
+        return False
+    # View WITH NO DATA tidak bisa di-refresh CONCURRENTLY
+    mode = "CONCURRENTLY " if concurrently and status else ""
+    _execute(engine, [f"REFRESH MATERIALIZED VIEW {mode}{AGGREGATE_VIEW}", f"ANALYZE {AGGREGATE_VIEW}"])
+    _sources.pop(str(engine.url), None)
+    return True
+
+def drop_aggregates(engine):
+    _execute(engine, [f"DROP MATERIALIZED VIEW IF EXISTS {AGGREGATE_VIEW}"])
+    _sources.pop(str(engine.url), None)
+
+def refresh_for_export(engine):
+    """Untuk --refresh-aggregates di script export: refresh lalu laporkan sumber yang dipakai"""
+    start = time.perf_counter()
+    if refresh_aggregates(engine):
+        print(f"📊 Agregat {AGGREGATE_VIEW} di-refresh ({time.perf_counter() - start:.1f}s)")
+    else:
+        print(f"⚠️ Agregat {AGGREGATE_VIEW} belum dibuat (python aggregates.py create), query memakai {RAW_INVENTORY_TABLE}")
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description=f'Kelola materialized view {AGGREGATE_VIEW} (agregat inventaris per owner)')
+    parser.add_argument('command', choices=['create', 'refresh', 'drop', 'status'])
+    parser.add_argument('--blocking', action='store_true', help='Refresh tanpa CONCURRENTLY (lebih cepat, tapi export yang membaca view menunggu)')
+    args = parser.parse_args()
+
+    from export_core import create_db_engine
+
+    engine = create_db_engine()
+    if engine.dialect.name != "postgresql":
+        print(f"❌ Materialized view hanya didukung PostgreSQL (dialect: {engine.dialect.name})")
+        sys.exit(1)
+
+    start = time.perf_counter()
+    if args.command == "create":
+        create_aggregates(engine)
+        print(f"✅ {AGGREGATE_VIEW} dibuat + index ({time.perf_counter() - start:.1f}s)")
+    elif args.command == "refresh":
+        if not refresh_aggregates(engine, concurrently=not args.blocking):
+            print(f"❌ {AGGREGATE_VIEW} belum ada, jalankan 'create' dulu")
+            sys.exit(1)
+        print(f"✅ {AGGREGATE_VIEW} di-refresh ({time.perf_counter() - start:.1f}s)")
+    elif args.command == "drop":
+        drop_aggregates(engine)
+        print(f"🗑️ {AGGREGATE_VIEW} dihapus, export kembali membaca {RAW_INVENTORY_TABLE}")
+    else:
+        status = aggregate_status(engine)
+        if status and not aggregate_fresh(engine):
+            sys.exit(1)
+        print({None: "❌ belum dibuat", False: "⚠️ dibuat tanpa data (jalankan refresh)", True: "✅ siap dipakai exporter"}[status])
@@ -0,0 +1,113 @@
+import os
+import json
+import threading
+
+from output_manager import OutputManager, atomic_write
+
+# =========================================================
+# 💾 Checkpoint journal
+# =========================================================
+# Append-only (JSON Lines): baris pertama {"mode": ...}, lalu satu baris {"unit": ..., "file": ...}
+# per unit selesai. mark_done hanya menambah satu baris (+ fsync), bukan menulis ulang seluruh
+# journal; file dipadatkan (atomik) saat dibuka dan saat close() di akhir run.
+JOURNAL_FILENAME = ".export_checkpoint.jsonl"
+# Format lama (satu JSON utuh), masih dibaca untuk --resume lalu diganti
+LEGACY_JOURNAL_FILENAME = ".export_checkpoint.json"
+
+def _read_journal(path):
+    """(mode, completed) dari journal JSON Lines; baris terakhir yang terpotong (crash) diabaikan"""
+    mode, completed = None, {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                break
+            if "unit" in entry:
+                completed[entry["unit"]] = entry["file"]
+            else:
+                mode = entry.get("mode")
+    return mode, completed
+
+def _read_legacy_journal(path):
+    with open(path, encoding="utf-8") as f:
+        journal = json.load(f)
+    return journal.get("mode"), journal.get("completed", {})
+
+class CheckpointJournal:
+    """Mencatat unit export yang sudah selesai agar run berikutnya bisa --resume"""
+
+    def __init__(self, output_dir, mode, resume=False, output=None):
+        self.path = os.path.join(output_dir, JOURNAL_FILENAME)
+        self.mode = mode
+        self.output = output or OutputManager(output_dir)
+        self.completed = {}
+        self._lock = threading.Lock()
+        self._file = None
+
+        legacy_path = os.path.join(output_dir, LEGACY_JOURNAL_FILENAME)
+        if resume and (os.path.exists(self.path) or os.path.exists(legacy_path)):
+            if os.path.exists(self.path):
+                journal_mode, completed = _read_journal(self.path)
+            else:
+                journal_mode, completed = _read_legacy_journal(legacy_path)
+            if journal_mode == mode:
+                self.completed = completed
+                print(f"♻️ Resume: {len(self.completed)} unit sudah selesai sebelumnya")
+            else:
+                print("⚠️ Mode export berbeda dengan checkpoint sebelumnya, mulai dari awal")
+        self._compact()
+        if os.path.exists(legacy_path):
+            os.remove(legacy_path)
+        self._file = open(self.path, "a", encoding="utf-8")
+
+    @staticmethod
+    def _line(entry):
+        return json.dumps(entry, ensure_ascii=False) + "\n"
+
+    def _compact(self):
+        """Tulis ulang journal secara atomik: mode + satu baris per unit selesai"""
+        def _write(tmp_path):
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(self._line({"mode": self.mode}))
+                for unit_key, filename in self.completed.items():
+                    f.write(self._line({"unit": unit_key, "file": filename}))
+
+        atomic_write(self.path, _write, suffix=".jsonl", fsync=self.output.fsync)
+
+    def is_done(self, unit_key):
+        if unit_key not in self.completed:
+            return False
+        filename = self.completed[unit_key]
+        return filename is None or os.path.exists(filename)
+
+    def mark_done(self, unit_key, filename=None):
+        """Tandai unit selesai (filename None untuk unit tanpa output, mis. tanpa data)"""
+        with self._lock:
+            self.completed[unit_key] = filename
+            self._file.write(self._line({"unit": unit_key, "file": filename}))
+            self._file.flush()
+            if self.output.fsync:
+                os.fsync(self._file.fileno())
+        if self.output.progress is not None:
+            self.output.progress.unit_done(unit_key)
+
+    def save(self, wb, unit_key, filename):
+        """Simpan workbook secara atomik lewat output manager lalu tandai unit selesai di journal"""
+        self.output.save_workbook(wb, filename)
+        self.mark_done(unit_key, filename)
+
+    def close(self):
+        """Akhir run: tutup file journal lalu padatkan (unit yang ditandai ulang jadi satu baris)"""
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.close()
+            self._file = None
+            self._compact()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
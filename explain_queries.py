@@ -0,0 +1,267 @@
+import re
+import sys
+import json
+import argparse
+
+# =========================================================
+# 🎯 Parse Command Line Arguments
+# =========================================================
+parser = argparse.ArgumentParser(description='EXPLAIN (ANALYZE, BUFFERS) untuk setiap template query export + saran index')
+parser.add_argument('--polda-id', type=int, help='POLDA contoh (default: POLDA dengan jajaran POLRES/Polsek terbanyak)')
+parser.add_argument('--polres-id', type=int, help='POLRES contoh (default: POLRES dengan Polsek terbanyak di POLDA contoh)')
+parser.add_argument('--satker-id', type=int, help='Satker Mabes contoh (default: satker dengan turunan terbanyak)')
+parser.add_argument('--no-analyze', action='store_true', help='EXPLAIN tanpa ANALYZE (query tidak dijalankan, hanya estimasi planner)')
+parser.add_argument('--skip-snapshot', action='store_true', help='Lewati query snapshot (agregat seluruh inventaris)')
+parser.add_argument('--misestimate', type=float, default=10.0, help='Tandai node jika baris aktual/estimasi berbeda lebih dari faktor ini')
+parser.add_argument('--json', help='Simpan plan lengkap (JSON) per template ke file ini')
+parser.add_argument('--compare-polres-polsek', type=int, metavar='N', nargs='?', const=5, help='Bandingkan query POLRES+Polsek UNION ALL vs bentuk lama (LEFT JOIN + OR), median N kali EXPLAIN ANALYZE')
+args = parser.parse_args()
+
+from sqlalchemy import event
+
+from aggregates import AGGREGATE_VIEW, RAW_INVENTORY_TABLE, inventory_source
+from export_core import (
+    POLRES_POLSEK_QUERIES, ExportData, create_db_engine, get_all_children_recursive, polres_polsek_sql,
+    add_polres_sheet, build_polda_workbook, build_polsek_workbook, build_satker_workbook,
+)
+from snapshot import InventorySnapshot
+
+engine = create_db_engine()
+if engine.dialect.name != "postgresql":
+    print(f"❌ EXPLAIN (ANALYZE, BUFFERS) hanya untuk PostgreSQL (dialect: {engine.dialect.name})")
+    sys.exit(1)
+
+# Tabel besar: Seq Scan di sini hampir selalu berarti index tidak terpakai
+INVENTORY_TABLES = (RAW_INVENTORY_TABLE, AGGREGATE_VIEW)
+
+# Index yang diharapkan workload export: (tabel, kolom awal yang harus tercakup, kolom index yang disarankan)
+RECOMMENDED_INDEXES = [
+    (RAW_INVENTORY_TABLE, ("owner_type", "owner_id"), ("owner_type", "owner_id", "equipment_id")),
+    ("polres", ("polda_id",), ("polda_id",)),
+    ("polsek", ("polres_id",), ("polres_id",)),
+    ("subsatker_poldas", ("polda_id",), ("polda_id",)),
+    ("satker_mabes", ("parent_id",), ("parent_id",)),
+]
+
+# =========================================================
+# 1️⃣ Rekam query yang benar-benar dikirim builder export
+# =========================================================
+class QueryCapture:
+    """Listener before_cursor_execute: kumpulkan SQL per template (angka id → ?) beserta label langkah export"""
+
+    def __init__(self, engine):
+        self.label = None
+        self.templates = {}
+        event.listen(engine, "before_cursor_execute", self._capture)
+
+    @staticmethod
+    def template(statement):
+        return re.sub(r"\b\d+\b", "?", " ".join(statement.split()))
+
+    def _capture(self, conn, cursor, statement, parameters, context, executemany):
+        # Query katalog sistem (pg_matviews, dst.) memakai parameter; query export berupa SQL jadi
+        if self.label is None or parameters:
+            return
+        key = self.template(statement)
+        if key not in self.templates:
+            self.templates[key] = {"label": self.label, "statement": statement, "calls": 0}
+        self.templates[key]["calls"] += 1
+
+def representative_ids(data):
+    """POLDA/POLRES/satker terbesar sebagai contoh (jumlah jajaran / turunan)"""
+    polda_id = args.polda_id
+    if polda_id is None:
+        polda_id = int(data.read_sql("""
+            SELECT p.id, COUNT(ps.id) + COUNT(DISTINCT pr.id) AS n_units
+            FROM polda p
+            LEFT JOIN polres pr ON pr.polda_id = p.id
+            LEFT JOIN polsek ps ON ps.polres_id = pr.id
+            GROUP BY p.id ORDER BY n_units DESC, p.id LIMIT 1;
+        """)["id"].iloc[0])
+    polres_id = args.polres_id
+    if polres_id is None:
+        df = data.read_sql(f"""
+            SELECT pr.id, COUNT(ps.id) AS n_units
+            FROM polres pr LEFT JOIN polsek ps ON ps.polres_id = pr.id
+            WHERE pr.polda_id = {polda_id}
+            GROUP BY pr.id ORDER BY n_units DESC, pr.id LIMIT 1;
+        """)
+        polres_id = None if df.empty else int(df["id"].iloc[0])
+    return polda_id, polres_id
+
+def capture_export_queries(data, capture):
+    """Jalankan builder export untuk unit contoh (hasil dibuang) sambil merekam query-nya"""
+    polda_id, polres_id = representative_ids(data)
+    names = data.name_table()
+    print(f"🎯 Contoh: POLDA {polda_id}, POLRES {polres_id}")
+
+    capture.label = "hierarki"
+    poldas = data.poldas()
+    polda_name = poldas.loc[poldas["id"] == polda_id, "name"].iloc[0]
+    polres_list = data.polres_list(polda_id)
+    if polres_id is not None:
+        polres_list = polres_list[polres_list["polres_id"] == polres_id]
+
+    capture.label = "rollup POLDA"
+    rollup = data.polda_rollup(polda_id)
+    capture.label = "sheet POLDA + POLRES (unit)"
+    build_polda_workbook(data, polda_id, polda_name, polres_layout="unit", polres_list=polres_list, rollup=rollup, names=names)
+    if polres_id is not None:
+        polres_name = names.full_names["polres"].get(polres_id, str(polres_id))
+        capture.label = "sheet POLRES + Polsek"
+        add_polres_sheet(data.new_workbook(), data, polres_id, polres_name, "polsek", rollup=rollup, names=names)
+        capture.label = "file Jajaran Polsek"
+        build_polsek_workbook(data, data.polsek_list(polres_id), names=names)
+
+    capture.label = "pohon satker"
+    df_all_satkers = data.satker_tree()
+    if not df_all_satkers.empty:
+        satker_id = args.satker_id
+        if satker_id is None:
+            sizes = {int(i): len(get_all_children_recursive(i, df_all_satkers)) for i in df_all_satkers["id"]}
+            satker_id = max(sizes, key=lambda i: (sizes[i], -i))
+        print(f"🎯 Contoh: Satker {satker_id}")
+        capture.label = "rollup satker"
+        satker_rollup = data.satker_rollup(df_all_satkers)
+        capture.label = "file satker (kolom)"
+        satker = df_all_satkers[df_all_satkers["id"] == satker_id].iloc[0]
+        build_satker_workbook(data, satker, df_all_satkers, "columns", rollup=satker_rollup, names=names)
+
+    if not args.skip_snapshot:
+        capture.label = "snapshot"
+        InventorySnapshot.from_db(engine)
+    capture.label = None
+    return polres_id
+
+# =========================================================
+# 2️⃣ EXPLAIN + ringkasan node plan
+# =========================================================
+def explain(conn, statement):
+    options = "FORMAT JSON" if args.no_analyze else "ANALYZE, BUFFERS, FORMAT JSON"
+    result = conn.exec_driver_sql(f"EXPLAIN ({options}) {statement.strip().rstrip(';')}").scalar()
+    plan = json.loads(result) if isinstance(result, str) else result
+    return plan[0]
+
+def plan_nodes(node, depth=0):
+    yield depth, node
+    for child in node.get("Plans", []):
+        yield from plan_nodes(child, depth + 1)
+
+def node_flags(node):
+    flags = []
+    relation = node.get("Relation Name")
+    if node["Node Type"] == "Seq Scan":
+        removed = node.get("Rows Removed by Filter", 0)
+        if relation in INVENTORY_TABLES:
+            flags.append("seq scan tabel inventaris")
+        elif removed > 1000:
+            flags.append(f"seq scan, {removed:,} baris dibuang filter")
+    if "Actual Rows" in node:
+        estimated = max(node["Plan Rows"], 1)
+        actual = max(node["Actual Rows"], 1)
+        factor = max(actual / estimated, estimated / actual)
+        if factor >= args.misestimate:
+            flags.append(f"estimasi meleset ×{factor:.0f}")
+    return flags
+
+def describe_node(node):
+    text = node["Node Type"]
+    if node.get("Relation Name"):
+        text += f" on {node['Relation Name']}"
+    if node.get("Index Name"):
+        text += f" using {node['Index Name']}"
+    rows = f"est {node['Plan Rows']:,}"
+    if "Actual Rows" in node:
+        loops = node.get("Actual Loops", 1)
+        rows += f" / aktual {node['Actual Rows'] * loops:,} baris, {node['Actual Total Time'] * loops:.1f} ms"
+    return f"{text} ({rows})"
+
+def summarize(entry, plan):
+    root = plan["Plan"]
+    timing = f"planning {plan['Planning Time']:.1f} ms, eksekusi {plan['Execution Time']:.1f} ms" if "Execution Time" in plan else f"cost {root['Total Cost']:,.0f}"
+    buffers = ""
+    if "Shared Hit Blocks" in root:
+        buffers = f", buffer hit {root['Shared Hit Blocks']:,} / read {root['Shared Read Blocks']:,}"
+    print(f"\n🔎 [{entry['label']}] ×{entry['calls']} — {timing}{buffers}")
+    print(f"   {entry['template'][:160]}{'…' if len(entry['template']) > 160 else ''}")
+
+    flagged = 0
+    for depth, node in plan_nodes(root):
+        flags = node_flags(node)
+        flagged += bool(flags)
+        marker = "⚠️ " if flags else ""
+        print(f"   {'  ' * depth}- {marker}{describe_node(node)}{' — ' + '; '.join(flags) if flags else ''}")
+    return flagged
+
+def compare_polres_polsek(data, polres_id, repeat):
+    """Waktu & buffer tiap mode polres_polsek_sql untuk POLRES contoh, plus cek hasilnya identik"""
+    print(f"\n⚖️ Query POLRES+Polsek (POLRES {polres_id}), median {repeat}× EXPLAIN ANALYZE:")
+    source = inventory_source(engine)
+    results = {}
+    with engine.connect() as conn:
+        for mode in POLRES_POLSEK_QUERIES:
+            statement = polres_polsek_sql(source, polres_id, mode)
+            plans = [explain(conn, statement) for _ in range(repeat)]
+            root = plans[-1]["Plan"]
+            if "Execution Time" in plans[-1]:
+                times = sorted(plan["Execution Time"] for plan in plans)
+                timing = f"eksekusi {times[len(times) // 2]:.1f} ms, buffer hit {root.get('Shared Hit Blocks', 0):,} / read {root.get('Shared Read Blocks', 0):,}"
+            else:
+                timing = f"cost {root['Total Cost']:,.0f}"
+            scans = sorted({describe_node(node).split(" (")[0] for _, node in plan_nodes(root) if "Scan" in node["Node Type"]})
+            print(f"   ➜ {mode:<5} {timing}")
+            print(f"     scan: {', '.join(scans)}")
+            columns = ["owner_type", "owner_id", "equipment_id"]
+            results[mode] = data.read_sql(statement).sort_values(columns).reset_index(drop=True)
+        conn.rollback()
+    same = all(df.equals(results[POLRES_POLSEK_QUERIES[0]]) for df in results.values())
+    print(f"   {'✅ Hasil identik' if same else '❌ Hasil berbeda'} ({len(results[POLRES_POLSEK_QUERIES[0]])} baris)")
+
+# =========================================================
+# 3️⃣ Saran index
+# =========================================================
+def index_columns(indexdef):
+    match = re.search(r"\((.*)\)", indexdef)
+    return tuple(column.strip().strip('"') for column in match.group(1).split(",")) if match else ()
+
+def missing_indexes(data):
+    df = data.read_sql("SELECT tablename, indexdef FROM pg_indexes WHERE schemaname = current_schema();")
+    existing = {}
+    for table, indexdef in df.itertuples(index=False):
+        existing.setdefault(table, []).append(index_columns(indexdef))
+    missing = []
+    for table, prefix, columns in RECOMMENDED_INDEXES:
+        if not any(cols[:len(prefix)] == prefix for cols in existing.get(table, [])):
+            missing.append(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {table}_{'_'.join(columns)}_idx ON {table} ({', '.join(columns)});")
+    return missing
+
+data = ExportData(engine)
+capture = QueryCapture(engine)
+polres_id = capture_export_queries(data, capture)
+
+flagged_templates = 0
+plans = []
+with engine.connect() as conn:
+    for template, entry in capture.templates.items():
+        entry["template"] = template
+        plan = explain(conn, entry["statement"])
+        flagged_templates += summarize(entry, plan) > 0
+        plans.append({"label": entry["label"], "calls": entry["calls"], "statement": entry["statement"], "plan": plan})
+    conn.rollback()
+
+print(f"\n📋 {len(plans)} template query, {flagged_templates} dengan node bertanda ⚠️")
+suggestions = missing_indexes(data)
+if suggestions:
+    print("🛠️ Index yang disarankan untuk workload export:")
+    for statement in suggestions:
+        print(f"   {statement}")
+else:
+    print("✅ Semua index yang disarankan sudah ada")
+
+if args.compare_polres_polsek and polres_id is not None:
+    compare_polres_polsek(data, polres_id, args.compare_polres_polsek)
+
+if args.json:
+    with open(args.json, "w", encoding="utf-8") as f:
+        json.dump(plans, f, ensure_ascii=False, indent=2)
+    print(f"📝 Plan lengkap disimpan ke {args.json}")
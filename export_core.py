@@ -0,0 +1,1036 @@
+import os
+import time
+import threading
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+from collections import namedtuple
+
+from aggregates import inventory_source
+from rollup import TOTAL_JAJARAN, JAJARAN_HEADER, jajaran_cells, load_polda_hierarchy, load_polda_rollup, load_satker_mabes_rollup
+from selection import ExportSelection, replace_sheet
+from xlsx_writer import NAMES, WRITERS, XlsxWorkbook, XlsxSheet, column_letters, group_header_merges
+
+# openpyxl, SQLAlchemy dan dotenv di-import saat dipakai: writer 'xml' tidak pernah memuat openpyxl,
+# dan script bisa mem-parse argumen sebelum modul berat dimuat
+
+# =========================================================
+# 1️⃣ Koneksi database dari .env
+# =========================================================
+def create_db_engine():
+    from dotenv import load_dotenv
+    from sqlalchemy import create_engine
+
+    load_dotenv()
+
+    DB_HOST = os.getenv("DB_HOST")
+    DB_PORT = os.getenv("DB_PORT")
+    DB_NAME = os.getenv("DB_DATABASE")
+    DB_USER = os.getenv("DB_USERNAME")
+    DB_PASS = os.getenv("DB_PASSWORD")
+
+    return create_engine(f"postgresql://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}")
+
+# =========================================================
+# 2️⃣ Fungsi bantu
+# =========================================================
+OWNER_TYPES = {
+    "subsatker": "App\\Models\\SubsatkerPolda",
+    "polres": "App\\Models\\Polres",
+    "polsek": "App\\Models\\Polsek",
+    "satker": "App\\Models\\SatkerMabes",
+}
+COUNT_COLUMNS = ["baik", "rusak_ringan", "rusak_berat"]
+GROUP_HEADER = [NAMES.intern(label) for label in ["Baik", "Rusak Ringan", "Rusak Berat", "Jumlah"]]
+UNIT_HEADER = [NAMES.intern(label) for label in ["No.", "Jenis Materil"]] + GROUP_HEADER
+JAJARAN_LABELS = [NAMES.intern(label) for label in JAJARAN_HEADER]
+INDEX_HEADER = [NAMES.intern(label) for label in ["No.", "Sheet", "Nama Unit"]]
+TOTAL_JAJARAN_LABEL = NAMES.intern(TOTAL_JAJARAN)
+
+def style_header(ws):
+    from openpyxl.styles import Alignment, Font
+
+    for row_num in [1, 2]:
+        for cell in ws[row_num]:
+            cell.font = Font(bold=True)
+            cell.alignment = Alignment(horizontal="center", vertical="center", wrap_text=True)
+    ws.freeze_panes = "C3"
+
+def style_header_simple(ws):
+    """Fungsi styling untuk header tunggal"""
+    from openpyxl.styles import Alignment, Font
+
+    for cell in ws[1]:
+        cell.font = Font(bold=True)
+        cell.alignment = Alignment(horizontal="center", vertical="center")
+    ws.freeze_panes = "A2"
+
+def auto_resize_columns(ws):
+    from openpyxl.utils import get_column_letter
+
+    for column in ws.columns:
+        max_length = 0
+        column_letter = get_column_letter(column[0].column)
+        for cell in column:
+            try:
+                if cell.value:
+                    cell_length = len(str(cell.value))
+                    if cell_length > max_length:
+                        max_length = cell_length
+            except:
+                pass
+        adjusted_width = min(max_length + 2, 50)
+        ws.column_dimensions[column_letter].width = adjusted_width
+
+def zero_to_empty(value):
+    return "" if value == 0 else value
+
+def count_cells(counts):
+    """Array [..., baik/rr/rb] → baris sel [Baik, RR, RB, Jumlah] per grup 3 kolom, 0 → kosong (sekaligus untuk seluruh sheet)"""
+    counts = np.asarray(counts, dtype=np.int64)
+    values = np.concatenate([counts, counts.sum(axis=-1, keepdims=True)], axis=-1)
+    values = values.reshape(len(values), values[0].size if len(values) else 0)
+    cells = values.astype(object)
+    cells[values == 0] = ""
+    return cells.tolist()
+
+MAX_SHEET_TITLE = 31
+_NAME_TRANSLATION = str.maketrans({'/': '-', '\\': '-', '*': None, '?': None, ':': None, '[': None, ']': None})
+_NAME_TRANSLATION_NO_DOTS = str.maketrans({'/': '-', '\\': '-', '*': None, '?': None, ':': None, '[': None, ']': None, '.': None})
+
+@lru_cache(maxsize=None)
+def sanitize_name(name, max_length=MAX_SHEET_TITLE, strip_dots=False):
+    """Nama aman untuk judul sheet / nama file (karakter terlarang Excel diganti/dihapus), dipotong ke max_length (None: tanpa batas)"""
+    name = name.translate(_NAME_TRANSLATION_NO_DOTS if strip_dots else _NAME_TRANSLATION).strip()
+    return name[:max_length] if max_length else name
+
+def unique_names(items, max_length=None, taken=()):
+    """{id: nama} unik tanpa beda huruf besar/kecil; bentrok diberi akhiran ' (id)', unit dengan id terkecil tetap memakai nama aslinya"""
+    seen = {name.lower() for name in taken}
+    result = {}
+    collided = []
+    for unit_id, name in sorted(items, key=lambda item: item[0]):
+        if name.lower() in seen:
+            collided.append((unit_id, name))
+        else:
+            seen.add(name.lower())
+            result[unit_id] = name
+
+    for unit_id, name in collided:
+        n = 0
+        while True:
+            suffix = f" ({unit_id})" if n == 0 else f" ({unit_id}-{n})"
+            candidate = (name[:max_length - len(suffix)] if max_length else name) + suffix
+            if candidate.lower() not in seen:
+                break
+            n += 1
+        seen.add(candidate.lower())
+        result[unit_id] = candidate
+    return result
+
+def _ids_sql(ids):
+    return ','.join(str(int(i)) for i in ids)
+
+# =========================================================
+# 🏛️ Hierarki Satker Mabes
+# =========================================================
+def get_all_children_recursive(satker_id, all_satkers_df):
+    """Mendapatkan semua child dari satker secara rekursif (depth-first)"""
+    children = []
+    direct_children = all_satkers_df[all_satkers_df['parent_id'] == satker_id].sort_values('name')
+
+    for _, child in direct_children.iterrows():
+        children.append(child)
+        # Rekursif untuk mendapatkan anak-anak dari child ini
+        grandchildren = get_all_children_recursive(child['id'], all_satkers_df)
+        children.extend(grandchildren)
+
+    return children
+
+def get_parent_chain(satker_id, all_satkers_df):
+    """Mendapatkan chain parent dari satker ke atas (untuk nama file)"""
+    chain = []
+    current_id = satker_id
+
+    while current_id is not None:
+        satker_match = all_satkers_df[all_satkers_df['id'] == current_id]
+
+        # Jika tidak menemukan satker dengan ID tersebut, hentikan loop
+        if satker_match.empty:
+            print(f"    ⚠️ Warning: Satker dengan ID {current_id} tidak ditemukan")
+            break
+
+        satker = satker_match.iloc[0]
+        chain.append(satker['name'])
+
+        # Handle parent_id yang bisa None atau NaN
+        parent_id = satker['parent_id']
+        current_id = None if pd.isna(parent_id) else int(parent_id)
+
+    # Balik urutan agar dari level tertinggi ke terendah
+    return list(reversed(chain))
+
+# =========================================================
+# 🏷️ Tabel nama sheet & file per unit id
+# =========================================================
+NAME_LEVELS = ("polda", "polres", "polsek", "satker")
+INDEX_SHEET_TITLE = "Daftar Sheet"
+
+class NameTable:
+    """Judul sheet (disanitasi, maks. 31 karakter, unik per workbook) dan nama file satker per unit id, dihitung sekali dari hierarki"""
+
+    def __init__(self, frames, strip_dots=False):
+        self.strip_dots = strip_dots
+        self.full_names = {level: dict(zip(frames[level]["id"].astype(int), frames[level]["name"])) for level in NAME_LEVELS}
+        self.full_names["polda"] = {i: "POLDA " + name for i, name in self.full_names["polda"].items()}
+        self.scopes = {}
+
+        # Cakupan = isi satu workbook: POLDA + POLRES-nya, (POLRES +) Polsek-nya, Satker Mabes satu pohon
+        # (sheet satker bisa ada di workbook ancestor mana pun); judul sheet daftar isi selalu dicadangkan
+        self.sheets = {"polda": {i: self._sanitize(name) for i, name in self.full_names["polda"].items()}}
+        self.sheets["polres"] = self._unique_sheets("polres", frames["polres"], "polda_id", lambda polda_id: [self.sheets["polda"].get(polda_id, "")])
+        self.sheets["polsek"] = self._unique_sheets("polsek", frames["polsek"], "polres_id", lambda polres_id: [self.sheets["polres"].get(polres_id, "")])
+        self.sheets["satker"] = self._unique_sheets("satker", frames["satker"])
+        self.files = {"satker": self._satker_files(frames["satker"])}
+
+    def _sanitize(self, name, max_length=MAX_SHEET_TITLE):
+        return sanitize_name(name, max_length, self.strip_dots)
+
+    def _unique_sheets(self, level, df, scope_column=None, scope_taken=None):
+        """Resolusi bentrok sekali di depan per workbook: set judul yang sudah dipakai + akhiran id"""
+        sheets = {}
+        groups = df.groupby(scope_column, sort=False) if scope_column else [(None, df)]
+        for scope_id, group in groups:
+            ids = [int(i) for i in group["id"]]
+            taken = [INDEX_SHEET_TITLE] + (scope_taken(int(scope_id)) if scope_taken else [])
+            sheets.update(unique_names([(i, self._sanitize(self.full_names[level][i])) for i in ids], MAX_SHEET_TITLE, taken))
+            self.scopes[(level, None if scope_id is None else int(scope_id))] = ids
+        return sheets
+
+    def _satker_files(self, df_satkers):
+        """Nama file satker: rantai nama dari level tertinggi (Level1_Level2_Level3), tanpa dipotong"""
+        names = self.full_names["satker"]
+        parents = {int(i): None if pd.isna(p) else int(p) for i, p in zip(df_satkers["id"], df_satkers["parent_id"])}
+        chains = {}
+
+        def chain(satker_id):
+            if satker_id not in chains:
+                parent_id = parents.get(satker_id)
+                prefix = chain(parent_id) + "_" if parent_id in parents else ""
+                chains[satker_id] = prefix + names[satker_id]
+            return chains[satker_id]
+
+        return unique_names([(i, self._sanitize(chain(i), None)) for i in names])
+
+    def sheet(self, level, unit_id, fallback=None):
+        """Judul sheet unit; unit di luar tabel (mis. baru dibuat) memakai fallback yang disanitasi"""
+        title = self.sheets[level].get(int(unit_id))
+        return title if title is not None else self._sanitize(fallback)
+
+    def satker_file(self, satker_id):
+        return self.files["satker"][int(satker_id)]
+
+    def scope_ids(self, level, scope_id=None):
+        """Semua unit id satu cakupan, mis. scope_ids('polres', polda_id)"""
+        return self.scopes.get((level, None if scope_id is None else int(scope_id)), [])
+
+    def titles(self, level, unit_ids):
+        """{judul sheet: nama lengkap unit} untuk sheet daftar isi"""
+        return {self.sheets[level][int(i)]: self.full_names[level][int(i)] for i in unit_ids if int(i) in self.sheets[level]}
+
+# =========================================================
+# 3️⃣ Data layer: hierarki, katalog equipment & inventaris
+# =========================================================
+def _positions(keys, values):
+    """Posisi setiap value (id) di array keys, -1 jika tidak ada"""
+    keys = np.asarray(keys, dtype=np.int64)
+    values = np.asarray(values, dtype=np.int64)
+    if len(keys) == 0:
+        return np.full(len(values), -1, dtype=np.int64)
+    sorter = np.argsort(keys, kind="stable")
+    pos = np.clip(np.searchsorted(keys, values, sorter=sorter), 0, len(keys) - 1)
+    return np.where(keys[sorter[pos]] == values, sorter[pos], -1)
+
+class CatalogLayout:
+    """Katalog dalam kolom bertipe + urutan baris sheet (penggolongan → jenis materiil), dihitung sekali per katalog"""
+
+    def __init__(self, catalog):
+        self.catalog = catalog
+        self.equipment_ids = catalog["equipment_id"].to_numpy(dtype=np.int32)
+        self.jenis = catalog["jenis_materiil"].tolist()
+        # Layout satu unit: satu baris per equipment; layout grup: satu baris per nama jenis
+        self.penggolongan = []
+        self.jenis_groups = []
+        for penggolongan, group in catalog.reset_index(drop=True).groupby("penggolongan", sort=False):
+            self.penggolongan.append((penggolongan, group.index.to_numpy(dtype=np.int32)))
+            self.jenis_groups.append((penggolongan, [
+                (jenis, jenis_group.index.to_numpy(dtype=np.int32))
+                for jenis, jenis_group in group.groupby("jenis_materiil", sort=False)
+            ]))
+        # Baris layout grup untuk setiap posisi katalog: jumlah per nama jenis dihitung sekali untuk semua unit
+        self.group_rows = np.zeros(len(self.equipment_ids), dtype=np.int64)
+        self.n_group_rows = 0
+        for _, jenis_groups in self.jenis_groups:
+            for _, positions in jenis_groups:
+                self.group_rows[positions] = self.n_group_rows
+                self.n_group_rows += 1
+
+    def __len__(self):
+        return len(self.equipment_ids)
+
+class InventoryMatrix:
+    """Inventaris beberapa unit sebagai array uint32 [equipment (urutan katalog), unit, baik/rr/rb]"""
+
+    def __init__(self, layout, unit_ids, counts):
+        self.layout = layout
+        self.unit_ids = np.asarray(unit_ids, dtype=np.int32)
+        self.counts = counts
+        self._unit_index = None
+
+    @classmethod
+    def from_rows(cls, layout, unit_ids, df_inv, unit_positions=None):
+        """Isi matrix dari baris agregat (equipment_id, owner_id, baik, rusak_ringan, rusak_berat)"""
+        counts = np.zeros((len(layout), len(unit_ids), 3), dtype=np.uint32)
+        if unit_positions is None:
+            unit_positions = _positions(unit_ids, df_inv["owner_id"].to_numpy())
+        equipment_positions = _positions(layout.equipment_ids, df_inv["equipment_id"].to_numpy())
+        values = df_inv[COUNT_COLUMNS].fillna(0).to_numpy().astype(np.uint32)
+        valid = (equipment_positions >= 0) & (unit_positions >= 0)
+        np.add.at(counts, (equipment_positions[valid], unit_positions[valid]), values[valid])
+        return cls(layout, unit_ids, counts)
+
+    @property
+    def empty(self):
+        return len(self.layout) == 0
+
+    def unit_position(self, unit_id):
+        if self._unit_index is None:
+            self._unit_index = {int(u): i for i, u in enumerate(self.unit_ids)}
+        return self._unit_index.get(int(unit_id))
+
+# Query inventaris POLRES + Polsek-nya:
+#   'union' : satu cabang per owner_type (UNION ALL), masing-masing bisa memakai index (owner_type, owner_id)
+#   'or'    : bentuk lama, LEFT JOIN polsek ke setiap baris inventaris lalu OR antar owner_type
+#             (planner tidak bisa memakai index per cabang; disimpan untuk perbandingan di explain_queries.py)
+POLRES_POLSEK_QUERIES = ("union", "or")
+
+def polres_polsek_sql(source, polres_id, mode="union"):
+    """SQL inventaris POLRES + Polsek-nya, dikelompokkan per (equipment, owner_type, owner_id)"""
+    polres_id = int(polres_id)
+    if mode == "or":
+        return f"""
+            SELECT
+                ei.equipment_id, ei.owner_type, ei.owner_id,
+                SUM(ei.baik) AS baik,
+                SUM(ei.rusak_ringan) AS rusak_ringan,
+                SUM(ei.rusak_berat) AS rusak_berat
+            FROM {source} ei
+            LEFT JOIN polsek ps ON ei.owner_type = '{OWNER_TYPES["polsek"]}' AND ps.id = ei.owner_id AND ps.polres_id = {polres_id}
+            WHERE (
+                (ei.owner_type = '{OWNER_TYPES["polres"]}' AND ei.owner_id = {polres_id})
+                OR (ei.owner_type = '{OWNER_TYPES["polsek"]}' AND ps.polres_id = {polres_id})
+            )
+            GROUP BY ei.equipment_id, ei.owner_type, ei.owner_id;
+        """
+    if mode != "union":
+        raise ValueError(f"Mode query POLRES+Polsek tidak dikenal: {mode!r} (pilihan: {', '.join(POLRES_POLSEK_QUERIES)})")
+    return f"""
+        SELECT
+            ei.equipment_id, ei.owner_type, ei.owner_id,
+            SUM(ei.baik) AS baik,
+            SUM(ei.rusak_ringan) AS rusak_ringan,
+            SUM(ei.rusak_berat) AS rusak_berat
+        FROM {source} ei
+        WHERE ei.owner_type = '{OWNER_TYPES["polres"]}' AND ei.owner_id = {polres_id}
+        GROUP BY ei.equipment_id, ei.owner_type, ei.owner_id
+        UNION ALL
+        SELECT
+            ei.equipment_id, ei.owner_type, ei.owner_id,
+            SUM(ei.baik) AS baik,
+            SUM(ei.rusak_ringan) AS rusak_ringan,
+            SUM(ei.rusak_berat) AS rusak_berat
+        FROM {source} ei
+        JOIN polsek ps ON ps.id = ei.owner_id
+        WHERE ei.owner_type = '{OWNER_TYPES["polsek"]}' AND ps.polres_id = {polres_id}
+        GROUP BY ei.equipment_id, ei.owner_type, ei.owner_id;
+    """
+
+class ExportData:
+    """Akses data export langsung ke database (katalog equipment dimuat sekali per run)
+
+    read_snapshot: ReadSnapshot (read_snapshot.py) → semua query run membaca satu snapshot transaksi
+    """
+
+    def __init__(self, engine, selection=None, writer="xml", memory_budget=None, read_snapshot=None):
+        self.engine = engine
+        self.bind = read_snapshot.connection if read_snapshot is not None else engine
+        self.selection = selection or ExportSelection()
+        self.writer = writer
+        self.memory_budget = memory_budget
+        self._catalog = None
+        self._layout = None
+        self._name_tables = {}
+
+    def new_workbook(self):
+        return new_workbook(self.writer, self.memory_budget)
+
+    def read_sql(self, query, params=None):
+        """params: bind parameter (:nama) → query dikirim lewat sqlalchemy.text()"""
+        if params:
+            from sqlalchemy import text
+            return pd.read_sql(text(query), self.bind, params=params)
+        return pd.read_sql(query, self.bind)
+
+    def read_names(self, query, name_column="name", params=None):
+        """read_sql untuk tabel hierarki; kolom nama di-intern ke NAMES"""
+        return NAMES.intern_column(self.read_sql(query, params), name_column)
+
+    # ----- Katalog equipment -----
+    def equipment_catalog(self):
+        """Semua equipment aktif dengan urutan sheet: penggolongan lalu "order" """
+        if self._catalog is None:
+            self._catalog = self.read_sql("""
+                SELECT
+                    e.id AS equipment_id,
+                    et.id AS penggolongan_id, et.name AS penggolongan,
+                    e.name AS jenis_materiil, e."order"
+                FROM equipments e
+                JOIN equipment_types et ON et.id = e.id_equipment_type
+                WHERE e.deleted_at IS NULL
+                ORDER BY et.id, e."order";
+            """)
+            # Nama di-intern sekali: semua sel/sheet memakai objek & shared-string id yang sama
+            NAMES.intern_column(self._catalog, "penggolongan")
+            NAMES.intern_column(self._catalog, "jenis_materiil")
+            for column in ["equipment_id", "penggolongan_id"]:
+                self._catalog[column] = self._catalog[column].astype(np.int32)
+        return self._catalog
+
+    def catalog_layout(self):
+        catalog = self.equipment_catalog()
+        layout = self._layout
+        if layout is None or layout.catalog is not catalog:
+            layout = self._layout = CatalogLayout(catalog)
+        return layout
+
+    def equipment_ids(self):
+        return self.catalog_layout().equipment_ids
+
+    def _matrix(self, unit_ids, query, unit_positions=None):
+        """Agregat inventaris per (equipment, owner) → InventoryMatrix selaras katalog"""
+        return InventoryMatrix.from_rows(self.catalog_layout(), unit_ids, self.read_sql(query), unit_positions)
+
+    # ----- Hierarki -----
+    def poldas(self):
+        return self.read_names(self.selection.polda_query(), params=self.selection.params)
+
+    def subsatkers(self, polda_id):
+        return self.read_names(f"SELECT id, name FROM subsatker_poldas WHERE polda_id = {polda_id} ORDER BY name;")
+
+    def polres_list(self, polda_id, filtered=True):
+        """POLRES satu POLDA; filtered=False mengabaikan filter POLRES (build penuh file POLDA)"""
+        where = self.selection.polres_where() if filtered else "1 = 1"
+        query = f"SELECT id AS polres_id, name AS polres_name FROM polres WHERE polda_id = {polda_id} AND {where} ORDER BY name;"
+        return self.read_names(query, "polres_name", self.selection.params)
+
+    def polsek_list(self, polres_id):
+        return self.read_names(f"SELECT id, name FROM polsek WHERE polres_id = {polres_id} ORDER BY name;")
+
+    def satker_tree(self):
+        """Satker terpilih (selected) + ancestor-nya untuk nama file; tanpa filter = semua satker"""
+        return self.read_names(self.selection.satker_query(), params=self.selection.params)
+
+    def name_frames(self):
+        """Id & nama semua unit (tanpa filter) sebagai sumber NameTable"""
+        return {
+            "polda": self.read_sql("SELECT id, name FROM polda ORDER BY id;"),
+            "polres": self.read_sql("SELECT id, name, polda_id FROM polres ORDER BY id;"),
+            "polsek": self.read_sql("SELECT id, name, polres_id FROM polsek ORDER BY id;"),
+            "satker": self.read_sql("SELECT id, name, parent_id FROM satker_mabes ORDER BY id;"),
+        }
+
+    def name_table(self, strip_dots=False):
+        if strip_dots not in self._name_tables:
+            self._name_tables[strip_dots] = NameTable(self.name_frames(), strip_dots)
+        return self._name_tables[strip_dots]
+
+    # ----- Rollup -----
+    def polda_rollup(self, polda_id):
+        return load_polda_rollup(self.bind, polda_id, self.equipment_ids())
+
+    def satker_rollup(self, df_all_satkers):
+        return load_satker_mabes_rollup(self.bind, df_all_satkers, self.equipment_ids(), restrict=self.selection.satker_active)
+
+    # ----- Inventaris (agregat per owner id, matrix uint32 selaras katalog) -----
+    def subsatker_inventory(self, polda_id, subsatker_ids):
+        return self._matrix(subsatker_ids, f"""
+            SELECT
+                ei.equipment_id, ei.owner_id,
+                SUM(ei.baik) AS baik, SUM(ei.rusak_ringan) AS rusak_ringan, SUM(ei.rusak_berat) AS rusak_berat
+            FROM {inventory_source(self.engine)} ei
+            JOIN subsatker_poldas sp ON sp.id = ei.owner_id
+            WHERE ei.owner_type = '{OWNER_TYPES["subsatker"]}' AND sp.polda_id = {polda_id}
+            GROUP BY ei.equipment_id, ei.owner_id;
+        """)
+
+    def unit_inventory(self, owner, owner_id):
+        """Inventaris satu unit (POLRES atau Polsek) untuk sheet satu unit"""
+        return self._matrix([owner_id], f"""
+            SELECT ei.equipment_id, ei.owner_id, SUM(ei.baik) AS baik, SUM(ei.rusak_ringan) AS rusak_ringan, SUM(ei.rusak_berat) AS rusak_berat
+            FROM {inventory_source(self.engine)} ei
+            WHERE ei.owner_type = '{OWNER_TYPES[owner]}' AND ei.owner_id = {owner_id}
+            GROUP BY ei.equipment_id, ei.owner_id;
+        """)
+
+    def polres_polsek_inventory(self, polres_id, polsek_ids):
+        """Inventaris POLRES (unit 0) + Polsek-nya (unit 1..n sesuai urutan polsek_ids)"""
+        df_inv = self.read_sql(polres_polsek_sql(inventory_source(self.engine), polres_id))
+        return self._polres_polsek_matrix(polres_id, polsek_ids, df_inv, (df_inv["owner_type"] == OWNER_TYPES["polres"]).to_numpy())
+
+    def _polres_polsek_matrix(self, polres_id, polsek_ids, df_inv, is_polres):
+        unit_ids = [polres_id] + list(polsek_ids)
+        polsek_positions = _positions(polsek_ids, df_inv["owner_id"].to_numpy())
+        unit_positions = np.where(is_polres, 0, np.where(polsek_positions >= 0, polsek_positions + 1, -1))
+        return InventoryMatrix.from_rows(self.catalog_layout(), unit_ids, df_inv, unit_positions)
+
+    def satker_inventory(self, satker_ids):
+        """Inventaris beberapa satker (kolom atau sheet per satker) dalam satu query"""
+        return self._matrix(satker_ids, f"""
+            SELECT
+                ei.equipment_id, ei.owner_id,
+                SUM(ei.baik) AS baik, SUM(ei.rusak_ringan) AS rusak_ringan, SUM(ei.rusak_berat) AS rusak_berat
+            FROM {inventory_source(self.engine)} ei
+            WHERE ei.owner_type = '{OWNER_TYPES["satker"]}' AND ei.owner_id IN ({_ids_sql(satker_ids)})
+            GROUP BY ei.equipment_id, ei.owner_id;
+        """)
+
+class CachedExportData(ExportData):
+    """ExportData dengan cache di memori (tanpa filter): katalog & hierarki (TTL panjang) dan inventaris (TTL pendek)"""
+
+    def __init__(self, engine, hierarchy_ttl=3600, inventory_ttl=300, writer="xml"):
+        super().__init__(engine, writer=writer)
+        self.hierarchy_ttl = hierarchy_ttl
+        self.inventory_ttl = inventory_ttl
+        self._lock = threading.Lock()
+        self._hierarchy = None
+        self._hierarchy_loaded_at = 0
+        self._catalog_loaded_at = 0
+        self._inventory = {}
+
+    def invalidate(self, what="all"):
+        """Buang cache: 'inventory', 'hierarchy' atau 'all'"""
+        with self._lock:
+            if what in ("all", "inventory"):
+                self._inventory.clear()
+            if what in ("all", "hierarchy"):
+                self._hierarchy = None
+                self._catalog = None
+                self._layout = None
+
+    def _expired(self, loaded_at, ttl):
+        return time.monotonic() - loaded_at > ttl
+
+    def equipment_catalog(self):
+        if self._catalog is None or self._expired(self._catalog_loaded_at, self.hierarchy_ttl):
+            self._catalog = None
+            catalog = super().equipment_catalog()
+            self._catalog_loaded_at = time.monotonic()
+            return catalog
+        return self._catalog
+
+    def hierarchy(self):
+        """Semua tabel hierarki dimuat sekali (tanpa filter) lalu dilayani dari memori"""
+        hierarchy = self._hierarchy
+        if hierarchy is not None and not self._expired(self._hierarchy_loaded_at, self.hierarchy_ttl):
+            return hierarchy
+
+        hierarchy = {
+            "polda": self.read_names("SELECT id, name FROM polda ORDER BY id;"),
+            "subsatker": self.read_names("SELECT id, name, polda_id FROM subsatker_poldas ORDER BY name;"),
+            "polres": self.read_names("SELECT id, name, polda_id FROM polres ORDER BY name;"),
+            "polsek": self.read_names("SELECT id, name, polres_id FROM polsek ORDER BY name;"),
+            "satker": self.read_names("SELECT id, name, level, parent_id, 1 AS selected FROM satker_mabes ORDER BY level, name;"),
+        }
+        hierarchy["subsatker_by_polda"] = {k: g for k, g in hierarchy["subsatker"].groupby("polda_id")}
+        hierarchy["polres_by_polda"] = {k: g for k, g in hierarchy["polres"].groupby("polda_id")}
+        hierarchy["polsek_by_polres"] = {k: g for k, g in hierarchy["polsek"].groupby("polres_id")}
+        with self._lock:
+            self._hierarchy = hierarchy
+            self._hierarchy_loaded_at = time.monotonic()
+        return hierarchy
+
+    def _cached(self, key, loader):
+        with self._lock:
+            entry = self._inventory.get(key)
+        if entry is not None and not self._expired(entry[0], self.inventory_ttl):
+            return entry[1]
+        value = loader()
+        with self._lock:
+            self._inventory[key] = (time.monotonic(), value)
+        return value
+
+    # ----- Hierarki dari memori -----
+    def poldas(self):
+        return self.hierarchy()["polda"]
+
+    def polda_of_polres(self, polres_id):
+        polres = self.hierarchy()["polres"]
+        match = polres[polres["id"] == int(polres_id)]
+        return None if match.empty else int(match["polda_id"].iloc[0])
+
+    def _group(self, name, key):
+        group = self.hierarchy()[name].get(int(key))
+        if group is None:
+            return self.hierarchy()[name.split("_by_")[0]].iloc[0:0]
+        return group
+
+    def subsatkers(self, polda_id):
+        return self._group("subsatker_by_polda", polda_id)[["id", "name"]]
+
+    def polres_list(self, polda_id, filtered=True):
+        group = self._group("polres_by_polda", polda_id)
+        return group[["id", "name"]].rename(columns={"id": "polres_id", "name": "polres_name"})
+
+    def polsek_list(self, polres_id):
+        return self._group("polsek_by_polres", polres_id)[["id", "name"]]
+
+    def satker_tree(self):
+        return self.hierarchy()["satker"]
+
+    def name_table(self, strip_dots=False):
+        # Dibangun ulang setiap kali hierarki dimuat ulang (TTL / invalidate)
+        hierarchy = self.hierarchy()
+        entry = self._name_tables.get(strip_dots)
+        if entry is None or entry[0] is not hierarchy:
+            entry = self._name_tables[strip_dots] = (hierarchy, NameTable(hierarchy, strip_dots))
+        return entry[1]
+
+    # ----- Rollup & inventaris dengan TTL -----
+    def polda_rollup(self, polda_id):
+        def _load():
+            polres = self._group("polres_by_polda", polda_id)
+            polsek = self.hierarchy()["polsek"]
+            polsek = polsek[polsek["polres_id"].isin(polres["id"])]
+            hierarchy = (self._group("subsatker_by_polda", polda_id)[["id"]], polres[["id"]], polsek[["id", "polres_id"]])
+            return load_polda_rollup(self.bind, polda_id, self.equipment_ids(), hierarchy=hierarchy)
+        return self._cached(("polda_rollup", int(polda_id)), _load)
+
+    def satker_rollup(self, df_all_satkers):
+        return self._cached(("satker_rollup",), lambda: super(CachedExportData, self).satker_rollup(self.satker_tree()))
+
+    def subsatker_inventory(self, polda_id, subsatker_ids):
+        return self._cached(("subsatker", int(polda_id)), lambda: super(CachedExportData, self).subsatker_inventory(polda_id, subsatker_ids))
+
+    def unit_inventory(self, owner, owner_id):
+        return self._cached((owner, int(owner_id)), lambda: super(CachedExportData, self).unit_inventory(owner, owner_id))
+
+    def polres_polsek_inventory(self, polres_id, polsek_ids):
+        return self._cached(("polres_polsek", int(polres_id)), lambda: super(CachedExportData, self).polres_polsek_inventory(polres_id, polsek_ids))
+
+    def satker_inventory(self, satker_ids):
+        key = ("satker", tuple(int(i) for i in satker_ids))
+        return self._cached(key, lambda: super(CachedExportData, self).satker_inventory(satker_ids))
+
+class SnapshotExportData(ExportData):
+    """ExportData dengan inventaris dari snapshot riwayat (--as-of); katalog & hierarki tetap kondisi saat ini"""
+
+    def __init__(self, engine, snapshot, selection=None, writer="xml", memory_budget=None, read_snapshot=None):
+        super().__init__(engine, selection, writer=writer, memory_budget=memory_budget, read_snapshot=read_snapshot)
+        self.snapshot = snapshot
+
+    def _snapshot_matrix(self, level, unit_ids):
+        return InventoryMatrix.from_rows(self.catalog_layout(), unit_ids, self.snapshot.rows(level, unit_ids))
+
+    def polda_rollup(self, polda_id):
+        # Hanya baris owner jajaran POLDA ini (rentang key per owner), bukan seluruh baris nasional
+        hierarchy = load_polda_hierarchy(self.bind, polda_id)
+        subsatker_df, polres_df, polsek_df = hierarchy
+        df_inv = pd.concat([
+            self.snapshot.rows("subsatker", subsatker_df["id"]),
+            self.snapshot.rows("polres", polres_df["id"]),
+            self.snapshot.rows("polsek", polsek_df["id"]),
+        ], ignore_index=True)
+        return load_polda_rollup(self.bind, polda_id, self.equipment_ids(), hierarchy=hierarchy, df_inv=df_inv)
+
+    def satker_rollup(self, df_all_satkers):
+        return load_satker_mabes_rollup(self.bind, df_all_satkers, self.equipment_ids(), df_inv=self.snapshot.rows("satker"))
+
+    def subsatker_inventory(self, polda_id, subsatker_ids):
+        return self._snapshot_matrix("subsatker", subsatker_ids)
+
+    def unit_inventory(self, owner, owner_id):
+        return self._snapshot_matrix(owner, [owner_id])
+
+    def polres_polsek_inventory(self, polres_id, polsek_ids):
+        df_inv = pd.concat([self.snapshot.rows("polres", [polres_id]), self.snapshot.rows("polsek", polsek_ids)], ignore_index=True)
+        return self._polres_polsek_matrix(polres_id, polsek_ids, df_inv, (df_inv["owner_level"] == "polres").to_numpy())
+
+    def satker_inventory(self, satker_ids):
+        return self._snapshot_matrix("satker", satker_ids)
+
+# =========================================================
+# 4️⃣ Penulis sheet (dua layout dasar)
+# =========================================================
+class SheetContent(namedtuple("SheetContent", ["layout", "headers", "items", "widths"])):
+    """Isi sheet siap tulis: layout 'group'/'unit', baris header, item ('penggolongan', nama) / ('row', nilai), lebar kolom"""
+
+    @property
+    def width(self):
+        return len(self.headers[0])
+
+def _content_widths(headers, items):
+    """Lebar kolom dengan aturan yang sama seperti auto_resize_columns, dihitung sekali dari data"""
+    lengths = [0] * len(headers[0])
+    for kind, value in [("row", header) for header in headers] + items:
+        values = [None, value] if kind == "penggolongan" else value
+        for i, cell_value in enumerate(values):
+            if cell_value:
+                lengths[i] = max(lengths[i], len(str(cell_value)))
+    return [(letter, min(length + 2, 50)) for letter, length in zip(column_letters(len(lengths)), lengths)]
+
+@lru_cache(maxsize=None)
+def _group_header2(n_groups):
+    return tuple(["", ""] + GROUP_HEADER * n_groups)
+
+def group_sheet_content(groups, inventory, jajaran=None):
+    """Isi sheet multi-unit: header 2 baris, 4 kolom (Baik/RR/RB/Jumlah) per unit + opsional Total Jajaran"""
+    # Header baris 1 - nama unit (urutan sama dengan inventory.unit_ids)
+    header1 = ["No.", "Jenis Materil"]
+    header_groups = list(groups) + ([TOTAL_JAJARAN_LABEL] if jajaran else [])
+    for name in header_groups:
+        header1 += [name, "", "", ""]
+
+    # Header baris 2 - Baik, RR, RB, Jumlah (template per jumlah grup)
+    header2 = list(_group_header2(len(header_groups)))
+
+    # Isi data: jumlah per nama jenis untuk semua unit (dan Total Jajaran) sebagai operasi array
+    layout = inventory.layout
+    sums = np.zeros((layout.n_group_rows,) + inventory.counts.shape[1:], dtype=np.int64)
+    np.add.at(sums, layout.group_rows, inventory.counts)
+    cells = count_cells(sums)
+    if jajaran:
+        rollup, key = jajaran
+        jajaran_sums = np.zeros((layout.n_group_rows, 3), dtype=np.int64)
+        np.add.at(jajaran_sums, layout.group_rows, rollup.equipment_totals(key, layout.equipment_ids))
+        for row, jajaran_row in zip(cells, count_cells(jajaran_sums)):
+            row += jajaran_row
+
+    items = []
+    rows = iter(cells)
+    for penggolongan, jenis_groups in layout.jenis_groups:
+        items.append(("penggolongan", penggolongan))
+        items += [("row", [jenis_no, jenis] + next(rows)) for jenis_no, (jenis, _) in enumerate(jenis_groups, start=1)]
+
+    headers = [header1, header2]
+    return SheetContent("group", headers, items, _content_widths(headers, items))
+
+def unit_sheet_content(inventory, unit=0, jajaran=None):
+    """Isi sheet satu unit (posisi unit di inventory): header tunggal No./Jenis Materil/Baik/RR/RB/Jumlah + opsional kolom jajaran"""
+    header = list(UNIT_HEADER)
+    if jajaran:
+        header += JAJARAN_LABELS
+
+    # Nilai sel seluruh sheet sekaligus: Jumlah & 0 → kosong sebagai operasi kolom, lalu list biasa per posisi katalog
+    layout = inventory.layout
+    cells = count_cells(inventory.counts[:, unit])
+    if jajaran:
+        rollup, key = jajaran
+        for row, jajaran_row in zip(cells, count_cells(rollup.equipment_totals(key, layout.equipment_ids))):
+            row += jajaran_row
+
+    items = []
+    jenis = layout.jenis
+    for penggolongan, positions in layout.penggolongan:
+        items.append(("penggolongan", penggolongan))
+        items += [("row", [jenis_no, jenis[position]] + cells[position]) for jenis_no, position in enumerate(positions.tolist(), start=1)]
+
+    headers = [header]
+    return SheetContent("unit", headers, items, _content_widths(headers, items))
+
+def write_content(ws, content):
+    """Tulis SheetContent ke worksheet openpyxl, atau serahkan ke XlsxSheet (ditulis langsung sebagai XML saat save)"""
+    if isinstance(ws, XlsxSheet):
+        ws.content = content
+        return
+
+    from openpyxl.styles import Alignment, Font
+
+    for header in content.headers:
+        ws.append(header)
+
+    # Merge cells untuk header unit
+    if content.layout == "group":
+        for start_col, end_col in group_header_merges(content.width):
+            ws.merge_cells(start_row=1, start_column=start_col, end_row=1, end_column=end_col)
+
+    current_row = len(content.headers) + 1
+    for kind, value in content.items:
+        if kind == "penggolongan":
+            ws.merge_cells(start_row=current_row, start_column=2, end_row=current_row, end_column=content.width)
+            ws.cell(row=current_row, column=2, value=value).font = Font(bold=True)
+        else:
+            ws.append(value)
+            ws.cell(row=current_row, column=1).alignment = Alignment(horizontal="center", vertical="center")
+        current_row += 1
+
+    if content.layout == "group":
+        style_header(ws)
+    else:
+        style_header_simple(ws)
+    for column_letter, width in content.widths:
+        ws.column_dimensions[column_letter].width = width
+
+def write_group_sheet(ws, groups, inventory, jajaran=None):
+    write_content(ws, group_sheet_content(groups, inventory, jajaran))
+
+def write_unit_sheet(ws, inventory, unit=0, jajaran=None):
+    write_content(ws, unit_sheet_content(inventory, unit, jajaran))
+
+def new_workbook(writer="xml", memory_budget=None):
+    """Workbook kosong: XlsxWorkbook (XML langsung, isi sheet bisa di-spill sesuai memory_budget) atau openpyxl Workbook"""
+    if writer == "xml":
+        return XlsxWorkbook(memory_budget)
+    from openpyxl import Workbook
+    return Workbook()
+
+def index_sheet_content(entries):
+    """Isi sheet daftar isi: No. / Sheet / Nama Unit (layout satu header seperti sheet unit)"""
+    headers = [INDEX_HEADER]
+    items = [("row", [no, title, full_name]) for no, (title, full_name) in enumerate(entries, start=1)]
+    return SheetContent("unit", headers, items, _content_widths(headers, items))
+
+def add_index_sheet(wb, full_names):
+    """Sheet daftar isi di akhir workbook (dibuat ulang jika sudah ada): judul sheet → nama lengkap unit"""
+    if INDEX_SHEET_TITLE in wb.sheetnames:
+        wb.remove(wb[INDEX_SHEET_TITLE])
+    titles = list(wb.sheetnames)
+    if len(titles) < 2:
+        return None
+    ws = wb.create_sheet(INDEX_SHEET_TITLE)
+    write_content(ws, index_sheet_content([(title, full_names.get(title, title)) for title in titles]))
+    return ws
+
+def _jajaran(rollup, key):
+    """(rollup, key) jika node punya turunan, selain itu tanpa kolom Total Jajaran"""
+    return (rollup, key) if rollup is not None and rollup.has_children(key) else None
+
+# =========================================================
+# 5️⃣ Builder workbook per layout
+# =========================================================
+POLRES_LAYOUTS = ("unit", "polsek")
+SATKER_LAYOUTS = ("columns", "sheets")
+
+def add_polres_sheet(wb, data, polres_id, polres_name, layout, rollup=None, names=None):
+    """Sheet POLRES di workbook POLDA: 'unit' (POLRES saja) atau 'polsek' (POLRES + Polsek horizontal)"""
+    names = names or data.name_table()
+    polres_key = ("polres", int(polres_id))
+    if layout == "unit":
+        polres_inventory = data.unit_inventory("polres", polres_id)
+        if polres_inventory.empty:
+            return None
+        ws_polres = replace_sheet(wb, names.sheet("polres", polres_id, polres_name))
+        write_unit_sheet(ws_polres, polres_inventory, jajaran=_jajaran(rollup, polres_key))
+        return ws_polres
+
+    # Buat list unit: POLRES + Polsek-polseknya
+    df_polsek_list = data.polsek_list(polres_id)
+    units = [polres_name] + df_polsek_list["name"].tolist()
+    polres_polsek_inventory = data.polres_polsek_inventory(polres_id, df_polsek_list["id"].tolist())
+    if polres_polsek_inventory.empty:
+        return None
+    ws_polres = replace_sheet(wb, names.sheet("polres", polres_id, polres_name))
+    write_group_sheet(ws_polres, units, polres_polsek_inventory, jajaran=_jajaran(rollup, polres_key))
+    return ws_polres
+
+def build_polda_workbook(data, polda_id, polda_name, polda_sheet=True, polres_layout=None, polres_list=None, rollup=None, wb=None, verbose=False, names=None):
+    """Workbook POLDA: sheet Subsatker (opsional) + satu sheet per POLRES; wb lama = update sebagian"""
+    names = names or data.name_table()
+    polda_title = names.sheet("polda", polda_id, 'POLDA ' + polda_name)
+    if wb is None:
+        wb = data.new_workbook()
+        wb.active.title = polda_title
+        ws_polda = wb.active
+    elif polda_sheet:
+        # Update sebagian: sheet POLDA dibuat ulang (paling depan) agar Total Jajaran ikut POLRES yang diganti
+        ws_polda = replace_sheet(wb, polda_title)
+        wb.move_sheet(ws_polda, offset=-wb.index(ws_polda))
+        wb.active = 0
+
+    if polda_sheet:
+        df_subsatkers = data.subsatkers(polda_id)
+        subsatker_inventory = data.subsatker_inventory(polda_id, df_subsatkers["id"].tolist())
+        if not subsatker_inventory.empty:
+            write_group_sheet(ws_polda, df_subsatkers["name"].tolist(), subsatker_inventory, jajaran=_jajaran(rollup, ("polda", polda_id)))
+
+    if polres_layout:
+        if polres_list is None:
+            polres_list = data.polres_list(polda_id)
+        for _, polres_row in polres_list.iterrows():
+            if verbose:
+                print(f"  -> Processing POLRES: {polres_row['polres_name']}")
+            add_polres_sheet(wb, data, polres_row["polres_id"], polres_row["polres_name"], polres_layout, rollup=rollup, names=names)
+
+        # Daftar isi mencakup semua POLRES POLDA ini (update sebagian tetap memuat sheet lama)
+        add_index_sheet(wb, {**names.titles("polda", [polda_id]), **names.titles("polres", names.scope_ids("polres", polda_id))})
+    return wb
+
+def build_polsek_workbook(data, df_polsek_list, names=None, index_sheet=True):
+    """Workbook Jajaran Polsek satu POLRES: satu sheet per Polsek yang punya inventaris (+ daftar isi)"""
+    names = names or data.name_table()
+    wb_polsek = data.new_workbook()
+    if "Sheet" in wb_polsek.sheetnames:
+        wb_polsek.remove(wb_polsek["Sheet"])
+
+    for _, polsek_row in df_polsek_list.iterrows():
+        polsek_inventory = data.unit_inventory("polsek", polsek_row["id"])
+        if not polsek_inventory.counts.any():
+            continue
+
+        ws_polsek = wb_polsek.create_sheet(names.sheet("polsek", polsek_row["id"], polsek_row["name"]))
+        write_unit_sheet(ws_polsek, polsek_inventory)
+
+    if index_sheet:
+        add_index_sheet(wb_polsek, names.titles("polsek", df_polsek_list["id"]))
+    return wb_polsek
+
+def build_polres_workbook(data, polres_id, polres_name, rollup=None):
+    """Workbook satu POLRES (untuk service): sheet POLRES + Polsek lalu satu sheet per Polsek"""
+    names = data.name_table()
+    df_polsek_list = data.polsek_list(polres_id)
+    wb = build_polsek_workbook(data, df_polsek_list, names=names, index_sheet=False)
+    ws = add_polres_sheet(wb, data, polres_id, polres_name, "polsek", rollup=rollup, names=names)
+    if ws is not None:
+        wb.move_sheet(ws, offset=-wb.index(ws))
+        wb.active = 0
+    if not wb.sheetnames:
+        wb.create_sheet(names.sheet("polres", polres_id, polres_name))
+    add_index_sheet(wb, {**names.titles("polres", [polres_id]), **names.titles("polsek", df_polsek_list["id"])})
+    return wb
+
+# ----- Mode lazy: daftar isi POLDA + file per POLRES saat diminta -----
+TOC_HEADER = ["No.", "POLRES", "Jajaran Baik", "Jajaran Rusak Ringan", "Jajaran Rusak Berat", TOTAL_JAJARAN]
+
+def polres_file_name(polres_name):
+    return f"Inventaris_POLRES_{sanitize_name(polres_name, None)}.xlsx"
+
+def build_polda_toc_workbook(data, polda_id, polda_name, rollup, base_url, names=None):
+    """Workbook daftar isi POLDA (ringan, openpyxl): total jajaran per POLRES + hyperlink ke workbook POLRES di export_service
+
+    File POLRES lokal hanya ada untuk POLRES yang difilter, jadi hyperlink selalu ke service (dibuat saat diklik).
+    """
+    names = names or data.name_table()
+    polres_names = names.full_names["polres"]
+    polres_ids = sorted(names.scope_ids("polres", polda_id), key=lambda i: polres_names[i])
+
+    from openpyxl import Workbook
+    from openpyxl.styles import Alignment, Font
+
+    wb = Workbook()
+    ws = wb.active
+    ws.title = names.sheet("polda", polda_id, 'POLDA ' + polda_name)
+    ws.append(TOC_HEADER)
+    for no, polres_id in enumerate(polres_ids, start=1):
+        polres_name = polres_names[polres_id]
+        ws.append([no, polres_name] + jajaran_cells(rollup, ("polres", polres_id), rollup.equipment_ids, zero_to_empty))
+        cell = ws.cell(row=ws.max_row, column=2)
+        cell.hyperlink = f"{base_url.rstrip('/')}/polres/{polres_id}.xlsx"
+        cell.style = "Hyperlink"
+        ws.cell(row=ws.max_row, column=1).alignment = Alignment(horizontal="center", vertical="center")
+
+    ws.append(["", "Total POLDA"] + jajaran_cells(rollup, ("polda", polda_id), rollup.equipment_ids, zero_to_empty))
+    for cell in ws[ws.max_row]:
+        cell.font = Font(bold=True)
+
+    style_header_simple(ws)
+    auto_resize_columns(ws)
+    return wb
+
+class SatkerSheetCache:
+    """Isi sheet per satker dirender sekali (key: satker id) lalu disalin ke workbook satker itu dan semua ancestor-nya
+
+    Entri dilepas setelah workbook terakhir yang memakainya dibuat. Dengan --max-memory entri ikut
+    dihitung di MemoryBudget; entri yang tidak muat tidak disimpan dan dirender ulang dari matrix.
+    """
+
+    def __init__(self, data, satkers, rollup=None):
+        self.data = data
+        self.satkers = list(satkers)
+        self.rollup = rollup
+        self._inventory = None
+        self._content = {}
+        self._uses = self._workbook_uses()
+
+    def _workbook_uses(self):
+        """Jumlah workbook yang memuat sheet setiap satker: workbook satker itu + ancestor-nya di daftar"""
+        parents = {int(s['id']): None if pd.isna(s['parent_id']) else int(s['parent_id']) for s in self.satkers}
+        uses = {}
+        for satker_id in parents:
+            count, node = 0, satker_id
+            while node in parents:
+                count += 1
+                node = parents[node]
+            uses[satker_id] = count
+        return uses
+
+    def inventory(self):
+        # Satu query inventaris untuk semua satker: matrix [equipment, satker, baik/rr/rb]
+        if self._inventory is None:
+            self._inventory = self.data.satker_inventory([s['id'] for s in self.satkers])
+        return self._inventory
+
+    def content(self, satker_id):
+        satker_id = int(satker_id)
+        entry = self._content.get(satker_id)
+        if entry is None:
+            inventory = self.inventory()
+            unit = inventory.unit_position(satker_id)
+            entry = _CachedContent(unit_sheet_content(inventory, unit, jajaran=_jajaran(self.rollup, satker_id)))
+            budget = self.data.memory_budget
+            if budget is None or budget.hold(entry, budget.estimate(entry.content), entry.content):
+                self._content[satker_id] = entry
+
+        self._uses[satker_id] = self._uses.get(satker_id, 1) - 1
+        if self._uses[satker_id] <= 0 and self._content.pop(satker_id, None) is not None:
+            if self.data.memory_budget is not None:
+                self.data.memory_budget.drop(entry)
+        return entry.content
+
+class _CachedContent:
+    """Entri SatkerSheetCache (bisa di-weakref untuk MemoryBudget)"""
+    __slots__ = ("content", "__weakref__")
+
+    def __init__(self, content):
+        self.content = content
+
+def related_satkers(satker, df_all_satkers):
+    """Satker ini sendiri + semua children secara rekursif"""
+    return [satker] + get_all_children_recursive(satker['id'], df_all_satkers)
+
+def build_satker_workbook(data, satker, df_all_satkers, layout, rollup=None, names=None, sheet_cache=None):
+    """Workbook satu satker: 'columns' (satu sheet, kolom per satker) atau 'sheets' (sheet per satker, lewat SatkerSheetCache)"""
+    names = names or data.name_table()
+    all_related_satkers = related_satkers(satker, df_all_satkers)
+
+    if layout == "columns":
+        satker_names = [s['name'] for s in all_related_satkers]
+        satker_inventory = data.satker_inventory([s['id'] for s in all_related_satkers])
+
+        wb = data.new_workbook()
+        ws = wb.active
+        ws.title = names.sheet("satker", satker['id'], satker['name'])
+        write_group_sheet(ws, satker_names, satker_inventory, jajaran=_jajaran(rollup, int(satker['id'])))
+        return wb
+
+    if sheet_cache is None:
+        sheet_cache = SatkerSheetCache(data, all_related_satkers, rollup)
+    wb = data.new_workbook()
+    if "Sheet" in wb.sheetnames:
+        wb.remove(wb["Sheet"])
+
+    for sheet_satker in all_related_satkers:
+        # Buat sheet baru tanpa syarat (tanpa skip data kosong); isi diambil dari cache per satker_id
+        ws = wb.create_sheet(names.sheet("satker", sheet_satker['id'], sheet_satker['name']))
+        write_content(ws, sheet_cache.content(sheet_satker['id']))
+
+    add_index_sheet(wb, names.titles("satker", [s['id'] for s in all_related_satkers]))
+    return wb
@@ -0,0 +1,67 @@
+import os
+import argparse
+
+# =========================================================
+# 🎯 Parse Command Line Arguments
+# =========================================================
+parser = argparse.ArgumentParser(description='Export perubahan inventaris dibanding snapshot run sebelumnya')
+parser.add_argument('--output-dir', default='exports', help="Folder export (snapshot ada di <output-dir>/.snapshots)")
+parser.add_argument('--format', choices=['csv', 'xlsx', 'both'], default='both', help='Format file perubahan')
+parser.add_argument('--keep-baseline', action='store_true', help='Jangan ganti snapshot pembanding dengan kondisi saat ini')
+parser.add_argument('--refresh-aggregates', action='store_true', help='Refresh materialized view agregat inventaris (CONCURRENTLY); snapshot & diff selalu membaca tabel mentah')
+args = parser.parse_args()
+
+# Modul berat (pandas, SQLAlchemy, openpyxl) setelah argumen valid
+from openpyxl import Workbook
+
+from aggregates import refresh_for_export
+from export_core import ExportData, create_db_engine, style_header_simple, auto_resize_columns
+from output_manager import OutputManager
+from snapshot import InventorySnapshot, diff_snapshots, changes_frame, file_stamp, load_latest_snapshot, record_snapshot, snapshot_path
+
+def changes_workbook(df_changes):
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "Perubahan"
+    ws.append(list(df_changes.columns))
+    for row in df_changes.itertuples(index=False):
+        ws.append([None if value is None else value.item() if hasattr(value, "item") else value for value in row])
+    style_header_simple(ws)
+    auto_resize_columns(ws)
+    return wb
+
+# =========================================================
+# 1️⃣ Snapshot lama vs kondisi saat ini
+# =========================================================
+engine = create_db_engine()
+if args.refresh_aggregates:
+    refresh_for_export(engine)
+output = OutputManager(args.output_dir)
+
+previous = load_latest_snapshot(args.output_dir)
+current = InventorySnapshot.from_db(engine)
+
+if previous is None:
+    print(f"⚠️ Belum ada snapshot di {snapshot_path(args.output_dir)}, kondisi saat ini disimpan sebagai pembanding")
+else:
+    keys, old, new = diff_snapshots(previous, current)
+    print(f"🔍 {len(keys)} baris berubah sejak {previous.taken_at} ({len(previous)} → {len(current)} baris inventaris)")
+
+    # =========================================================
+    # 2️⃣ File perubahan (CSV / XLSX)
+    # =========================================================
+    df_changes = changes_frame(engine, ExportData(engine).equipment_catalog(), keys, old, new)
+    basename = os.path.join(args.output_dir, "changes", f"Perubahan_Inventaris_{file_stamp(previous.taken_at)}_{file_stamp(current.taken_at)}")
+
+    if args.format in ("csv", "both"):
+        output.write_bytes(f"{basename}.csv", df_changes.to_csv(index=False).encode("utf-8"))
+        print(f"✅ Saved {basename}.csv")
+    if args.format in ("xlsx", "both"):
+        output.save_workbook(changes_workbook(df_changes), f"{basename}.xlsx")
+        print(f"✅ Saved {basename}.xlsx")
+
+# Kondisi saat ini selalu masuk riwayat (--as-of); pembanding diganti kecuali --keep-baseline
+os.makedirs(os.path.dirname(snapshot_path(args.output_dir)), exist_ok=True)
+record_snapshot(args.output_dir, current, update_latest=not args.keep_baseline, fsync=output.fsync)
+if not args.keep_baseline:
+    print(f"📸 Snapshot pembanding diperbarui ({current.taken_at})")
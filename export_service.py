@@ -0,0 +1,175 @@
+import os
+import re
+import io
+import argparse
+import socketserver
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+from export_core import (
+    CachedExportData, create_db_engine,
+    build_polda_workbook, build_polda_toc_workbook, build_polres_workbook, build_satker_workbook,
+    POLRES_LAYOUTS, SATKER_LAYOUTS, WRITERS,
+)
+
+# =========================================================
+# 🎯 Parse Command Line Arguments
+# =========================================================
+parser = argparse.ArgumentParser(description='Service export inventaris (workbook per POLDA / POLRES / satker sesuai permintaan)')
+parser.add_argument('--host', default='127.0.0.1', help='Alamat HTTP (default hanya lokal)')
+parser.add_argument('--port', type=int, default=8765, help='Port HTTP')
+parser.add_argument('--unix-socket', help='Layani lewat Unix socket di path ini, bukan TCP')
+parser.add_argument('--polres-layout', choices=POLRES_LAYOUTS, default='polsek', help="Sheet POLRES di workbook POLDA: 'unit' (index.py) atau 'polsek' (index-new.py)")
+parser.add_argument('--satker-layout', choices=SATKER_LAYOUTS, default='columns', help="Workbook satker: 'columns' (index.py) atau 'sheets' (index-sheet-mabes.py)")
+parser.add_argument('--writer', choices=WRITERS, default='xml', help="Penulis file: 'xml' (SpreadsheetML langsung) atau 'openpyxl'")
+parser.add_argument('--hierarchy-ttl', type=int, default=3600, help='Umur cache katalog & hierarki (detik)')
+parser.add_argument('--inventory-ttl', type=int, default=300, help='Umur cache agregat inventaris (detik)')
+
+XLSX_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+UNIT_PATH = re.compile(r"^/(polda|polres|satker|toc)/(\d+)(?:\.xlsx)?$")
+
+# =========================================================
+# 📦 Pembuatan workbook di memori
+# =========================================================
+class ExportService:
+    """Membuat workbook satu unit dari data yang di-cache, langsung ke buffer memori"""
+
+    def __init__(self, data, polres_layout="polsek", satker_layout="columns"):
+        self.data = data
+        self.polres_layout = polres_layout
+        self.satker_layout = satker_layout
+
+    def _name(self, df, unit_id):
+        match = df[df["id"] == unit_id]
+        return None if match.empty else match["name"].iloc[0]
+
+    def polda(self, polda_id):
+        polda_name = self._name(self.data.poldas(), polda_id)
+        if polda_name is None:
+            return None
+        wb = build_polda_workbook(
+            self.data, polda_id, polda_name,
+            polres_layout=self.polres_layout,
+            rollup=self.data.polda_rollup(polda_id),
+        )
+        return f"Inventaris_POLDA_{polda_name}.xlsx", wb
+
+    def polres(self, polres_id):
+        polda_id = self.data.polda_of_polres(polres_id)
+        if polda_id is None:
+            return None
+        polres_name = self._name(self.data.hierarchy()["polres"], polres_id)
+        wb = build_polres_workbook(self.data, polres_id, polres_name, rollup=self.data.polda_rollup(polda_id))
+        return f"Inventaris_POLRES_{polres_name}.xlsx", wb
+
+    def toc(self, polda_id, base_url):
+        """Daftar isi POLDA: hyperlink setiap POLRES ke /polres/<id>.xlsx di service ini (dibuat saat diklik)"""
+        polda_name = self._name(self.data.poldas(), polda_id)
+        if polda_name is None:
+            return None
+        wb = build_polda_toc_workbook(self.data, polda_id, polda_name, self.data.polda_rollup(polda_id), base_url=base_url)
+        return f"Daftar_Isi_POLDA_{polda_name}.xlsx", wb
+
+    def satker(self, satker_id):
+        df_all_satkers = self.data.satker_tree()
+        match = df_all_satkers[df_all_satkers["id"] == satker_id]
+        if match.empty:
+            return None
+        rollup = self.data.satker_rollup(df_all_satkers)
+        wb = build_satker_workbook(self.data, match.iloc[0], df_all_satkers, self.satker_layout, rollup=rollup)
+        return f"{self.data.name_table().satker_file(satker_id)}.xlsx", wb
+
+    def render(self, level, unit_id, base_url=None):
+        """(nama file, bytes xlsx) atau None jika unit tidak ditemukan"""
+        result = self.toc(unit_id, base_url) if level == "toc" else getattr(self, level)(unit_id)
+        if result is None:
+            return None
+        filename, wb = result
+        buffer = io.BytesIO()
+        wb.save(buffer)
+        return filename, buffer.getvalue()
+
+# =========================================================
+# 🌐 HTTP handler
+# =========================================================
+class ExportRequestHandler(BaseHTTPRequestHandler):
+    service = None
+
+    def address_string(self):
+        # Klien Unix socket tidak punya (host, port)
+        return self.client_address[0] if self.client_address else "unix"
+
+    def _send(self, status, body, content_type="text/plain; charset=utf-8", headers=None):
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if path == "/health":
+            self._send(200, "ok\n")
+            return
+
+        match = UNIT_PATH.match(path)
+        if not match:
+            self._send(404, "Gunakan /polda/<id>.xlsx, /polres/<id>.xlsx, /satker/<id>.xlsx atau /toc/<polda_id>.xlsx\n")
+            return
+
+        level, unit_id = match.group(1), int(match.group(2))
+        try:
+            result = self.service.render(level, unit_id, base_url=f"http://{self.headers.get('Host', 'localhost')}")
+        except Exception as e:
+            self._send(500, f"Gagal membuat workbook: {e}\n")
+            return
+        if result is None:
+            self._send(404, f"{level} {unit_id} tidak ditemukan\n")
+            return
+
+        filename, body = result
+        self._send(200, body, XLSX_CONTENT_TYPE, {"Content-Disposition": f'attachment; filename="{filename}"'})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != "/invalidate":
+            self._send(404, "Tidak ditemukan\n")
+            return
+        what = parse_qs(url.query).get("what", ["all"])[0]
+        if what not in ("all", "inventory", "hierarchy"):
+            self._send(400, "what harus all, inventory atau hierarchy\n")
+            return
+        self.service.data.invalidate(what)
+        self._send(200, f"cache {what} dibuang\n")
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+def create_server(service, host="127.0.0.1", port=8765, unix_socket=None):
+    handler = type("BoundExportRequestHandler", (ExportRequestHandler,), {"service": service})
+    if unix_socket:
+        if os.path.exists(unix_socket):
+            os.remove(unix_socket)
+        return ThreadingUnixHTTPServer(unix_socket, handler)
+    return ThreadingHTTPServer((host, port), handler)
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+
+    data = CachedExportData(create_db_engine(), hierarchy_ttl=args.hierarchy_ttl, inventory_ttl=args.inventory_ttl, writer=args.writer)
+    service = ExportService(data, polres_layout=args.polres_layout, satker_layout=args.satker_layout)
+    server = create_server(service, args.host, args.port, args.unix_socket)
+
+    print(f"🌐 Export service di {args.unix_socket or f'http://{args.host}:{args.port}'}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if args.unix_socket and os.path.exists(args.unix_socket):
+            os.remove(args.unix_socket)
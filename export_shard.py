@@ -0,0 +1,263 @@
+import os
+import sys
+import time
+import argparse
+from output_manager import OutputManager
+from progress import ExportProgress, add_progress_arguments
+from sharding import PART_KINDS, ShardWorkspace, assign_shards, estimate_units, parse_shard, shard_loads
+from xlsx_writer import WRITERS
+
+# =========================================================
+# 🎯 Parse Command Line Arguments
+# =========================================================
+# Alur multi-node (layout index.py, folder output di storage bersama):
+#   1. export_shard.py plan --shards N     (sekali, di satu node)
+#   2. export_shard.py work --shard k/N    (di node mana pun, satu proses per shard)
+#   3. export_shard.py merge               (setelah semua shard selesai)
+# Dengan 'plan --hold-read-snapshot' proses plan tetap hidup menahan satu snapshot baca PostgreSQL
+# sampai semua unit selesai; semua worker mengimpor snapshot itu sehingga output satu titik waktu.
+parser = argparse.ArgumentParser(description='Export inventaris terbagi (sharded) antar node lewat manifest di storage bersama')
+parser.add_argument('--output-dir', default='exports', help="Folder export bersama (state shard di <output-dir>/.shards)")
+parser.add_argument('--writer', choices=WRITERS, default='xml', help="Penulis file: 'xml' (SpreadsheetML langsung, cepat) atau 'openpyxl'")
+subparsers = parser.add_subparsers(dest='command', required=True)
+
+plan_parser = subparsers.add_parser('plan', help='Susun manifest unit output + estimasi biaya, bagi menjadi N shard')
+plan_parser.add_argument('--shards', type=int, required=True, help='Jumlah shard (worker)')
+plan_parser.add_argument('--refresh-aggregates', action='store_true', help='Refresh materialized view agregat inventaris sekali sebelum worker mulai')
+plan_parser.add_argument('--hold-read-snapshot', action='store_true', help='Buka snapshot baca (PostgreSQL), catat id-nya di manifest dan tahan transaksinya sampai semua unit selesai; worker mengimpor snapshot yang sama')
+plan_parser.add_argument('--poll-interval', type=float, default=10.0, help='Jeda cek progress shard saat menahan snapshot (detik)')
+
+work_parser = subparsers.add_parser('work', help='Kerjakan satu shard dari manifest')
+work_parser.add_argument('--shard', type=parse_shard, required=True, help="Shard yang dikerjakan, format k/N (mis. 2/4)")
+work_parser.add_argument('--force', action='store_true', help='Ambil alih klaim shard (worker sebelumnya mati); unit yang sudah selesai tetap dilewati')
+work_parser.add_argument('--no-read-snapshot', action='store_true', help='Tanpa snapshot baca: setiap query membaca data terbaru (manifest tanpa snapshot plan saja)')
+add_progress_arguments(work_parser)
+
+merge_parser = subparsers.add_parser('merge', help='Gabungkan part sheet menjadi workbook POLDA setelah semua shard selesai')
+merge_parser.add_argument('--clean', action='store_true', help='Hapus folder .shards setelah merge berhasil')
+args = parser.parse_args()
+
+from read_snapshot import open_for_export
+from export_core import (
+    ExportData, create_db_engine, write_content, add_index_sheet, add_polres_sheet,
+    build_polda_workbook, build_polsek_workbook, build_satker_workbook,
+)
+
+engine = create_db_engine()
+output_dir = args.output_dir
+os.makedirs(output_dir, exist_ok=True)
+output = OutputManager(output_dir)
+workspace = ShardWorkspace(output_dir, fsync=output.fsync)
+
+def polda_dir(polda_name):
+    return os.path.join(output_dir, 'POLDA ' + polda_name)
+
+def load_manifest():
+    try:
+        return workspace.manifest()
+    except ValueError as e:
+        print(f"❌ {e}", file=sys.stderr)
+        sys.exit(1)
+
+# =========================================================
+# 1️⃣ PLAN
+# =========================================================
+def plan():
+    from aggregates import refresh_for_export
+    from sharding import plan_units
+
+    if args.refresh_aggregates:
+        refresh_for_export(engine)
+    read_snapshot = open_for_export(engine, enabled=args.hold_read_snapshot)
+    data = ExportData(engine, writer=args.writer, read_snapshot=read_snapshot)
+    poldas, units = plan_units(data)
+
+    # Durasi run sebelumnya (jika belum di-merge) ikut dicatat sebelum state lama dihapus
+    timings = workspace.record_timings() or workspace.timings()
+    workspace.reset()
+    units = assign_shards(estimate_units(units, timings), args.shards)
+    manifest = workspace.write_manifest(poldas, units, args.shards, read_snapshot=read_snapshot and read_snapshot.snapshot_id)
+
+    measured = sum(1 for u in units if u["unit"] in timings["units"])
+    print(f"📋 Manifest: {len(units)} unit ({measured} dengan durasi terukur), {args.shards} shard → {os.path.join(workspace.root, 'manifest.json')}")
+    loads = shard_loads(manifest["units"], args.shards)
+    for k, load in enumerate(loads, start=1):
+        shard_units = [u for u in manifest["units"] if u["shard"] == k]
+        print(f"   ➜ Shard {k}/{args.shards}: {len(shard_units)} unit, estimasi {load:,.2f}")
+    ideal = max(sum(loads) / args.shards, max(u["estimate"] for u in units) if units else 0)
+    print(f"   ➜ Makespan estimasi {max(loads):,.2f} vs ideal {ideal:,.2f} ({max(loads) / ideal if ideal else 1:.2f}×)")
+    if read_snapshot is not None:
+        hold_read_snapshot(read_snapshot, manifest)
+
+def hold_read_snapshot(read_snapshot, manifest):
+    """Transaksi pengekspor harus tetap terbuka selama worker mengimpor snapshot-nya"""
+    unit_keys = {u["unit"] for u in manifest["units"]}
+    print(f"🔒 Snapshot {read_snapshot.snapshot_id} ditahan sampai {len(unit_keys)} unit selesai (Ctrl+C untuk melepas)")
+    try:
+        reported = None
+        while True:
+            done = len(unit_keys & workspace.completed_units(manifest["shards"]).keys())
+            if done >= len(unit_keys):
+                break
+            if done != reported:
+                print(f"  ⏳ {done}/{len(unit_keys)} unit selesai")
+                reported = done
+            time.sleep(args.poll_interval)
+        print("🔓 Semua unit selesai, snapshot dilepas; lanjutkan dengan merge")
+    except KeyboardInterrupt:
+        print("⚠️ Snapshot dilepas sebelum semua unit selesai; worker berikutnya tidak bisa mengimpornya")
+    finally:
+        read_snapshot.close()
+
+# =========================================================
+# 2️⃣ WORK
+# =========================================================
+class ShardWorker:
+    """Mengerjakan unit satu shard dengan builder yang sama seperti index.py"""
+
+    def __init__(self, manifest, read_snapshot=None):
+        # Part sheet diambil dari XlsxSheet.content, jadi worker selalu memakai writer xml
+        self.data = ExportData(engine, writer="xml", read_snapshot=read_snapshot)
+        self.file_data = ExportData(engine, writer=args.writer, read_snapshot=read_snapshot)
+        self.names = self.data.name_table()
+        self.polda_names = {p["id"]: p["name"] for p in manifest["poldas"]}
+        self._polda_rollups = {}
+        self._satkers = None
+
+    def polda_rollup(self, polda_id):
+        if polda_id not in self._polda_rollups:
+            self._polda_rollups[polda_id] = self.data.polda_rollup(polda_id)
+        return self._polda_rollups[polda_id]
+
+    def satkers(self):
+        # (pohon satker, rollup) dimuat sekali per worker
+        if self._satkers is None:
+            df_all_satkers = self.data.satker_tree()
+            self._satkers = (df_all_satkers, self.data.satker_rollup(df_all_satkers))
+        return self._satkers
+
+    def write_part(self, unit, ws):
+        size = workspace.write_part(unit["unit"], None if ws is None else ws.title, None if ws is None else ws.content)
+        if output.progress is not None:
+            output.progress.record_output(0 if ws is None else ws.rows, size)
+
+    def run(self, unit):
+        kind, unit_id, polda_id = unit["kind"], unit["id"], unit["polda_id"]
+        if kind == "polda":
+            wb = build_polda_workbook(self.data, unit_id, unit["name"], rollup=self.polda_rollup(polda_id), names=self.names)
+            self.write_part(unit, wb.active)
+        elif kind == "polres":
+            ws = add_polres_sheet(self.data.new_workbook(), self.data, unit_id, unit["name"], "unit", rollup=self.polda_rollup(polda_id), names=self.names)
+            self.write_part(unit, ws)
+        elif kind == "polsek":
+            df_polsek_list = self.file_data.polsek_list(unit_id)
+            if df_polsek_list.empty:
+                return
+            wb_polsek = build_polsek_workbook(self.file_data, df_polsek_list, names=self.names)
+            if wb_polsek.sheetnames:
+                polsek_output_dir = os.path.join(polda_dir(self.polda_names[polda_id]), f"Jajaran Polsek POLDA {self.polda_names[polda_id]}")
+                output.save_workbook(wb_polsek, os.path.join(polsek_output_dir, f"Inventaris_Polsek_{unit['name']}.xlsx"))
+        elif kind == "satker":
+            df_all_satkers, satker_rollup = self.satkers()
+            satker = df_all_satkers[df_all_satkers["id"] == unit_id].iloc[0]
+            wb = build_satker_workbook(self.file_data, satker, df_all_satkers, "columns", rollup=satker_rollup, names=self.names)
+            output.save_workbook(wb, os.path.join(output_dir, "satker_mabes", f"{self.names.satker_file(unit_id)}.xlsx"))
+
+def work():
+    # Laporan progress shard ini saja; worker di node lain melapor sendiri (baris JSON memuat host & pid)
+    export_progress = ExportProgress.from_args(args)
+    output.progress = export_progress
+    # --quiet: print di bawah ini dibuang, stdout hanya berisi progress JSON
+    with export_progress.quiet_stdout():
+        k, n_shards = args.shard
+        manifest = load_manifest()
+        if manifest["shards"] != n_shards:
+            print(f"❌ Manifest dibuat untuk {manifest['shards']} shard, bukan {n_shards}", file=sys.stderr)
+            sys.exit(1)
+
+        owner = workspace.claim(k, force=args.force)
+        if owner is None:
+            print(f"⏭️ Shard {k}/{n_shards} sudah diklaim: {workspace.claim_owner(k)} (pakai --force jika worker itu mati)", file=sys.stderr)
+            sys.exit(2)
+
+        read_snapshot = None
+        try:
+            # Snapshot dari plan --hold-read-snapshot diimpor; tanpa itu worker membaca snapshot sendiri
+            snapshot_id = manifest.get("read_snapshot")
+            try:
+                read_snapshot = open_for_export(engine, enabled=snapshot_id is not None or not args.no_read_snapshot, snapshot_id=snapshot_id)
+            except Exception as e:
+                print(f"❌ Snapshot {snapshot_id} tidak bisa diimpor (proses 'plan --hold-read-snapshot' sudah berhenti?): {e}", file=sys.stderr)
+                sys.exit(1)
+            progress = workspace.progress(k)
+            # Unit terbesar dulu (LPT), urutan sheet tetap diatur merge
+            shard_units = sorted((u for u in manifest["units"] if u["shard"] == k), key=lambda u: -u.get("estimate", u["cost"]))
+            print(f"🚀 Shard {k}/{n_shards} di {owner['host']} (pid {owner['pid']}): {len(shard_units)} unit")
+            export_progress.plan([u["unit"] for u in shard_units], skip=lambda unit: unit in progress["units"])
+
+            worker = ShardWorker(manifest, read_snapshot)
+            for unit in shard_units:
+                if unit["unit"] in progress["units"]:
+                    print(f"  ⏭️ Skip (sudah selesai): {unit['unit']} {unit['name']}")
+                    continue
+                start = time.perf_counter()
+                worker.run(unit)
+                progress["units"][unit["unit"]] = round(time.perf_counter() - start, 4)
+                workspace.save_progress(k, progress)
+                print(f"  ✅ {unit['unit']} {unit['name']} ({progress['units'][unit['unit']]:.2f}s)")
+                export_progress.unit_done(unit["unit"])
+
+            progress["done"] = True
+            workspace.save_progress(k, progress)
+            export_progress.finish()
+            print(f"🎉 Shard {k}/{n_shards} selesai")
+        finally:
+            if read_snapshot is not None:
+                read_snapshot.close()
+            workspace.release(k)
+
+# =========================================================
+# 3️⃣ MERGE
+# =========================================================
+def merge():
+    manifest = load_manifest()
+    completed = workspace.completed_units(manifest["shards"])
+    missing = [u["unit"] for u in manifest["units"] if u["unit"] not in completed]
+    if missing:
+        print(f"❌ {len(missing)} unit belum selesai, mis. {', '.join(missing[:5])}", file=sys.stderr)
+        sys.exit(1)
+
+    data = ExportData(engine, writer=args.writer)
+    names = data.name_table()
+    for polda in manifest["poldas"]:
+        polda_id, polda_name = polda["id"], polda["name"]
+        polda_units = [u["unit"] for u in manifest["units"] if u["kind"] in PART_KINDS and u["polda_id"] == polda_id]
+
+        # Urutan sheet sama seperti build_polda_workbook: POLDA, POLRES (urut manifest), daftar isi
+        wb = data.new_workbook()
+        for i, unit in enumerate(polda_units):
+            title, content = workspace.read_part(unit)
+            if i == 0:
+                wb.active.title = title
+                ws = wb.active
+            elif content is None:
+                continue
+            else:
+                ws = wb.create_sheet(title)
+            if content is not None:
+                write_content(ws, content)
+        add_index_sheet(wb, {**names.titles("polda", [polda_id]), **names.titles("polres", names.scope_ids("polres", polda_id))})
+
+        polda_filename = os.path.join(polda_dir(polda_name), f"Inventaris_POLDA_{polda_name}.xlsx")
+        output.save_workbook(wb, polda_filename)
+        print(f"✅ Saved {polda_filename}")
+
+    workspace.record_timings()
+
+    if args.clean:
+        import shutil
+        shutil.rmtree(workspace.root)
+        print(f"🧹 {workspace.root} dihapus")
+    print("\n🎉 Merge selesai!")
+
+{"plan": plan, "work": work, "merge": merge}[args.command]()
@@ -1,14 +1,13 @@
 import os
 import sys
 import argparse
-import pandas as pd
-import psycopg2
-from dotenv import load_dotenv
-from openpyxl import Workbook
-from openpyxl.utils.dataframe import dataframe_to_rows
-from openpyxl.styles import Alignment, Font
-from openpyxl.utils import get_column_letter
-from sqlalchemy import create_engine
+import contextlib
+from checkpoint import CheckpointJournal
+from output_manager import OutputManager, PACKAGE_FORMATS
+from progress import ExportProgress, add_progress_arguments
+from selection import ExportSelection, add_selection_arguments, open_workbook_for_update
+from timestamps import file_stamp, parse_as_of
+from xlsx_writer import WRITERS, MemoryBudget, parse_memory_size
 
 # =========================================================
 # 🎯 Parse Command Line Arguments
@@ -18,8 +17,24 @@ parser.add_argument('--polda-only', action='store_true', help='Export hanya data
 parser.add_argument('--polres-only', action='store_true', help='Export hanya data POLRES')
 parser.add_argument('--polsek-only', action='store_true', help='Export hanya data POLSEK')
 parser.add_argument('--satker-mabes-only', action='store_true', help='Export hanya data Satker Mabes')
+parser.add_argument('--resume', action='store_true', help='Lanjutkan run sebelumnya, lewati unit yang sudah selesai')
+parser.add_argument('--max-concurrent-writes', type=int, default=2, help='Batas jumlah file yang ditulis bersamaan')
+parser.add_argument('--package', choices=PACKAGE_FORMATS, help='Paket setiap folder POLDA / satker_mabes menjadi satu file zip/tar')
+parser.add_argument('--writer', choices=WRITERS, default='xml', help="Penulis file: 'xml' (SpreadsheetML langsung, cepat) atau 'openpyxl'")
+parser.add_argument('--as-of', type=parse_as_of, help="Export kondisi inventaris pada tanggal 'YYYY-MM-DD' atau 'YYYY-MM-DD HH:MM:SS' dari riwayat snapshot")
+parser.add_argument('--refresh-aggregates', action='store_true', help='Refresh materialized view agregat inventaris (CONCURRENTLY) sebelum export; lihat aggregates.py')
+parser.add_argument('--max-memory', type=parse_memory_size, help="Batas perkiraan memori isi sheet (mis. 512M, 3G); sheet yang melewati batas di-spill ke file sementara dan digabung saat save")
+parser.add_argument('--no-read-snapshot', action='store_true', help='Jangan membaca seluruh run dari satu snapshot REPEATABLE READ (PostgreSQL); setiap query membaca data terbaru')
+add_selection_arguments(parser)
+add_progress_arguments(parser)
 args = parser.parse_args()
 
+# --quiet: log per unit di bawah ini dibuang (sampai quiet.close() di akhir), stdout hanya berisi progress JSON;
+# pesan error (❌) ke stderr
+progress = ExportProgress.from_args(args)
+quiet = contextlib.ExitStack()
+quiet.enter_context(progress.quiet_stdout())
+
 # Tentukan mode export
 export_all = not (args.polda_only or args.polres_only or args.polsek_only or args.satker_mabes_only)
 export_polda = export_all or args.polda_only
@@ -27,6 +42,12 @@ export_polres = export_all or args.polres_only
 export_polsek = export_all or args.polsek_only
 export_satker_mabes = export_all or args.satker_mabes_only
 
+# Filter id/nama: tanpa flag level, hanya level yang difilter yang di-export
+selection = ExportSelection.from_args(args)
+if export_all and selection.active:
+    export_polda = export_polres = export_polsek = selection.polda_active
+    export_satker_mabes = selection.satker_active
+
 print("🎯 Mode Export:")
 if export_all:
     print("   ➜ ALL (POLDA, POLRES, POLSEK, Satker Mabes)")
@@ -35,222 +56,138 @@ else:
     if export_polres: print("   ➜ POLRES")
     if export_polsek: print("   ➜ POLSEK")
     if export_satker_mabes: print("   ➜ Satker Mabes")
+if selection.active:
+    print(f"   ➜ Filter: { {k: v for k, v in selection.describe().items() if v} }")
 print()
 
 # =========================================================
-# 1️⃣ Load konfigurasi dari .env
+# 1️⃣ Koneksi database dari .env
 # =========================================================
-load_dotenv()
+# pandas/numpy & SQLAlchemy baru dimuat setelah argumen valid (--help / argumen salah tetap instan);
+# openpyxl hanya dimuat untuk --writer openpyxl atau update sebagian
+from aggregates import refresh_for_export
+from read_snapshot import open_for_export
+from snapshot import SnapshotStore, take_snapshot
+from export_core import ExportData, SnapshotExportData, create_db_engine, get_parent_chain, build_polda_workbook, build_polsek_workbook, build_satker_workbook, SatkerSheetCache
 
-DB_HOST = os.getenv("DB_HOST")
-DB_PORT = os.getenv("DB_PORT")
-DB_NAME = os.getenv("DB_DATABASE")
-DB_USER = os.getenv("DB_USERNAME")
-DB_PASS = os.getenv("DB_PASSWORD")
+engine = create_db_engine()
+if args.refresh_aggregates:
+    refresh_for_export(engine)
+# Satu snapshot baca untuk seluruh run (dibuka setelah refresh agar view terbaru ikut terbaca)
+read_snapshot = open_for_export(engine, enabled=not args.no_read_snapshot)
 
-engine = create_engine(f"postgresql://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}")
-
-# Direktori output utama
+# Direktori output utama (--as-of: subfolder sendiri, inventaris dari riwayat snapshot)
 output_dir = "exports"
-os.makedirs(output_dir, exist_ok=True)
 
-# =========================================================
-# 2️⃣ Fungsi bantu
-# =========================================================
-def style_header_simple(ws):
-    """Fungsi styling baru untuk header tunggal"""
-    for cell in ws[1]:
-        cell.font = Font(bold=True)
-        cell.alignment = Alignment(horizontal="center", vertical="center")
-    ws.freeze_panes = "A2"
+# --max-memory: isi sheet di atas batas di-spill ke file sementara di folder exports (bukan /tmp yang bisa tmpfs)
+memory_budget = None
+if args.max_memory:
+    if args.writer != "xml":
+        print("⚠️ --max-memory hanya didukung writer 'xml', beralih dari openpyxl")
+        args.writer = "xml"
+    memory_budget = MemoryBudget(args.max_memory, spill_dir=output_dir)
 
-def auto_resize_columns(ws):
-    for column in ws.columns:
-        max_length = 0
-        column_letter = get_column_letter(column[0].column)
-        for cell in column:
-            try:
-                if cell.value:
-                    cell_length = len(str(cell.value))
-                    if cell_length > max_length:
-                        max_length = cell_length
-            except:
-                pass
-        adjusted_width = min(max_length + 2, 50)
-        ws.column_dimensions[column_letter].width = adjusted_width
+if args.as_of:
+    try:
+        as_of_snapshot = SnapshotStore(output_dir).as_of(args.as_of)
+    except ValueError as e:
+        print(f"❌ {e}", file=sys.stderr)
+        sys.exit(1)
+    print(f"🕰️ Inventaris per {args.as_of} (snapshot {as_of_snapshot.taken_at})\n")
+    output_dir = os.path.join(output_dir, f"as_of_{file_stamp(args.as_of)}")
+    data = SnapshotExportData(engine, as_of_snapshot, selection, writer=args.writer, memory_budget=memory_budget, read_snapshot=read_snapshot)
+else:
+    data = ExportData(engine, selection, writer=args.writer, memory_budget=memory_budget, read_snapshot=read_snapshot)
+os.makedirs(output_dir, exist_ok=True)
 
-def zero_to_empty(value):
-    return "" if value == 0 else value
+# Output manager (tulis atomik + batas tulis paralel) dan checkpoint journal untuk --resume
+# (mode memuat nama script: layout file berbeda per script, journal script lain tidak berlaku)
+output = OutputManager(output_dir, max_concurrent_writes=args.max_concurrent_writes, progress=progress)
+journal = CheckpointJournal(
+    output_dir,
+    {"script": os.path.basename(__file__), "polda": export_polda, "polres": export_polres, "polsek": export_polsek, "satker_mabes": export_satker_mabes, "selection": selection.describe()},
+    resume=args.resume,
+    output=output,
+)
 
-def sanitize_name(name):
-    return (name
-        .replace('/', '-')
-        .replace('\\', '-')
-        .replace('*', '')
-        .replace('?', '')
-        .replace(':', '')
-        .replace('[', '')
-        .replace(']', '')
-        .replace('.', '')
-        .strip()
-    )
+# =========================================================
+# 2️⃣ Nama sheet & file (tanpa titik, sisi kosong dibuang)
+# =========================================================
+names = data.name_table(strip_dots=True)
 
 # =========================================================
 # 🏛️ FUNGSI UNTUK SATKER MABES (TELAH DIPERBARUI)
 # =========================================================
-def get_all_children_recursive(satker_id, all_satkers_df):
-    """Mendapatkan semua child dari satker secara rekursif (depth-first)"""
-    children = []
-    direct_children = all_satkers_df[all_satkers_df['parent_id'] == satker_id].sort_values('name')
-    
-    for _, child in direct_children.iterrows():
-        children.append(child)
-        grandchildren = get_all_children_recursive(child['id'], all_satkers_df)
-        children.extend(grandchildren)
-    
-    return children
-
-def get_parent_chain(satker_id, all_satkers_df):
-    """Mendapatkan chain parent dari satker ke atas (untuk nama file)"""
-    chain = []
-    current_id = satker_id
-    
-    while current_id is not None:
-        satker_match = all_satkers_df[all_satkers_df['id'] == current_id]
-        if satker_match.empty:
-            print(f"    ⚠️ Warning: Satker dengan ID {current_id} tidak ditemukan")
-            break
-        satker = satker_match.iloc[0]
-        chain.append(satker['name'])
-        parent_id = satker['parent_id']
-        current_id = None if pd.isna(parent_id) else int(parent_id)
-    return list(reversed(chain))
-
-def export_satker_mabes():
+def export_satker_mabes_data(df_all_satkers):
     """Export data Satker Mabes dengan hierarki menjadi sheet, tanpa skip data kosong."""
     print("🏛️ Processing Satker Mabes...")
     
     satker_output_dir = os.path.join(output_dir, 'satker_mabes')
     os.makedirs(satker_output_dir, exist_ok=True)
     
-    satkers_query = "SELECT id, name, level, parent_id FROM satker_mabes ORDER BY level, name;"
-    df_all_satkers = pd.read_sql(satkers_query, engine)
-    
     if df_all_satkers.empty:
         print("⚠️ Tidak ada data Satker Mabes")
         return
-    
+
+    # Rollup seluruh pohon satker sekali untuk kolom jajaran di setiap sheet
+    satker_rollup = data.satker_rollup(df_all_satkers)
+
+    # Sheet setiap satker dirender sekali lalu disalin ke workbook semua ancestor-nya
+    selected_satkers = [satker for _, satker in df_all_satkers.iterrows() if satker['selected']]
+    sheet_cache = SatkerSheetCache(data, selected_satkers, satker_rollup)
+
     for _, satker in df_all_satkers.iterrows():
+        if not satker['selected']:
+            continue
         satker_id = satker['id']
         
+        satker_unit = f"satker:{satker_id}"
+        if journal.is_done(satker_unit):
+            print(f"  ⏭️ Skip (sudah selesai): {satker['name']}")
+            continue
+        
         parent_chain = get_parent_chain(satker_id, df_all_satkers)
         file_display_name = '_'.join(parent_chain)
         
         print(f"  -> Processing File: {file_display_name}.xlsx")
         
-        all_related_satkers = [satker]
-        children = get_all_children_recursive(satker_id, df_all_satkers)
-        all_related_satkers.extend(children)
-        
-        satker_ids = [s['id'] for s in all_related_satkers]
-        if not satker_ids:
-            continue
-        satker_ids_str = ','.join(map(str, satker_ids))
-        
-        # 🔧 FIX: Tambahkan satker_id di SELECT untuk identifier unik
-        inventory_query = f"""
-            WITH relevant_satkers AS (
-                SELECT id, name FROM satker_mabes WHERE id IN ({satker_ids_str})
-            )
-            SELECT
-                et.id AS penggolongan_id,
-                et.name AS penggolongan,
-                e.name AS jenis_materiil,
-                e."order",
-                rs.id AS satker_id,
-                rs.name AS satker_name,
-                COALESCE(inv.baik, 0) AS baik,
-                COALESCE(inv.rusak_ringan, 0) AS rusak_ringan,
-                COALESCE(inv.rusak_berat, 0) AS rusak_berat
-            FROM equipments e
-            JOIN equipment_types et ON et.id = e.id_equipment_type
-            CROSS JOIN relevant_satkers rs
-            LEFT JOIN (
-                SELECT
-                    ei.equipment_id,
-                    ei.owner_id,
-                    SUM(ei.baik) AS baik,
-                    SUM(ei.rusak_ringan) AS rusak_ringan,
-                    SUM(ei.rusak_berat) AS rusak_berat
-                FROM equipment_inventories ei
-                WHERE ei.owner_type = 'App\\Models\\SatkerMabes' AND ei.owner_id IN ({satker_ids_str})
-                GROUP BY ei.equipment_id, ei.owner_id
-            ) AS inv ON e.id = inv.equipment_id AND rs.id = inv.owner_id
-            WHERE e.deleted_at IS NULL
-            ORDER BY et.id, e."order", rs.id;
-        """
-        df_inventory = pd.read_sql(inventory_query, engine)
-
-        wb = Workbook()
-        if "Sheet" in wb.sheetnames:
-            wb.remove(wb["Sheet"])
-        
-        for sheet_satker in all_related_satkers:
-            sheet_id = sheet_satker['id']  # 🔧 FIX: Gunakan ID
-            sheet_name = sheet_satker['name']
-            
-            # 🔧 FIX: Filter berdasarkan satker_id, bukan satker_name
-            df_sheet_data = df_inventory[df_inventory['satker_id'] == sheet_id].copy()
-            
-            # Buat sheet baru tanpa syarat
-            ws = wb.create_sheet(sanitize_name(sheet_name)[:31])
-            
-            header = ["No.", "Jenis Materil", "Baik", "Rusak Ringan", "Rusak Berat", "Jumlah"]
-            ws.append(header)
-            
-            current_row = 2
-            if not df_sheet_data.empty:
-                for penggolongan, group_df in df_sheet_data.groupby("penggolongan", sort=False):
-                    ws.merge_cells(start_row=current_row, start_column=2, end_row=current_row, end_column=len(header))
-                    ws.cell(row=current_row, column=2, value=penggolongan).font = Font(bold=True)
-                    current_row += 1
-                    
-                    for jenis_no, (_, row) in enumerate(group_df.iterrows(), start=1):
-                        baik = int(row["baik"])
-                        rr = int(row["rusak_ringan"])
-                        rb = int(row["rusak_berat"])
-                        jumlah = baik + rr + rb
-                        
-                        row_data = [
-                            jenis_no, 
-                            row["jenis_materiil"], 
-                            zero_to_empty(baik), 
-                            zero_to_empty(rr), 
-                            zero_to_empty(rb), 
-                            zero_to_empty(jumlah)
-                        ]
-                        ws.append(row_data)
-                        ws.cell(row=current_row, column=1).alignment = Alignment(horizontal="center", vertical="center")
-                        current_row += 1
-            
-            style_header_simple(ws)
-            auto_resize_columns(ws)
+        # Satu sheet per satker (satker ini + semua children), tanpa skip data kosong
+        wb = build_satker_workbook(data, satker, df_all_satkers, "sheets", rollup=satker_rollup, names=names, sheet_cache=sheet_cache)
 
         # Simpan file tanpa syarat
-        print(file_display_name)
-        filename = os.path.join(satker_output_dir, f"{sanitize_name(file_display_name)}.xlsx")
-        wb.save(filename)
+        filename = os.path.join(satker_output_dir, f"{names.satker_file(satker_id)}.xlsx")
+        journal.save(wb, satker_unit, filename)
         print(f"    ✅ Saved: {filename}")
             
+    if args.package:
+        archive = output.package_folder(satker_output_dir, args.package)
+        print(f"  📦 Packaged: {archive}")
+    
     print("✅ Satker Mabes export selesai!\n")
 
 
+# =========================================================
+# 📈 Rencana unit (total di depan untuk progress & ETA)
+# =========================================================
+# Daftar POLRES per POLDA dan pohon satker dimuat sekali di sini lalu dipakai loop export
+poldas = data.poldas() if export_polda or export_polres or export_polsek else None
+polres_lists = {polda_id: data.polres_list(polda_id) for polda_id in poldas["id"]} if poldas is not None else {}
+# Satker terpilih (selected) + ancestor-nya untuk nama file; tanpa filter = semua satker
+df_all_satkers = data.satker_tree() if export_satker_mabes else None
+
+planned_units = []
+if export_polda:
+    planned_units += [f"polda:{polda_id}" for polda_id in polres_lists]
+if export_polsek:
+    planned_units += [f"polsek:{polres_id}" for df_polres_list in polres_lists.values() for polres_id in df_polres_list["polres_id"]]
+if export_satker_mabes:
+    planned_units += [f"satker:{satker_id}" for satker_id in df_all_satkers.loc[df_all_satkers["selected"].astype(bool), "id"]]
+progress.plan(planned_units, skip=journal.is_done)
+
 # =========================================================
 # 3️⃣ EXPORT POLDA, POLRES, POLSEK (Kode Original, tidak diubah)
 # =========================================================
 if export_polda or export_polres or export_polsek:
-    poldas = pd.read_sql("SELECT id, name FROM polda ORDER BY id", engine)
-    
     for _, polda in poldas.iterrows():
         polda_id = polda["id"]
         polda_name = polda["name"]
@@ -265,211 +202,84 @@ if export_polda or export_polres or export_polsek:
         if export_polsek:
             os.makedirs(polsek_output_dir, exist_ok=True)
         
-        subsatkers_list_query = f"SELECT name FROM subsatker_poldas WHERE polda_id = {polda_id} ORDER BY name;"
-        df_subsatkers_list = pd.read_sql(subsatkers_list_query, engine)
-        subsatkers = df_subsatkers_list["name"].tolist()
+        df_polres_list = polres_lists[polda_id]
         
-        polres_list_query = f"SELECT id AS polres_id, name AS polres_name FROM polres WHERE polda_id = {polda_id} ORDER BY name;"
-        df_polres_list = pd.read_sql(polres_list_query, engine)
+        polda_unit = f"polda:{polda_id}"
+        polda_done = export_polda and journal.is_done(polda_unit)
+        if polda_done:
+            print(f"⏭️ Skip file POLDA (sudah selesai): {polda_name}")
         
-        if export_polda:
-            def style_header_polda(ws):
-                for row_num in [1, 2]:
-                    for cell in ws[row_num]:
-                        cell.font = Font(bold=True)
-                        cell.alignment = Alignment(horizontal="center", vertical="center", wrap_text=True)
-                ws.freeze_panes = "C3"
-
-            subsatker_query = f"""
-                SELECT
-                    et.id AS penggolongan_id, et.name AS penggolongan,
-                    e.name AS jenis_materiil, e."order",
-                    inv.subsatker_name,
-                    COALESCE(inv.baik, 0) AS baik,
-                    COALESCE(inv.rusak_ringan, 0) AS rusak_ringan,
-                    COALESCE(inv.rusak_berat, 0) AS rusak_berat
-                FROM equipments e
-                JOIN equipment_types et ON et.id = e.id_equipment_type
-                LEFT JOIN (
-                    SELECT
-                        ei.equipment_id, sp.name AS subsatker_name,
-                        SUM(ei.baik) AS baik, SUM(ei.rusak_ringan) AS rusak_ringan, SUM(ei.rusak_berat) AS rusak_berat
-                    FROM equipment_inventories ei
-                    JOIN subsatker_poldas sp ON sp.id = ei.owner_id
-                    WHERE ei.owner_type = 'App\\Models\\SubsatkerPolda' AND sp.polda_id = {polda_id}
-                    GROUP BY ei.equipment_id, sp.name
-                ) AS inv ON e.id = inv.equipment_id
-                WHERE e.deleted_at is null
-                ORDER BY et.id, e."order";
-            """
-            df_subsatker = pd.read_sql(subsatker_query, engine)
-            
-            wb_polda = Workbook()
-            ws_polda = wb_polda.active
-            ws_polda.title = sanitize_name('POLDA ' + polda_name)
-            
-            if not df_subsatker.empty:
-                header1 = ["No.", "Jenis Materil"]
-                for s in subsatkers:
-                    header1 += [s, "", "", ""]
-                ws_polda.append(header1)
-                
-                for i, _ in enumerate(subsatkers):
-                    start_col = 3 + (i * 4)
-                    ws_polda.merge_cells(start_row=1, start_column=start_col, end_row=1, end_column=start_col + 3)
-                
-                header2 = ["", ""]
-                header2 += ["Baik", "Rusak Ringan", "Rusak Berat", "Jumlah"] * len(subsatkers)
-                ws_polda.append(header2)
-                
-                current_row = 3
-                for penggolongan, group_df in df_subsatker.groupby("penggolongan", sort=False):
-                    ws_polda.merge_cells(start_row=current_row, start_column=2, end_row=current_row, end_column=len(header1))
-                    ws_polda.cell(row=current_row, column=2, value=penggolongan).font = Font(bold=True)
-                    current_row += 1
-                    
-                    for jenis_no, (jenis, jenis_df) in enumerate(group_df.groupby("jenis_materiil", sort=False), start=1):
-                        row_data = [jenis_no, jenis]
-                        for s in subsatkers:
-                            row = jenis_df[jenis_df["subsatker_name"] == s]
-                            baik = int(row["baik"].iloc[0]) if not row.empty else 0
-                            rr = int(row["rusak_ringan"].iloc[0]) if not row.empty else 0
-                            rb = int(row["rusak_berat"].iloc[0]) if not row.empty else 0
-                            
-                            jumlah_subsatker = baik + rr + rb
-                            row_data += [zero_to_empty(baik), zero_to_empty(rr), zero_to_empty(rb), zero_to_empty(jumlah_subsatker)]
-                        
-                        ws_polda.append(row_data)
-                        ws_polda.cell(row=current_row, column=1).alignment = Alignment(horizontal="center", vertical="center")
-                        current_row += 1
-                
-                style_header_polda(ws_polda)
-                auto_resize_columns(ws_polda)
+        # ===== POLDA SHEET + POLRES SHEETS (di file POLDA) =====
+        if export_polda and not polda_done:
+            # Filter POLRES + file lama: sheet POLDA dibuat ulang (Total Jajaran terbaru), hanya sheet POLRES
+            # terpilih yang diganti; file belum ada → build penuh dengan semua POLRES
+            polda_filename = os.path.join(polda_output_dir, f"Inventaris_POLDA_{polda_name}.xlsx")
+            wb_polda = open_workbook_for_update(polda_filename, selection.partial_polda)
+            polda_polres_list = df_polres_list
+            if selection.partial_polda and wb_polda is None:
+                print(f"  ℹ️ File POLDA belum ada, build penuh: {polda_filename}")
+                polda_polres_list = data.polres_list(polda_id, filtered=False)
             
-            if export_polres:
-                for _, polres_row in df_polres_list.iterrows():
-                    polres_id = polres_row["polres_id"]
-                    polres_name = polres_row["polres_name"]
-                    
-                    polres_query = f"""
-                        SELECT et.name AS penggolongan, e.name AS jenis_materiil,
-                               COALESCE(inv.baik, 0) AS baik, COALESCE(inv.rusak_ringan, 0) AS rusak_ringan,
-                               COALESCE(inv.rusak_berat, 0) AS rusak_berat
-                        FROM equipments e
-                        JOIN equipment_types et ON et.id = e.id_equipment_type
-                        LEFT JOIN (
-                            SELECT ei.equipment_id, SUM(ei.baik) AS baik, SUM(ei.rusak_ringan) AS rusak_ringan, SUM(ei.rusak_berat) AS rusak_berat
-                            FROM equipment_inventories ei
-                            WHERE ei.owner_type = 'App\\Models\\Polres' AND ei.owner_id = {polres_id}
-                            GROUP BY ei.equipment_id
-                        ) AS inv ON e.id = inv.equipment_id
-                        WHERE e.deleted_at is null
-                        ORDER BY et.id, e."order";
-                    """
-                    df_polres = pd.read_sql(polres_query, engine)
-                    
-                    if df_polres.empty: continue
-                    
-                    ws_polres = wb_polda.create_sheet(sanitize_name(polres_name))
-                    header_polres = ["No.", "Jenis Materil", "Baik", "Rusak Ringan", "Rusak Berat", "Jumlah"]
-                    ws_polres.append(header_polres)
-                    
-                    current_row = 2
-                    for penggolongan, group_df in df_polres.groupby("penggolongan", sort=False):
-                        ws_polres.merge_cells(start_row=current_row, start_column=2, end_row=current_row, end_column=len(header_polres))
-                        ws_polres.cell(row=current_row, column=2, value=penggolongan).font = Font(bold=True)
-                        current_row += 1
-                        
-                        for jenis_no, (_, row) in enumerate(group_df.iterrows(), start=1):
-                            baik = int(row["baik"])
-                            rr = int(row["rusak_ringan"])
-                            rb = int(row["rusak_berat"])
-                            jumlah = baik + rr + rb
-                            row_data = [jenis_no, row["jenis_materiil"], zero_to_empty(baik), zero_to_empty(rr), zero_to_empty(rb), zero_to_empty(jumlah)]
-                            ws_polres.append(row_data)
-                            ws_polres.cell(row=current_row, column=1).alignment = Alignment(horizontal="center", vertical="center")
-                            current_row += 1
-                    
-                    style_header_simple(ws_polres)
-                    auto_resize_columns(ws_polres)
+            wb_polda = build_polda_workbook(
+                data, polda_id, polda_name,
+                polres_layout="unit" if export_polres else None,
+                polres_list=polda_polres_list,
+                rollup=data.polda_rollup(polda_id),
+                wb=wb_polda,
+                names=names,
+            )
             
-            polda_filename = os.path.join(polda_output_dir, f"Inventaris_POLDA_{polda_name}.xlsx")
-            wb_polda.save(polda_filename)
+            # Simpan file POLDA
+            journal.save(wb_polda, polda_unit, polda_filename)
             print(f"✅ Saved {polda_filename}")
         
+        # ===== POLSEK FILES =====
         if export_polsek:
             for _, polres_row in df_polres_list.iterrows():
                 polres_id = polres_row["polres_id"]
                 polres_name = polres_row["polres_name"]
                 
-                polsek_list_query = f"SELECT id, name FROM polsek WHERE polres_id = {polres_id} ORDER BY name;"
-                df_polsek_list = pd.read_sql(polsek_list_query, engine)
+                polsek_unit = f"polsek:{polres_id}"
+                if journal.is_done(polsek_unit):
+                    print(f"  ⏭️ Skip Jajaran Polsek (sudah selesai): {polres_name}")
+                    continue
+                
+                df_polsek_list = data.polsek_list(polres_id)
                 
                 if df_polsek_list.empty:
+                    progress.unit_done(polsek_unit)
                     continue
                 
-                wb_polsek = Workbook()
-                if "Sheet" in wb_polsek.sheetnames:
-                    wb_polsek.remove(wb_polsek["Sheet"])
-                
                 print(f"  -> Processing Jajaran Polsek untuk POLRES: {polres_name}")
-                
-                for _, polsek_row in df_polsek_list.iterrows():
-                    polsek_id = polsek_row["id"]
-                    polsek_name = polsek_row["name"]
-                    
-                    polsek_query = f"""
-                        SELECT et.name AS penggolongan, e.name AS jenis_materiil,
-                               COALESCE(inv.baik, 0) AS baik, COALESCE(inv.rusak_ringan, 0) AS rusak_ringan,
-                               COALESCE(inv.rusak_berat, 0) AS rusak_berat
-                        FROM equipments e
-                        JOIN equipment_types et ON et.id = e.id_equipment_type
-                        LEFT JOIN (
-                            SELECT ei.equipment_id, SUM(ei.baik) AS baik, SUM(ei.rusak_ringan) AS rusak_ringan, SUM(ei.rusak_berat) AS rusak_berat
-                            FROM equipment_inventories ei
-                            WHERE ei.owner_type = 'App\\Models\\Polsek' AND ei.owner_id = {polsek_id}
-                            GROUP BY ei.equipment_id
-                        ) AS inv ON e.id = inv.equipment_id
-                        WHERE e.deleted_at is null
-                        ORDER BY et.id, e."order";
-                    """
-                    df_polsek = pd.read_sql(polsek_query, engine)
-                    
-                    if sum(df_polsek['baik']) + sum(df_polsek['rusak_ringan']) + sum(df_polsek['rusak_berat']) == 0:
-                        continue
-                    
-                    ws_polsek = wb_polsek.create_sheet(sanitize_name(polsek_name))
-                    header_polsek = ["No.", "Jenis Materil", "Baik", "Rusak Ringan", "Rusak Berat", "Jumlah"]
-                    ws_polsek.append(header_polsek)
-                    
-                    current_row = 2
-                    for penggolongan, group_df in df_polsek.groupby("penggolongan", sort=False):
-                        ws_polsek.merge_cells(start_row=current_row, start_column=2, end_row=current_row, end_column=len(header_polsek))
-                        ws_polsek.cell(row=current_row, column=2, value=penggolongan).font = Font(bold=True)
-                        current_row += 1
-                        
-                        for jenis_no, (_, row) in enumerate(group_df.iterrows(), start=1):
-                            baik = int(row["baik"])
-                            rr = int(row["rusak_ringan"])
-                            rb = int(row["rusak_berat"])
-                            jumlah = baik + rr + rb
-                            row_data = [jenis_no, row["jenis_materiil"], zero_to_empty(baik), zero_to_empty(rr), zero_to_empty(rb), zero_to_empty(jumlah)]
-                            ws_polsek.append(row_data)
-                            ws_polsek.cell(row=current_row, column=1).alignment = Alignment(horizontal="center", vertical="center")
-                            current_row += 1
-                    
-                    style_header_simple(ws_polsek)
-                    auto_resize_columns(ws_polsek)
+                wb_polsek = build_polsek_workbook(data, df_polsek_list, names=names)
                 
                 if len(wb_polsek.sheetnames) > 0:
                     polsek_filename = os.path.join(polsek_output_dir, f"Inventaris_Polsek_{polres_name}.xlsx")
-                    wb_polsek.save(polsek_filename)
+                    journal.save(wb_polsek, polsek_unit, polsek_filename)
                     print(f"  ✅ Saved Jajaran Polsek: {polsek_filename}")
+                else:
+                    journal.mark_done(polsek_unit)
+        
+        if args.package and os.path.isdir(polda_output_dir):
+            archive = output.package_folder(polda_output_dir, args.package)
+            print(f"📦 Packaged: {archive}")
 
 # =========================================================
 # 4️⃣ EXPORT SATKER MABES
 # =========================================================
 if export_satker_mabes:
-    export_satker_mabes()
+    export_satker_mabes_data(df_all_satkers)
+
+# Snapshot inventaris run penuh sebagai pembanding export_diff.py
+if export_all and not selection.active and not args.as_of:
+    take_snapshot(data.bind, output_dir, fsync=output.fsync)
+if read_snapshot is not None:
+    read_snapshot.close()
+journal.close()
+
+if memory_budget is not None:
+    print(f"🧮 {memory_budget.summary()}")
+progress.finish()
 
-print("\n🎉 Semua file selesai dibuat di folder 'exports'!")
\ No newline at end of file
+print(f"\n🎉 Semua file selesai dibuat di folder '{output_dir}'!")
+quiet.close()
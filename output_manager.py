@@ -0,0 +1,122 @@
+import os
+import tarfile
+import tempfile
+import threading
+import zipfile
+
+# =========================================================
+# 📦 Output manager: tulis atomik, fsync, batas tulis paralel
+# =========================================================
+PACKAGE_FORMATS = ("zip", "tar")
+
+def _fsync_file(path):
+    with open(path, "rb") as f:
+        os.fsync(f.fileno())
+
+def _fsync_dir(directory):
+    """fsync folder agar rename tercatat di disk (tidak tersedia di Windows)"""
+    if not hasattr(os, "O_DIRECTORY"):
+        return
+    fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+def _current_umask():
+    # os.umask hanya bisa dibaca dengan menyetelnya; dibaca sekali saat import (sebelum ada thread penulis)
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
+
+# mkstemp membuat file 0600 dan os.replace mempertahankannya; file export harus ber-mode seperti open() biasa
+FILE_MODE = 0o666 & ~_current_umask()
+
+def atomic_write(filename, write_func, suffix=".tmp", fsync=True):
+    """Tulis lewat file sementara di folder (filesystem) yang sama, fsync, lalu rename"""
+    directory = os.path.dirname(filename) or "."
+    fd, tmp_path = tempfile.mkstemp(prefix=".tmp_", suffix=suffix, dir=directory)
+    os.close(fd)
+    try:
+        os.chmod(tmp_path, FILE_MODE)
+        write_func(tmp_path)
+        if fsync:
+            _fsync_file(tmp_path)
+        os.replace(tmp_path, filename)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    if fsync:
+        _fsync_dir(directory)
+
+def atomic_save(wb, filename, fsync=True):
+    """Simpan workbook openpyxl secara atomik (tidak ada file .xlsx setengah jadi)"""
+    atomic_write(filename, wb.save, suffix=".xlsx", fsync=fsync)
+
+class OutputManager:
+    """Mengatur semua penulisan file export: atomik, dibatasi jumlah tulis paralel, opsional dipaket"""
+
+    def __init__(self, output_dir, max_concurrent_writes=2, fsync=True, progress=None):
+        self.output_dir = output_dir
+        self.fsync = fsync
+        self.progress = progress
+        self._write_slots = threading.BoundedSemaphore(max(1, max_concurrent_writes))
+        self._dir_lock = threading.Lock()
+
+    def makedirs(self, directory):
+        with self._dir_lock:
+            os.makedirs(directory, exist_ok=True)
+
+    def save_workbook(self, wb, filename):
+        self.makedirs(os.path.dirname(filename) or ".")
+        with self._write_slots:
+            atomic_save(wb, filename, fsync=self.fsync)
+        if self.progress is not None:
+            self.progress.record_workbook(wb, os.path.getsize(filename))
+
+    def write_bytes(self, filename, data):
+        def _write(tmp_path):
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+
+        self.makedirs(os.path.dirname(filename) or ".")
+        with self._write_slots:
+            atomic_write(filename, _write, fsync=self.fsync)
+        if self.progress is not None:
+            self.progress.record_output(size=len(data))
+
+    def package_folder(self, folder, fmt="zip"):
+        """Paket satu folder (mis. POLDA) menjadi satu file zip/tar di sebelahnya"""
+        if fmt not in PACKAGE_FORMATS:
+            raise ValueError(f"Format paket tidak dikenal: {fmt}")
+
+        folder = os.path.normpath(folder)
+        base_name = os.path.basename(folder)
+        archive_path = f"{folder}.{fmt}"
+
+        files = []
+        for root, dirs, filenames in os.walk(folder):
+            dirs.sort()
+            for name in sorted(filenames):
+                if name.startswith(".tmp_"):
+                    continue
+                full_path = os.path.join(root, name)
+                files.append((full_path, os.path.join(base_name, os.path.relpath(full_path, folder))))
+
+        def _write(tmp_path):
+            if fmt == "zip":
+                # .xlsx sudah terkompresi, cukup disimpan (ZIP_STORED) agar cepat
+                with zipfile.ZipFile(tmp_path, "w", zipfile.ZIP_STORED, allowZip64=True) as zf:
+                    for full_path, arcname in files:
+                        zf.write(full_path, arcname)
+            else:
+                with tarfile.open(tmp_path, "w") as tf:
+                    for full_path, arcname in files:
+                        tf.add(full_path, arcname)
+
+        with self._write_slots:
+            atomic_write(archive_path, _write, suffix=f".{fmt}", fsync=self.fsync)
+        if self.progress is not None:
+            self.progress.record_output(size=os.path.getsize(archive_path))
+        return archive_path
@@ -0,0 +1,147 @@
+import os
+import sys
+import json
+import time
+import socket
+import threading
+import contextlib
+
+from xlsx_writer import XlsxSheet
+
+# =========================================================
+# 📈 Progress export: total unit direncanakan di depan → unit/s, baris/s, byte, ETA
+# =========================================================
+# Unit = kunci checkpoint journal (polda:1, polsek:12, satker:3, ...). Script mendaftarkan semua
+# unit yang akan dikerjakan sebelum mulai (plan), journal menandai unit selesai, dan OutputManager
+# mencatat baris sheet + byte setiap file yang ditulis. Aman dipakai banyak thread (satu lock);
+# antar proses (worker shard) setiap proses melapor sendiri, baris JSON memuat host & pid.
+PROGRESS_MODES = ("text", "json", "off")
+DEFAULT_INTERVALS = {"text": 0.0, "json": 30.0, "off": 0.0}
+
+def add_progress_arguments(parser):
+    parser.add_argument('--progress', choices=PROGRESS_MODES, default='text', help="Laporan progress: 'text' (setiap unit), 'json' (satu baris JSON per laporan) atau 'off'")
+    parser.add_argument('--progress-interval', type=float, help='Jeda minimum antar laporan progress dalam detik (default: text setiap unit, json 30)')
+    parser.add_argument('--quiet', action='store_true', help='Untuk cron: log per unit disembunyikan, stdout hanya berisi progress JSON')
+
+def workbook_rows(wb):
+    """Jumlah baris semua sheet workbook (XlsxWorkbook atau openpyxl)"""
+    return sum(ws.rows if isinstance(ws, XlsxSheet) else ws.max_row for ws in wb.worksheets)
+
+def format_bytes(size):
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:,.0f} {unit}" if unit == "B" else f"{size:,.1f} {unit}"
+        size /= 1024
+
+def format_duration(seconds):
+    seconds = int(round(seconds))
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    if hours:
+        return f"{hours}j {minutes:02d}m"
+    return f"{minutes}m {seconds:02d}s" if minutes else f"{seconds}s"
+
+class ExportProgress:
+    """Penghitung progress thread-safe: unit selesai dari rencana, baris & byte ditulis, ETA dari laju unit"""
+
+    def __init__(self, mode="text", interval=None, quiet=False):
+        if mode not in PROGRESS_MODES:
+            raise ValueError(f"Mode progress tidak dikenal: {mode!r}")
+        self.mode = mode
+        self.interval = DEFAULT_INTERVALS[mode] if interval is None else interval
+        self.stream = sys.stdout
+        self.quiet = quiet
+        self.planned = set()
+        self.done = set()
+        self.rows = 0
+        self.bytes = 0
+        self.files = 0
+        self.started = time.perf_counter()
+        self._last_report = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_args(cls, args):
+        mode = "json" if args.quiet else args.progress
+        return cls(mode, args.progress_interval, quiet=args.quiet)
+
+    @contextlib.contextmanager
+    def quiet_stdout(self):
+        """--quiet: print biasa di dalam blok dibuang; laporan progress tetap ke stdout saat progress dibuat
+
+        Pesan fatal (❌ sebelum sys.exit) ditulis script ke stderr sehingga tetap terlihat di log cron.
+        """
+        if not self.quiet:
+            yield
+            return
+        with open(os.devnull, "w", encoding="utf-8") as devnull, contextlib.redirect_stdout(devnull):
+            yield
+
+    def plan(self, units, skip=None):
+        """Daftarkan unit yang akan dikerjakan (skip: mis. journal.is_done untuk --resume); timer mulai di sini"""
+        with self._lock:
+            self.planned.update(unit for unit in units if skip is None or not skip(unit))
+            self.started = time.perf_counter()
+            self._emit("plan")
+
+    def unit_done(self, unit):
+        with self._lock:
+            if unit not in self.planned or unit in self.done:
+                return
+            self.done.add(unit)
+            now = time.perf_counter()
+            if self._last_report is None or now - self._last_report >= self.interval or len(self.done) == len(self.planned):
+                self._emit("progress", now)
+
+    def record_output(self, rows=0, size=0):
+        """Satu file/part ditulis: baris sheet dan ukuran byte-nya"""
+        with self._lock:
+            self.files += 1
+            self.rows += rows
+            self.bytes += size
+
+    def record_workbook(self, wb, size):
+        self.record_output(workbook_rows(wb), size)
+
+    def stats(self, now=None):
+        elapsed = (now or time.perf_counter()) - self.started
+        total, done = len(self.planned), len(self.done)
+        units_per_sec = done / elapsed if elapsed > 0 else 0.0
+        return {
+            "total": total,
+            "done": done,
+            "percent": round(100 * done / total, 1) if total else 100.0,
+            "elapsed": round(elapsed, 1),
+            "units_per_sec": round(units_per_sec, 3),
+            "rows": self.rows,
+            "rows_per_sec": round(self.rows / elapsed, 1) if elapsed > 0 else 0.0,
+            "bytes": self.bytes,
+            "files": self.files,
+            "eta": round((total - done) / units_per_sec, 1) if units_per_sec and done < total else (0.0 if done >= total else None),
+        }
+
+    def finish(self):
+        with self._lock:
+            self._emit("finish")
+
+    def _emit(self, event, now=None):
+        if self.mode == "off":
+            return
+        now = now or time.perf_counter()
+        self._last_report = now
+        stats = self.stats(now)
+        if self.mode == "json":
+            record = {"event": event, "time": time.strftime("%Y-%m-%d %H:%M:%S"), "host": socket.gethostname(), "pid": os.getpid(), **stats}
+            line = json.dumps(record) + "\n"
+        elif event == "plan":
+            line = f"📈 Rencana: {stats['total']} unit\n"
+        elif event == "finish":
+            line = (f"📈 Selesai: {stats['done']}/{stats['total']} unit, {stats['rows']:,} baris, {format_bytes(stats['bytes'])} "
+                    f"({stats['files']} file) dalam {format_duration(stats['elapsed'])} · {stats['units_per_sec']:.2f} unit/s\n")
+        else:
+            eta = "-" if stats["eta"] is None else format_duration(stats["eta"])
+            line = (f"⏳ {stats['done']}/{stats['total']} unit ({stats['percent']:.1f}%) · {stats['units_per_sec']:.2f} unit/s · "
+                    f"{stats['rows_per_sec']:,.0f} baris/s · {format_bytes(stats['bytes'])} ditulis · ETA {eta}\n")
+        # Satu write per baris (di bawah lock) agar baris dari thread lain tidak bercampur
+        self.stream.write(line)
+        self.stream.flush()
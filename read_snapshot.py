@@ -0,0 +1,58 @@
+import time
+
+# =========================================================
+# 🔒 Snapshot baca konsisten untuk satu run export (PostgreSQL)
+# =========================================================
+# Tanpa snapshot setiap pd.read_sql berjalan di transaksi implisitnya sendiri: inventaris yang berubah
+# di tengah run nasional membuat file POLDA saling tidak konsisten. ReadSnapshot membuka satu transaksi
+# REPEATABLE READ READ ONLY (tanpa lock, tanpa salinan tabel) dan ExportData membaca lewat koneksinya.
+# Id dari pg_export_snapshot() bisa diimpor koneksi lain (worker shard) dengan SET TRANSACTION SNAPSHOT
+# selama transaksi pengekspor masih terbuka.
+
+class ReadSnapshot:
+    """Satu transaksi baca REPEATABLE READ READ ONLY; snapshot_id = id pg_export_snapshot() untuk koneksi lain"""
+
+    def __init__(self, engine, snapshot_id=None):
+        self.engine = engine
+        self.connection = engine.connect().execution_options(isolation_level="REPEATABLE READ", postgresql_readonly=True)
+        try:
+            self.connection.begin()
+            if snapshot_id is not None:
+                # Harus menjadi statement pertama transaksi
+                self.connection.exec_driver_sql(f"SET TRANSACTION SNAPSHOT '{snapshot_id}'")
+                self.snapshot_id = snapshot_id
+            else:
+                self.snapshot_id = self.connection.exec_driver_sql("SELECT pg_export_snapshot()").scalar()
+            # now() = waktu mulai transaksi pengekspor (diimpor bersama snapshot)
+            self.taken_at = self.connection.exec_driver_sql("SELECT now()").scalar()
+        except Exception:
+            self.connection.close()
+            raise
+
+    def worker(self):
+        """Koneksi baru yang membaca snapshot yang sama (untuk worker paralel dalam proses ini)"""
+        return ReadSnapshot(self.engine, self.snapshot_id)
+
+    def close(self):
+        if not self.connection.closed:
+            self.connection.rollback()
+            self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def open_for_export(engine, enabled=True, snapshot_id=None):
+    """Untuk script export: ReadSnapshot di PostgreSQL; None (query biasa per unit) jika dimatikan atau database lain"""
+    if not enabled:
+        return None
+    if engine.dialect.name != "postgresql":
+        print(f"⚠️ Snapshot baca konsisten hanya untuk PostgreSQL (dialect: {engine.dialect.name}), setiap query membaca data terbaru")
+        return None
+    start = time.perf_counter()
+    snapshot = ReadSnapshot(engine, snapshot_id)
+    action = "diimpor" if snapshot_id else "dibuka"
+    print(f"🔒 Snapshot baca {snapshot.snapshot_id} {action} (data per {snapshot.taken_at:%Y-%m-%d %H:%M:%S}, {time.perf_counter() - start:.2f}s)")
+    return snapshot
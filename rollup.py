@@ -0,0 +1,207 @@
+import numpy as np
+import pandas as pd
+
+from aggregates import inventory_source
+
+# =========================================================
+# 🌳 Rollup hierarki POLDA → POLRES → Polsek (dan Satker Mabes)
+# =========================================================
+TOTAL_JAJARAN = "Total Jajaran"
+JAJARAN_HEADER = ["Jajaran Baik", "Jajaran Rusak Ringan", "Jajaran Rusak Berat", TOTAL_JAJARAN]
+
+class HierarchyRollup:
+    """Menghitung total sendiri (own) dan kumulatif (jajaran) baik/rr/rb per node hierarki"""
+
+    def __init__(self, node_keys, parent_keys, equipment_ids):
+        self.node_keys = list(node_keys)
+        self.node_index = {key: i for i, key in enumerate(self.node_keys)}
+        self.parent = np.array(
+            [self.node_index.get(p, -1) if p is not None else -1 for p in parent_keys],
+            dtype=np.int64,
+        )
+        self.equipment_ids = np.asarray(equipment_ids, dtype=np.int32)
+        self._equipment_order = np.argsort(self.equipment_ids, kind="stable")
+        self._sorted_equipment_ids = self.equipment_ids[self._equipment_order]
+        self.has_child = np.zeros(len(self.node_keys), dtype=bool)
+        self.has_child[self.parent[self.parent >= 0]] = True
+
+        # Jumlah unit selalu >= 0: uint32 cukup dan setengah ukuran int64
+        shape = (len(self.node_keys), len(self.equipment_ids), 3)
+        self.own = np.zeros(shape, dtype=np.uint32)
+        self.cumulative = np.zeros(shape, dtype=np.uint32)
+
+    def _ancestor_pairs(self):
+        """Pasangan (node, ancestor) termasuk node itu sendiri, dihitung per level kedalaman"""
+        nodes = [np.arange(len(self.node_keys))]
+        ancestors = [np.arange(len(self.node_keys))]
+        current_nodes = ancestors[0]
+        current = self.parent
+        while True:
+            mask = current >= 0
+            if not mask.any():
+                break
+            current_nodes = current_nodes[mask]
+            current = current[mask]
+            nodes.append(current_nodes)
+            ancestors.append(current)
+            current = self.parent[current]
+        return np.concatenate(nodes), np.concatenate(ancestors)
+
+    def equipment_positions(self, equipment_ids):
+        """Posisi equipment_id di sumbu equipment, -1 jika tidak ada di katalog"""
+        equipment_ids = np.asarray(equipment_ids, dtype=np.int64)
+        if len(self._sorted_equipment_ids) == 0:
+            return np.full(len(equipment_ids), -1, dtype=np.int64)
+        pos = np.searchsorted(self._sorted_equipment_ids, equipment_ids)
+        pos = np.clip(pos, 0, len(self._sorted_equipment_ids) - 1)
+        found = self._sorted_equipment_ids[pos] == equipment_ids
+        return np.where(found, self._equipment_order[pos], -1)
+
+    def load(self, owner_keys, equipment_ids, counts):
+        """Isi own dari baris inventaris (owner, equipment, [baik, rr, rb]) lalu rollup sekali jalan"""
+        node_pos = np.array([self.node_index.get(k, -1) for k in owner_keys], dtype=np.int64)
+        equip_pos = self.equipment_positions(equipment_ids)
+        counts = np.asarray(counts).astype(np.uint32).reshape(-1, 3)
+
+        valid = (node_pos >= 0) & (equip_pos >= 0)
+        self.own[:] = 0
+        np.add.at(self.own, (node_pos[valid], equip_pos[valid]), counts[valid])
+
+        # Satu pass vektor: setiap own ditambahkan ke semua ancestor-nya (termasuk diri sendiri)
+        nodes, ancestors = self._ancestor_pairs()
+        self.cumulative[:] = 0
+        np.add.at(self.cumulative, ancestors, self.own[nodes])
+        return self
+
+    def has_children(self, key):
+        i = self.node_index.get(key)
+        return i is not None and bool(self.has_child[i])
+
+    def totals(self, key, equipment_ids, cumulative=True):
+        """Jumlah [baik, rr, rb] node untuk satu/lebih equipment_id (dijumlahkan)"""
+        i = self.node_index.get(key)
+        if i is None:
+            return np.zeros(3, dtype=np.uint32)
+        pos = self.equipment_positions(np.atleast_1d(equipment_ids))
+        pos = pos[pos >= 0]
+        source = self.cumulative if cumulative else self.own
+        return source[i, pos].sum(axis=0)
+
+    def equipment_totals(self, key, equipment_ids, cumulative=True):
+        """[baik, rr, rb] node per equipment_id sekaligus (satu baris per id, 0 jika node/equipment tidak ada)"""
+        equipment_ids = np.atleast_1d(equipment_ids)
+        result = np.zeros((len(equipment_ids), 3), dtype=np.uint32)
+        i = self.node_index.get(key)
+        if i is None:
+            return result
+        pos = self.equipment_positions(equipment_ids)
+        found = pos >= 0
+        source = self.cumulative if cumulative else self.own
+        result[found] = source[i, pos[found]]
+        return result
+
+def jajaran_cells(rollup, key, equipment_ids, zero_to_empty):
+    """Nilai kolom Total Jajaran (Baik, RR, RB, Jumlah) untuk satu baris jenis materiil"""
+    baik, rr, rb = (int(v) for v in rollup.totals(key, equipment_ids))
+    jumlah = baik + rr + rb
+    return [zero_to_empty(baik), zero_to_empty(rr), zero_to_empty(rb), zero_to_empty(jumlah)]
+
+# =========================================================
+# 📥 Loader rollup (satu query agregat per cakupan)
+# =========================================================
+def load_equipment_ids(engine):
+    df = pd.read_sql("SELECT id FROM equipments WHERE deleted_at IS NULL ORDER BY id;", engine)
+    return df["id"].to_numpy()
+
+def load_polda_hierarchy(engine, polda_id):
+    """Id Subsatker, POLRES dan pasangan (Polsek, POLRES) di bawah satu POLDA"""
+    subsatker_df = pd.read_sql(f"SELECT id FROM subsatker_poldas WHERE polda_id = {polda_id};", engine)
+    polres_df = pd.read_sql(f"SELECT id FROM polres WHERE polda_id = {polda_id};", engine)
+    polsek_df = pd.read_sql(f"""
+        SELECT ps.id, ps.polres_id
+        FROM polsek ps
+        JOIN polres p ON p.id = ps.polres_id
+        WHERE p.polda_id = {polda_id};
+    """, engine)
+    return subsatker_df, polres_df, polsek_df
+
+def load_polda_rollup(engine, polda_id, equipment_ids=None, hierarchy=None, df_inv=None):
+    """Rollup seluruh jajaran satu POLDA: Subsatker, POLRES dan Polsek (hierarchy bisa dari cache, df_inv dari snapshot)"""
+    if equipment_ids is None:
+        equipment_ids = load_equipment_ids(engine)
+    if hierarchy is None:
+        hierarchy = load_polda_hierarchy(engine, polda_id)
+    subsatker_df, polres_df, polsek_df = hierarchy
+
+    node_keys = [("polda", polda_id)]
+    parent_keys = [None]
+    for sid in subsatker_df["id"]:
+        node_keys.append(("subsatker", int(sid)))
+        parent_keys.append(("polda", polda_id))
+    for pid in polres_df["id"]:
+        node_keys.append(("polres", int(pid)))
+        parent_keys.append(("polda", polda_id))
+    for psid, pid in zip(polsek_df["id"], polsek_df["polres_id"]):
+        node_keys.append(("polsek", int(psid)))
+        parent_keys.append(("polres", int(pid)))
+
+    if df_inv is None:
+        source = inventory_source(engine)
+        inventory_query = f"""
+            SELECT 'subsatker' AS owner_level, ei.owner_id, ei.equipment_id,
+                   SUM(ei.baik) AS baik, SUM(ei.rusak_ringan) AS rusak_ringan, SUM(ei.rusak_berat) AS rusak_berat
+            FROM {source} ei
+            JOIN subsatker_poldas sp ON sp.id = ei.owner_id
+            WHERE ei.owner_type = 'App\\Models\\SubsatkerPolda' AND sp.polda_id = {polda_id}
+            GROUP BY ei.owner_id, ei.equipment_id
+            UNION ALL
+            SELECT 'polres' AS owner_level, ei.owner_id, ei.equipment_id,
+                   SUM(ei.baik), SUM(ei.rusak_ringan), SUM(ei.rusak_berat)
+            FROM {source} ei
+            JOIN polres p ON p.id = ei.owner_id
+            WHERE ei.owner_type = 'App\\Models\\Polres' AND p.polda_id = {polda_id}
+            GROUP BY ei.owner_id, ei.equipment_id
+            UNION ALL
+            SELECT 'polsek' AS owner_level, ei.owner_id, ei.equipment_id,
+                   SUM(ei.baik), SUM(ei.rusak_ringan), SUM(ei.rusak_berat)
+            FROM {source} ei
+            JOIN polsek ps ON ps.id = ei.owner_id
+            JOIN polres p ON p.id = ps.polres_id
+            WHERE ei.owner_type = 'App\\Models\\Polsek' AND p.polda_id = {polda_id}
+            GROUP BY ei.owner_id, ei.equipment_id;
+        """
+        df_inv = pd.read_sql(inventory_query, engine)
+
+    rollup = HierarchyRollup(node_keys, parent_keys, equipment_ids)
+    owner_keys = list(zip(df_inv["owner_level"], df_inv["owner_id"].astype(int)))
+    counts = df_inv[["baik", "rusak_ringan", "rusak_berat"]].fillna(0).to_numpy()
+    return rollup.load(owner_keys, df_inv["equipment_id"].to_numpy(), counts)
+
+def load_satker_mabes_rollup(engine, df_all_satkers, equipment_ids=None, restrict=False, df_inv=None):
+    """Rollup pohon Satker Mabes dengan satu query agregat (restrict: hanya satker di df_all_satkers; df_inv dari snapshot)"""
+    if equipment_ids is None:
+        equipment_ids = load_equipment_ids(engine)
+
+    node_keys = [int(i) for i in df_all_satkers["id"]]
+    parent_keys = [None if pd.isna(p) else int(p) for p in df_all_satkers["parent_id"]]
+    rollup = HierarchyRollup(node_keys, parent_keys, equipment_ids)
+
+    if df_inv is None:
+        if restrict and not node_keys:
+            # Filter tanpa satker: rollup kosong (owner_id IN () tidak valid di PostgreSQL)
+            return rollup
+        source = inventory_source(engine)
+        owner_filter = ""
+        if restrict:
+            owner_filter = f"AND ei.owner_id IN ({','.join(map(str, node_keys))})"
+        inventory_query = f"""
+            SELECT ei.owner_id, ei.equipment_id,
+                   SUM(ei.baik) AS baik, SUM(ei.rusak_ringan) AS rusak_ringan, SUM(ei.rusak_berat) AS rusak_berat
+            FROM {source} ei
+            WHERE ei.owner_type = 'App\\Models\\SatkerMabes' {owner_filter}
+            GROUP BY ei.owner_id, ei.equipment_id;
+        """
+        df_inv = pd.read_sql(inventory_query, engine)
+
+    counts = df_inv[["baik", "rusak_ringan", "rusak_berat"]].fillna(0).to_numpy()
+    return rollup.load(df_inv["owner_id"].astype(int).tolist(), df_inv["equipment_id"].to_numpy(), counts)
@@ -0,0 +1,151 @@
+import os
+
+# =========================================================
+# 🔎 Filter export berdasarkan id / nama (subtree)
+# =========================================================
+def add_selection_arguments(parser):
+    parser.add_argument('--polda-id', type=int, nargs='+', action='extend', default=[], help='Export hanya POLDA dengan id ini (beserta POLRES/Polsek di bawahnya)')
+    parser.add_argument('--polres-id', type=int, nargs='+', action='extend', default=[], help='Export hanya POLRES dengan id ini (beserta Polsek di bawahnya)')
+    parser.add_argument('--satker-id', type=int, nargs='+', action='extend', default=[], help='Export hanya Satker Mabes dengan id ini beserta semua turunannya')
+    parser.add_argument('--polda-name', nargs='+', action='extend', default=[], help='Filter nama POLDA (glob, mis. "Jawa*")')
+    parser.add_argument('--polres-name', nargs='+', action='extend', default=[], help='Filter nama POLRES (glob)')
+    parser.add_argument('--satker-name', nargs='+', action='extend', default=[], help='Filter nama Satker Mabes (glob), termasuk semua turunannya')
+
+def glob_to_like(pattern):
+    """Ubah glob (* dan ?) menjadi pola LIKE dengan escape untuk % dan _"""
+    like = pattern.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return like.replace('*', '%').replace('?', '_').lower()
+
+def _id_condition(column, ids):
+    return f"{column} IN ({','.join(str(int(i)) for i in ids)})"
+
+def _name_params(key, patterns):
+    return {f"{key}_{i}": glob_to_like(p) for i, p in enumerate(patterns)}
+
+def _name_condition(column, key, patterns):
+    # Pola LIKE sebagai bind parameter: '%' mentah di SQL dianggap placeholder oleh driver pyformat (psycopg2)
+    likes = [f"LOWER({column}) LIKE :{name} ESCAPE '\\'" for name in _name_params(key, patterns)]
+    return "(" + " OR ".join(likes) + ")"
+
+def _where(conditions):
+    return " AND ".join(conditions) if conditions else "1 = 1"
+
+class ExportSelection:
+    """Filter id/nama yang didorong ke SQL; filter antar level bersifat irisan (AND)"""
+
+    def __init__(self, polda_ids=(), polres_ids=(), satker_ids=(), polda_names=(), polres_names=(), satker_names=()):
+        self.polda_ids = list(polda_ids)
+        self.polres_ids = list(polres_ids)
+        self.satker_ids = list(satker_ids)
+        self.polda_names = list(polda_names)
+        self.polres_names = list(polres_names)
+        self.satker_names = list(satker_names)
+
+    @classmethod
+    def from_args(cls, args):
+        return cls(args.polda_id, args.polres_id, args.satker_id, args.polda_name, args.polres_name, args.satker_name)
+
+    @property
+    def polres_active(self):
+        return bool(self.polres_ids or self.polres_names)
+
+    @property
+    def polda_active(self):
+        return bool(self.polda_ids or self.polda_names) or self.polres_active
+
+    @property
+    def satker_active(self):
+        return bool(self.satker_ids or self.satker_names)
+
+    @property
+    def active(self):
+        return self.polda_active or self.satker_active
+
+    @property
+    def params(self):
+        """Bind parameter pola nama untuk query polda_query / polres_where / satker_query"""
+        return {
+            **_name_params("polda_name", self.polda_names),
+            **_name_params("polres_name", self.polres_names),
+            **_name_params("satker_name", self.satker_names),
+        }
+
+    @property
+    def partial_polda(self):
+        """Filter POLRES: file POLDA yang sudah ada diperbarui sebagian (sheet POLDA + sheet POLRES terpilih)"""
+        return self.polres_active
+
+    def describe(self):
+        return {
+            "polda_id": self.polda_ids, "polres_id": self.polres_ids, "satker_id": self.satker_ids,
+            "polda_name": self.polda_names, "polres_name": self.polres_names, "satker_name": self.satker_names,
+        }
+
+    def polres_where(self, alias=""):
+        prefix = f"{alias}." if alias else ""
+        conditions = []
+        if self.polres_ids:
+            conditions.append(_id_condition(f"{prefix}id", self.polres_ids))
+        if self.polres_names:
+            conditions.append(_name_condition(f"{prefix}name", "polres_name", self.polres_names))
+        return _where(conditions)
+
+    def polda_where(self):
+        conditions = []
+        if self.polda_ids:
+            conditions.append(_id_condition("id", self.polda_ids))
+        if self.polda_names:
+            conditions.append(_name_condition("name", "polda_name", self.polda_names))
+        if self.polres_active:
+            conditions.append(f"id IN (SELECT polda_id FROM polres WHERE {self.polres_where()})")
+        return _where(conditions)
+
+    def polda_query(self):
+        return f"SELECT id, name FROM polda WHERE {self.polda_where()} ORDER BY id"
+
+    def satker_query(self):
+        """Satker terpilih + semua turunannya (selected = 1) dan ancestor-nya untuk nama file"""
+        if not self.satker_active:
+            return "SELECT id, name, level, parent_id, 1 AS selected FROM satker_mabes ORDER BY level, name;"
+
+        conditions = []
+        if self.satker_ids:
+            conditions.append(_id_condition("id", self.satker_ids))
+        if self.satker_names:
+            conditions.append(_name_condition("name", "satker_name", self.satker_names))
+        return f"""
+            WITH RECURSIVE selected_satkers AS (
+                SELECT id FROM satker_mabes WHERE {_where(conditions)}
+                UNION
+                SELECT sm.id FROM satker_mabes sm JOIN selected_satkers s ON sm.parent_id = s.id
+            ),
+            ancestor_satkers AS (
+                SELECT id, parent_id FROM satker_mabes WHERE id IN (SELECT id FROM selected_satkers)
+                UNION
+                SELECT sm.id, sm.parent_id FROM satker_mabes sm JOIN ancestor_satkers a ON sm.id = a.parent_id
+            )
+            SELECT id, name, level, parent_id,
+                   CASE WHEN id IN (SELECT id FROM selected_satkers) THEN 1 ELSE 0 END AS selected
+            FROM satker_mabes
+            WHERE id IN (SELECT id FROM ancestor_satkers)
+            ORDER BY level, name;
+        """
+
+# =========================================================
+# 📄 Update sebagian workbook (hanya sheet terpilih)
+# =========================================================
+def open_workbook_for_update(filename, partial):
+    """Workbook lama yang sheet terpilihnya akan diganti; None (build penuh) jika bukan partial atau file belum ada"""
+    if not partial or not os.path.exists(filename):
+        return None
+    from openpyxl import load_workbook
+
+    return load_workbook(filename)
+
+def replace_sheet(wb, title):
+    """Buat sheet baru; jika judul sudah ada, ganti di posisi yang sama"""
+    if title in wb.sheetnames:
+        index = wb.sheetnames.index(title)
+        wb.remove(wb[title])
+        return wb.create_sheet(title, index)
+    return wb.create_sheet(title)
@@ -0,0 +1,292 @@
+import os
+import json
+import time
+import heapq
+import shutil
+import socket
+
+from output_manager import atomic_write
+
+# =========================================================
+# 🧩 Sharding export multi-node: manifest, klaim shard, part sheet
+# =========================================================
+# Semua state ada di <output-dir>/.shards (storage bersama antar node):
+#   manifest.json          daftar unit output + estimasi biaya + nomor shard
+#   claims/shard-K.lock    klaim worker (dibuat O_EXCL, jadi hanya satu worker per shard)
+#   progress/shard-K.json  unit yang sudah selesai + durasi (untuk resume)
+#   parts/<unit>.json      isi sheet POLDA/POLRES, digabung menjadi workbook POLDA saat merge
+#   timings.json           durasi terukur per unit dari run sebelumnya (tetap ada antar run)
+SHARD_DIRNAME = ".shards"
+MANIFEST_FILENAME = "manifest.json"
+TIMINGS_FILENAME = "timings.json"
+TIMING_SMOOTHING = 0.5   # bobot run terbaru pada rata-rata eksponensial durasi
+
+# Unit sheet (digabung saat merge); unit polsek/satker ditulis langsung sebagai file oleh worker
+PART_KINDS = ("polda", "polres")
+
+def parse_shard(value):
+    """'k/N' (1 ≤ k ≤ N) → (k, N) untuk argparse type="""
+    try:
+        k, n = (int(part) for part in str(value).split("/"))
+    except ValueError:
+        raise ValueError(f"Format --shard harus k/N, mis. 2/4: {value!r}") from None
+    if not 1 <= k <= n:
+        raise ValueError(f"--shard k/N butuh 1 ≤ k ≤ N: {value!r}")
+    return k, n
+
+def unit_key(kind, unit_id):
+    return f"{kind}:{int(unit_id)}"
+
+# =========================================================
+# 📋 Planner: unit output + estimasi biaya dari jumlah baris
+# =========================================================
+def inventory_row_counts(data):
+    """Jumlah baris inventaris yang dibaca (tabel mentah atau agregat) per (level, owner_id)"""
+    from aggregates import inventory_source
+    from export_core import OWNER_TYPES
+
+    df = data.read_sql(f"""
+        SELECT owner_type, owner_id, COUNT(*) AS n_rows
+        FROM {inventory_source(data.engine)}
+        GROUP BY owner_type, owner_id;
+    """)
+    levels = {owner_type: level for level, owner_type in OWNER_TYPES.items()}
+    return {
+        (levels[owner_type], int(owner_id)): int(n_rows)
+        for owner_type, owner_id, n_rows in df.itertuples(index=False)
+        if owner_type in levels
+    }
+
+def plan_units(data):
+    """Semua unit output layout index.py dengan estimasi biaya (sel yang ditulis + baris inventaris yang dibaca)"""
+    from export_core import related_satkers
+
+    rows = inventory_row_counts(data)
+    catalog_rows = len(data.equipment_catalog())
+
+    def group_cost(level, ids):
+        # Sheet multi-unit: semua jenis materiil × (No./Jenis + 4 kolom per unit + Total Jajaran)
+        return catalog_rows * (2 + 4 * len(ids) + 4) + sum(rows.get((level, int(i)), 0) for i in ids)
+
+    units = []
+    poldas = []
+    for _, polda in data.poldas().iterrows():
+        polda_id = int(polda["id"])
+        poldas.append({"id": polda_id, "name": polda["name"]})
+        units.append({"kind": "polda", "id": polda_id, "name": polda["name"], "polda_id": polda_id,
+                      "cost": group_cost("subsatker", data.subsatkers(polda_id)["id"].tolist())})
+
+        df_polres_list = data.polres_list(polda_id)
+        for _, polres in df_polres_list.iterrows():
+            polres_id = int(polres["polres_id"])
+            units.append({"kind": "polres", "id": polres_id, "name": polres["polres_name"], "polda_id": polda_id,
+                          "cost": catalog_rows * 10 + rows.get(("polres", polres_id), 0)})
+        for _, polres in df_polres_list.iterrows():
+            polres_id = int(polres["polres_id"])
+            polsek_ids = data.polsek_list(polres_id)["id"].tolist()
+            with_rows = [i for i in polsek_ids if rows.get(("polsek", int(i)), 0)]
+            units.append({"kind": "polsek", "id": polres_id, "name": polres["polres_name"], "polda_id": polda_id,
+                          "cost": catalog_rows * 6 * len(with_rows) + sum(rows[("polsek", int(i))] for i in with_rows)})
+
+    df_all_satkers = data.satker_tree()
+    for _, satker in df_all_satkers.iterrows():
+        related = [s["id"] for s in related_satkers(satker, df_all_satkers)]
+        units.append({"kind": "satker", "id": int(satker["id"]), "name": satker["name"], "polda_id": None,
+                      "cost": group_cost("satker", related)})
+
+    for unit in units:
+        unit["unit"] = unit_key(unit["kind"], unit["id"])
+    return poldas, units
+
+def estimate_units(units, timings):
+    """Estimasi durasi (detik) per unit: durasi terukur run sebelumnya, atau biaya × detik-per-biaya jenis unitnya
+
+    Tanpa riwayat sama sekali estimasi = biaya (skala relatif cukup untuk penjadwalan).
+    """
+    measured = timings.get("units", {})
+    ratios = timings.get("ratios", {})
+    fallback = sum(ratios.values()) / len(ratios) if ratios else None
+    for unit in units:
+        if unit["unit"] in measured:
+            unit["estimate"] = measured[unit["unit"]]
+        else:
+            ratio = ratios.get(unit["kind"], fallback)
+            unit["estimate"] = unit["cost"] * ratio if ratio is not None else unit["cost"]
+    return units
+
+def assign_shards(units, n_shards):
+    """Longest-processing-time-first: unit terbesar dulu, selalu ke shard dengan beban estimasi terkecil
+
+    Urutan unit di manifest tidak berubah (urutan sheet saat merge), hanya nomor shard.
+    """
+    loads = [(0.0, k) for k in range(1, n_shards + 1)]
+    for unit in sorted(units, key=lambda u: (-u["estimate"], u["unit"])):
+        load, k = heapq.heappop(loads)
+        unit["shard"] = k
+        heapq.heappush(loads, (load + unit["estimate"], k))
+    return units
+
+def shard_loads(units, n_shards):
+    loads = [0.0] * n_shards
+    for unit in units:
+        loads[unit["shard"] - 1] += unit["estimate"]
+    return loads
+
+# =========================================================
+# 🗂️ Workspace shard di storage bersama
+# =========================================================
+class ShardWorkspace:
+    """Manifest, klaim, progress dan part sheet di <output_dir>/.shards"""
+
+    def __init__(self, output_dir, fsync=True):
+        self.output_dir = output_dir
+        self.root = os.path.join(output_dir, SHARD_DIRNAME)
+        self.fsync = fsync
+
+    def _path(self, *parts):
+        return os.path.join(self.root, *parts)
+
+    def _write_json(self, path, value):
+        def _write(tmp_path):
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(value, f, ensure_ascii=False)
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        atomic_write(path, _write, suffix=".json", fsync=self.fsync)
+
+    @staticmethod
+    def _read_json(path):
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def reset(self):
+        """Hapus klaim, progress dan part run sebelumnya (manifest baru = run baru); timings.json tetap"""
+        for name in ("claims", "progress", "parts"):
+            shutil.rmtree(self._path(name), ignore_errors=True)
+
+    # ----- Manifest -----
+    def write_manifest(self, poldas, units, n_shards, read_snapshot=None):
+        """read_snapshot: id pg_export_snapshot() yang ditahan plan; worker mengimpornya"""
+        manifest = {
+            "created_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "shards": n_shards,
+            "poldas": poldas,
+            "units": units,
+        }
+        if read_snapshot is not None:
+            manifest["read_snapshot"] = read_snapshot
+        self._write_json(self._path(MANIFEST_FILENAME), manifest)
+        return manifest
+
+    def manifest(self):
+        path = self._path(MANIFEST_FILENAME)
+        if not os.path.exists(path):
+            raise ValueError(f"Manifest belum ada di {path}, jalankan 'plan' dulu")
+        return self._read_json(path)
+
+    # ----- Klaim shard (lock-file O_EXCL, aman di storage bersama) -----
+    def _claim_path(self, k):
+        return self._path("claims", f"shard-{k}.lock")
+
+    def claim(self, k, force=False):
+        """Klaim shard k; None jika sudah diklaim worker lain (force: ambil alih klaim worker yang mati)"""
+        path = self._claim_path(k)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if force and os.path.exists(path):
+            os.remove(path)
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            return None
+        owner = {"host": socket.gethostname(), "pid": os.getpid(), "claimed_at": time.strftime("%Y-%m-%d %H:%M:%S")}
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(owner, f)
+        return owner
+
+    def claim_owner(self, k):
+        path = self._claim_path(k)
+        return self._read_json(path) if os.path.exists(path) else None
+
+    def release(self, k):
+        path = self._claim_path(k)
+        if os.path.exists(path):
+            os.remove(path)
+
+    # ----- Progress per shard -----
+    def _progress_path(self, k):
+        return self._path("progress", f"shard-{k}.json")
+
+    def progress(self, k):
+        path = self._progress_path(k)
+        return self._read_json(path) if os.path.exists(path) else {"done": False, "units": {}}
+
+    def save_progress(self, k, progress):
+        self._write_json(self._progress_path(k), progress)
+
+    def completed_units(self, n_shards):
+        completed = {}
+        for k in range(1, n_shards + 1):
+            completed.update(self.progress(k)["units"])
+        return completed
+
+    # ----- Durasi terukur (menyempurnakan estimasi plan berikutnya) -----
+    def timings(self):
+        path = self._path(TIMINGS_FILENAME)
+        return self._read_json(path) if os.path.exists(path) else {"runs": [], "units": {}, "ratios": {}}
+
+    def record_timings(self):
+        """Masukkan durasi dari progress manifest saat ini ke timings.json (sekali per manifest)"""
+        if not os.path.exists(self._path(MANIFEST_FILENAME)):
+            return None
+        manifest = self.manifest()
+        timings = self.timings()
+        if manifest["created_at"] in timings["runs"]:
+            return timings
+        measured = self.completed_units(manifest["shards"])
+        if not measured:
+            return timings
+
+        def smooth(old, new):
+            return new if old is None else TIMING_SMOOTHING * new + (1 - TIMING_SMOOTHING) * old
+
+        # Detik per satuan biaya per jenis unit: untuk unit baru yang belum pernah diukur
+        seconds, costs = {}, {}
+        for unit in manifest["units"]:
+            if unit["unit"] in measured:
+                duration = measured[unit["unit"]]
+                timings["units"][unit["unit"]] = round(smooth(timings["units"].get(unit["unit"]), duration), 4)
+                seconds[unit["kind"]] = seconds.get(unit["kind"], 0.0) + duration
+                costs[unit["kind"]] = costs.get(unit["kind"], 0) + unit["cost"]
+        for kind, total in seconds.items():
+            if costs[kind]:
+                timings["ratios"][kind] = smooth(timings["ratios"].get(kind), total / costs[kind])
+
+        timings["runs"] = (timings["runs"] + [manifest["created_at"]])[-50:]
+        self._write_json(self._path(TIMINGS_FILENAME), timings)
+        return timings
+
+    # ----- Part sheet (isi SheetContent sebagai JSON, portabel antar node) -----
+    def _part_path(self, unit):
+        return self._path("parts", unit.replace(":", "-") + ".json")
+
+    def write_part(self, unit, title, content):
+        """Simpan part sheet; mengembalikan ukuran file (byte)"""
+        part = {"title": title, "content": None if content is None else content._asdict()}
+        path = self._part_path(unit)
+        self._write_json(path, part)
+        return os.path.getsize(path)
+
+    def read_part(self, unit):
+        """(judul sheet, SheetContent atau None)"""
+        from export_core import SheetContent
+
+        part = self._read_json(self._part_path(unit))
+        content = part["content"]
+        if content is not None:
+            content = SheetContent(
+                content["layout"],
+                content["headers"],
+                [tuple(item) for item in content["items"]],
+                [tuple(width) for width in content["widths"]],
+            )
+        return part["title"], content
@@ -0,0 +1,299 @@
+import os
+import io
+import time
+import numpy as np
+import pandas as pd
+
+from aggregates import RAW_INVENTORY_TABLE
+from output_manager import atomic_write
+from timestamps import TIMESTAMP_FORMAT, FILE_STAMP_FORMAT, file_stamp, parse_as_of
+
+# =========================================================
+# 📸 Snapshot inventaris (pembanding antar run)
+# =========================================================
+OWNER_LEVELS = ("subsatker", "polres", "polsek", "satker")
+OWNER_TABLES = {
+    "subsatker": "subsatker_poldas",
+    "polres": "polres",
+    "polsek": "polsek",
+    "satker": "satker_mabes",
+}
+OWNER_TYPE_LEVELS = {
+    "App\\Models\\SubsatkerPolda": "subsatker",
+    "App\\Models\\Polres": "polres",
+    "App\\Models\\Polsek": "polsek",
+    "App\\Models\\SatkerMabes": "satker",
+}
+SNAPSHOT_DIRNAME = ".snapshots"
+LATEST_SNAPSHOT = "latest.npz"
+HISTORY_DIRNAME = "history"
+KEYFRAME_INTERVAL = 12
+
+# Key gabungan (level, owner_id, equipment_id) dalam satu uint64 agar bisa diurutkan/dicari secara vektor
+_ID_BITS = 30
+_ID_LIMIT = 1 << _ID_BITS
+
+def snapshot_keys(levels, owner_ids, equipment_ids):
+    owner_ids = np.asarray(owner_ids, dtype=np.int64)
+    equipment_ids = np.asarray(equipment_ids, dtype=np.int64)
+    if len(owner_ids) and (owner_ids.max() >= _ID_LIMIT or equipment_ids.max() >= _ID_LIMIT):
+        raise ValueError(f"owner_id/equipment_id harus < {_ID_LIMIT}")
+    return (
+        (np.asarray(levels, dtype=np.uint64) << np.uint64(2 * _ID_BITS))
+        | (owner_ids.astype(np.uint64) << np.uint64(_ID_BITS))
+        | equipment_ids.astype(np.uint64)
+    )
+
+def split_keys(keys):
+    """Kebalikan snapshot_keys: (levels, owner_ids, equipment_ids)"""
+    mask = np.uint64(_ID_LIMIT - 1)
+    levels = (keys >> np.uint64(2 * _ID_BITS)).astype(np.uint8)
+    owner_ids = ((keys >> np.uint64(_ID_BITS)) & mask).astype(np.int32)
+    equipment_ids = (keys & mask).astype(np.int32)
+    return levels, owner_ids, equipment_ids
+
+class InventorySnapshot:
+    """Seluruh inventaris per (level owner, owner_id, equipment_id): key uint64 terurut + jumlah uint32 [baik, rr, rb]"""
+
+    def __init__(self, keys, counts, taken_at=None):
+        keys = np.asarray(keys, dtype=np.uint64)
+        counts = np.asarray(counts, dtype=np.uint32).reshape(-1, 3)
+        order = np.argsort(keys, kind="stable")
+        self.keys = keys[order]
+        self.counts = counts[order]
+        self.taken_at = taken_at or time.strftime(TIMESTAMP_FORMAT)
+
+    def __len__(self):
+        return len(self.keys)
+
+    @classmethod
+    def from_db(cls, engine):
+        """Satu query agregat untuk semua owner (Subsatker, POLRES, Polsek, Satker Mabes)
+
+        Selalu dari tabel mentah: snapshot menjadi pembanding diff & riwayat --as-of, jadi tidak boleh
+        memakai materialized view yang mungkin tertinggal.
+        """
+        owner_types = ", ".join(f"'{owner_type}'" for owner_type in OWNER_TYPE_LEVELS)
+        df_inv = pd.read_sql(f"""
+            SELECT ei.owner_type, ei.owner_id, ei.equipment_id,
+                   SUM(ei.baik) AS baik, SUM(ei.rusak_ringan) AS rusak_ringan, SUM(ei.rusak_berat) AS rusak_berat
+            FROM {RAW_INVENTORY_TABLE} ei
+            WHERE ei.owner_type IN ({owner_types})
+            GROUP BY ei.owner_type, ei.owner_id, ei.equipment_id;
+        """, engine)
+        levels = df_inv["owner_type"].map(lambda t: OWNER_LEVELS.index(OWNER_TYPE_LEVELS[t])).to_numpy()
+        keys = snapshot_keys(levels, df_inv["owner_id"].to_numpy(), df_inv["equipment_id"].to_numpy())
+        counts = df_inv[["baik", "rusak_ringan", "rusak_berat"]].fillna(0).to_numpy().astype(np.uint32)
+        return cls(keys, counts)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as f:
+            return cls(f["keys"], f["counts"], str(f["taken_at"]))
+
+    def save(self, path, fsync=True):
+        def _write(tmp_path):
+            buffer = io.BytesIO()
+            np.savez_compressed(buffer, keys=self.keys, counts=self.counts, taken_at=np.array(self.taken_at))
+            with open(tmp_path, "wb") as f:
+                f.write(buffer.getvalue())
+
+        atomic_write(path, _write, suffix=".npz", fsync=fsync)
+
+    def _owner_positions(self, code, owner_ids):
+        """Posisi baris owner_ids (satu level) di keys: rentang key tiap owner dicari dengan searchsorted"""
+        owner_ids = np.unique(np.asarray(list(owner_ids), dtype=np.int64))
+        starts_keys = snapshot_keys(np.full(len(owner_ids), code), owner_ids, np.zeros(len(owner_ids), dtype=np.int64))
+        starts = np.searchsorted(self.keys, starts_keys)
+        stops = np.searchsorted(self.keys, starts_keys + np.uint64(_ID_LIMIT))
+        lengths = stops - starts
+        offsets = np.repeat(starts - (np.cumsum(lengths) - lengths), lengths)
+        return np.arange(lengths.sum()) + offsets
+
+    def rows(self, level, owner_ids=None):
+        """Baris satu level owner (opsional hanya owner_ids) dalam bentuk hasil query agregat inventaris"""
+        code = OWNER_LEVELS.index(level)
+        if owner_ids is None:
+            bounds = np.array([code, code + 1], dtype=np.uint64) << np.uint64(2 * _ID_BITS)
+            positions = slice(*np.searchsorted(self.keys, bounds))
+        else:
+            positions = self._owner_positions(code, owner_ids)
+        _, owners, equipment_ids = split_keys(self.keys[positions])
+        counts = self.counts[positions]
+        return pd.DataFrame({
+            "owner_level": level,
+            "owner_id": owners,
+            "equipment_id": equipment_ids,
+            "baik": counts[:, 0],
+            "rusak_ringan": counts[:, 1],
+            "rusak_berat": counts[:, 2],
+        })
+
+    def aligned(self, keys):
+        """Jumlah untuk keys (terurut) tertentu, 0 untuk key yang tidak ada di snapshot ini"""
+        result = np.zeros((len(keys), 3), dtype=np.uint32)
+        if len(self.keys):
+            pos = np.clip(np.searchsorted(self.keys, keys), 0, len(self.keys) - 1)
+            found = self.keys[pos] == keys
+            result[found] = self.counts[pos[found]]
+        return result
+
+def diff_snapshots(previous, current):
+    """Selisih per (owner, equipment) sebagai pengurangan array: (keys, lama, baru) hanya baris yang berubah"""
+    keys = np.union1d(previous.keys, current.keys)
+    old = previous.aligned(keys)
+    new = current.aligned(keys)
+    changed = (old != new).any(axis=1)
+    return keys[changed], old[changed], new[changed]
+
+def snapshot_path(output_dir, name=LATEST_SNAPSHOT):
+    return os.path.join(output_dir, SNAPSHOT_DIRNAME, name)
+
+# =========================================================
+# 🗄️ Riwayat snapshot append-only (untuk --as-of)
+# =========================================================
+class SnapshotStore:
+    """Riwayat snapshot bertanggal: keyframe penuh tiap KEYFRAME_INTERVAL entri, selebihnya hanya delta per (owner, equipment)"""
+
+    def __init__(self, output_dir, fsync=True):
+        self.directory = os.path.join(output_dir, SNAPSHOT_DIRNAME, HISTORY_DIRNAME)
+        self.fsync = fsync
+
+    def entries(self):
+        """[(taken_at, path)] urut seq; nama file: <seq>_<stamp>.npz"""
+        if not os.path.isdir(self.directory):
+            return []
+        entries = []
+        for filename in sorted(os.listdir(self.directory)):
+            if not filename.endswith(".npz") or filename.startswith("."):
+                continue
+            stamp = filename[:-len(".npz")].split("_", 1)[1]
+            taken_at = time.strftime(TIMESTAMP_FORMAT, time.strptime(stamp, FILE_STAMP_FORMAT))
+            entries.append((taken_at, os.path.join(self.directory, filename)))
+        return entries
+
+    def _state(self, entries):
+        """Rekonstruksi snapshot entri terakhir: keyframe terdekat lalu terapkan delta setelahnya"""
+        start = len(entries) - 1
+        while start > 0:
+            with np.load(entries[start][1]) as f:
+                if str(f["kind"]) == "full":
+                    break
+            start -= 1
+
+        keys = np.zeros(0, dtype=np.uint64)
+        counts = np.zeros((0, 3), dtype=np.int64)
+        for _, path in entries[start:]:
+            with np.load(path) as f:
+                delta_keys = np.cumsum(f["keys"], dtype=np.uint64)
+                delta_counts = f["counts"].astype(np.int64)
+                kind = str(f["kind"])
+            if kind == "full":
+                keys, counts = delta_keys, delta_counts
+                continue
+            union = np.union1d(keys, delta_keys)
+            merged = np.zeros((len(union), 3), dtype=np.int64)
+            merged[np.searchsorted(union, keys)] = counts
+            merged[np.searchsorted(union, delta_keys)] += delta_counts
+            keep = merged.any(axis=1)
+            keys, counts = union[keep], merged[keep]
+        return InventorySnapshot(keys, counts, entries[-1][0])
+
+    def head(self):
+        entries = self.entries()
+        return self._state(entries) if entries else None
+
+    def as_of(self, timestamp):
+        """Kondisi inventaris pada snapshot terakhir yang diambil sebelum/pada timestamp"""
+        entries = [entry for entry in self.entries() if entry[0] <= timestamp]
+        if not entries:
+            raise ValueError(f"Tidak ada snapshot inventaris sebelum {timestamp} di {self.directory}")
+        return self._state(entries)
+
+    def append(self, snapshot):
+        entries = self.entries()
+        os.makedirs(self.directory, exist_ok=True)
+        if len(entries) % KEYFRAME_INTERVAL == 0:
+            kind, keys, counts = "full", snapshot.keys, snapshot.counts.astype(np.int64)
+        else:
+            previous = self._state(entries)
+            keys = np.union1d(previous.keys, snapshot.keys)
+            counts = snapshot.aligned(keys).astype(np.int64) - previous.aligned(keys).astype(np.int64)
+            changed = counts.any(axis=1)
+            kind, keys, counts = "delta", keys[changed], counts[changed]
+
+        # Key terurut disimpan sebagai selisih antar key, jumlah sebagai int32 (delta bisa negatif)
+        path = os.path.join(self.directory, f"{len(entries):06d}_{file_stamp(snapshot.taken_at)}.npz")
+
+        def _write(tmp_path):
+            buffer = io.BytesIO()
+            np.savez_compressed(buffer, kind=np.array(kind), keys=np.diff(keys, prepend=np.uint64(0)), counts=counts.astype(np.int32))
+            with open(tmp_path, "wb") as f:
+                f.write(buffer.getvalue())
+
+        atomic_write(path, _write, suffix=".npz", fsync=self.fsync)
+        return path
+
+def record_snapshot(output_dir, snapshot, update_latest=True, fsync=True):
+    """Tambahkan snapshot ke riwayat dan (opsional) jadikan pembanding run berikutnya"""
+    SnapshotStore(output_dir, fsync=fsync).append(snapshot)
+    if update_latest:
+        snapshot.save(snapshot_path(output_dir), fsync=fsync)
+    return snapshot
+
+def take_snapshot(engine, output_dir, fsync=True):
+    """Simpan inventaris saat ini sebagai pembanding run berikutnya (export_diff.py) dan entri riwayat --as-of"""
+    os.makedirs(os.path.dirname(snapshot_path(output_dir)), exist_ok=True)
+    return record_snapshot(output_dir, InventorySnapshot.from_db(engine), fsync=fsync)
+
+def load_latest_snapshot(output_dir):
+    path = snapshot_path(output_dir)
+    return InventorySnapshot.load(path) if os.path.exists(path) else None
+
+# =========================================================
+# 📝 Tabel perubahan (nama unit & equipment hanya untuk baris yang berubah)
+# =========================================================
+CHANGE_COLUMNS = [
+    "Level", "Owner ID", "Nama Unit", "Equipment ID", "Penggolongan", "Jenis Materil",
+    "Baik Lama", "Baik Baru", "Selisih Baik",
+    "Rusak Ringan Lama", "Rusak Ringan Baru", "Selisih Rusak Ringan",
+    "Rusak Berat Lama", "Rusak Berat Baru", "Selisih Rusak Berat",
+]
+
+def _owner_names(engine, level, owner_ids):
+    if len(owner_ids) == 0:
+        return {}
+    ids = ",".join(str(int(i)) for i in np.unique(owner_ids))
+    df = pd.read_sql(f"SELECT id, name FROM {OWNER_TABLES[level]} WHERE id IN ({ids});", engine)
+    return dict(zip(df["id"].astype(int), df["name"]))
+
+def changes_frame(engine, catalog, keys, old, new):
+    """DataFrame perubahan dengan nama unit/equipment, urut level → owner → urutan katalog"""
+    levels, owner_ids, equipment_ids = split_keys(keys)
+    delta = new.astype(np.int64) - old.astype(np.int64)
+
+    owner_names = np.empty(len(keys), dtype=object)
+    for code, level in enumerate(OWNER_LEVELS):
+        mask = levels == code
+        names = _owner_names(engine, level, owner_ids[mask])
+        owner_names[mask] = [names.get(int(i)) for i in owner_ids[mask]]
+
+    catalog = catalog.set_index("equipment_id")
+    equipment = catalog.reindex(equipment_ids)
+    df = pd.DataFrame({
+        "Level": [OWNER_LEVELS[code] for code in levels],
+        "Owner ID": owner_ids,
+        "Nama Unit": owner_names,
+        "Equipment ID": equipment_ids,
+        "Penggolongan": equipment["penggolongan"].to_numpy(),
+        "Jenis Materil": equipment["jenis_materiil"].to_numpy(),
+    })
+    for i, label in enumerate(["Baik", "Rusak Ringan", "Rusak Berat"]):
+        df[f"{label} Lama"] = old[:, i]
+        df[f"{label} Baru"] = new[:, i]
+        df[f"Selisih {label}"] = delta[:, i]
+
+    # Urutan baris katalog untuk equipment dalam satu unit (equipment terhapus di akhir)
+    catalog_order = pd.Series(np.arange(len(catalog)), index=catalog.index).reindex(equipment_ids).fillna(len(catalog)).to_numpy()
+    order = np.lexsort((equipment_ids, catalog_order, owner_ids, levels))
+    return df.iloc[order].reset_index(drop=True)[CHANGE_COLUMNS]
@@ -0,0 +1,86 @@
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+
+# =========================================================
+# ⏱️ Benchmark cold start entry point (--help di interpreter baru)
+# =========================================================
+ENTRY_POINTS = ["index.py", "index-new.py", "index-sheet-mabes.py", "export_diff.py", "export_shard.py", "explain_queries.py"]
+HEAVY_MODULES = ("pandas", "numpy", "openpyxl", "sqlalchemy", "psycopg2", "dotenv")
+IMPORTTIME_RE = re.compile(r"^import time:\s+\d+ \|\s+(\d+) \|\s+(\S+)$")
+
+parser = argparse.ArgumentParser(description='Ukur waktu start (cold start) script export: --help dan import modul berat')
+parser.add_argument('--repeat', type=int, default=5, help='Jumlah pengukuran per entry point (median yang dilaporkan)')
+parser.add_argument('--max-seconds', type=float, help='Gagal (exit 1) jika median --help entry point mana pun melebihi batas ini')
+parser.add_argument('--record', help='Tambahkan hasil sebagai satu baris JSON ke file ini (riwayat antar versi)')
+parser.add_argument('entry_points', nargs='*', default=ENTRY_POINTS, help='Script yang diukur (default: semua script export)')
+args = parser.parse_args()
+
+base_dir = os.path.dirname(os.path.abspath(__file__))
+
+def run_help(script, importtime=False):
+    """Satu proses baru: `python [-X importtime] script --help`; mengembalikan (detik, stderr)"""
+    command = [sys.executable] + (["-X", "importtime"] if importtime else []) + [os.path.join(base_dir, script), "--help"]
+    start = time.perf_counter()
+    result = subprocess.run(command, cwd=base_dir, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    elapsed = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(f"{script} --help gagal (exit {result.returncode}):\n{result.stderr}")
+    return elapsed, result.stderr
+
+def heavy_imports(stderr):
+    """Modul berat (top-level) yang ikut dimuat, dengan waktu import kumulatif (ms)"""
+    loaded = {}
+    for line in stderr.splitlines():
+        match = IMPORTTIME_RE.match(line)
+        if match and match.group(2) in HEAVY_MODULES and match.group(2) not in loaded:
+            loaded[match.group(2)] = int(match.group(1)) / 1000
+    return loaded
+
+def import_cost(module):
+    """Waktu import satu modul di interpreter baru (biaya yang dibayar saat export benar-benar jalan)"""
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", f"import {module}"], cwd=base_dir, check=True)
+    return time.perf_counter() - start
+
+# Baseline: interpreter kosong
+python_start = statistics.median(import_cost("os") for _ in range(args.repeat))
+print(f"🐍 Interpreter kosong: {python_start * 1000:.0f} ms")
+
+results = {}
+failed = False
+for script in args.entry_points:
+    timings = [run_help(script)[0] for _ in range(args.repeat)]
+    heavy = heavy_imports(run_help(script, importtime=True)[1])
+    median = statistics.median(timings)
+    results[script] = {"median": round(median, 4), "min": round(min(timings), 4), "heavy_imports": heavy}
+
+    over = args.max_seconds is not None and median > args.max_seconds
+    failed = failed or over
+    status = "❌" if over else "✅"
+    print(f"{status} {script} --help: median {median * 1000:.0f} ms, min {min(timings) * 1000:.0f} ms"
+          + (f" (melebihi {args.max_seconds * 1000:.0f} ms)" if over else ""))
+    if heavy:
+        print("   ⚠️ modul berat dimuat saat --help: " + ", ".join(f"{m} {ms:.0f} ms" for m, ms in heavy.items()))
+
+export_core_import = import_cost("export_core")
+print(f"📦 import export_core (jalur export): {export_core_import * 1000:.0f} ms")
+
+if args.record:
+    record = {
+        "taken_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "python": sys.version.split()[0],
+        "python_start": round(python_start, 4),
+        "export_core_import": round(export_core_import, 4),
+        "entry_points": results,
+    }
+    with open(args.record, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record) + "\n")
+    print(f"📝 Hasil ditambahkan ke {args.record}")
+
+sys.exit(1 if failed else 0)
@@ -0,0 +1,58 @@
+import os
+import sys
+import subprocess
+import threading
+
+import pytest
+
+# Modul export berada di root repo (script datar, tanpa package)
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from dataset import build_dataset, pyformat_engine
+
+@pytest.fixture(scope="session")
+def dataset_path(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("dataset") / "inventaris.sqlite")
+    build_dataset(path, 1)
+    return path
+
+@pytest.fixture(scope="session")
+def engine(dataset_path):
+    from sqlalchemy import create_engine
+
+    return create_engine(f"sqlite:///{dataset_path}")
+
+@pytest.fixture(scope="session")
+def pyformat(dataset_path):
+    return pyformat_engine(dataset_path)
+
+@pytest.fixture(scope="session")
+def run_script(dataset_path):
+    """run_script("index.py", *args, cwd=...) → CompletedProcess; script berjalan di proses baru terhadap dataset (atau db=salinan)"""
+    runner = os.path.join(REPO_DIR, "tests", "run_script.py")
+
+    def run(script, *args, cwd, check=True, background=False, db=None):
+        command = [sys.executable, runner, str(db or dataset_path), os.path.join(REPO_DIR, script), *map(str, args)]
+        if background:
+            return subprocess.Popen(command, cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        result = subprocess.run(command, cwd=cwd, capture_output=True, text=True)
+        if check and result.returncode != 0:
+            raise AssertionError(f"{script} {' '.join(map(str, args))} exit {result.returncode}\n{result.stdout}\n{result.stderr}")
+        return result
+
+    return run
+
+@pytest.fixture
+def export_service(engine):
+    """ExportService di port bebas (thread): (base_url, service)"""
+    from export_core import CachedExportData
+    from export_service import ExportService, create_server
+
+    service = ExportService(CachedExportData(engine))
+    server = create_server(service, "127.0.0.1", 0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}", service
+    server.shutdown()
+    server.server_close()
@@ -0,0 +1,129 @@
+import random
+import sqlite3
+
+# =========================================================
+# 🧪 Dataset sintetis SQLite untuk test (seed tetap)
+# =========================================================
+SEED = 20240601
+OWNER_TYPES = {
+    "subsatker": "App\\Models\\SubsatkerPolda",
+    "polres": "App\\Models\\Polres",
+    "polsek": "App\\Models\\Polsek",
+    "satker": "App\\Models\\SatkerMabes",
+}
+
+SCHEMA = """
+CREATE TABLE polda(id INTEGER PRIMARY KEY, name TEXT);
+CREATE TABLE polres(id INTEGER PRIMARY KEY, name TEXT, polda_id INT);
+CREATE TABLE polsek(id INTEGER PRIMARY KEY, name TEXT, polres_id INT);
+CREATE TABLE subsatker_poldas(id INTEGER PRIMARY KEY, name TEXT, polda_id INT);
+CREATE TABLE satker_mabes(id INTEGER PRIMARY KEY, name TEXT, level INT, parent_id INT);
+CREATE TABLE equipment_types(id INTEGER PRIMARY KEY, name TEXT);
+CREATE TABLE equipments(id INTEGER PRIMARY KEY, name TEXT, id_equipment_type INT, "order" INT, deleted_at TEXT);
+CREATE TABLE equipment_inventories(id INTEGER PRIMARY KEY, equipment_id INT, owner_type TEXT, owner_id INT,
+                                   baik INT, rusak_ringan INT, rusak_berat INT, updated_at TEXT);
+CREATE INDEX equipment_inventories_owner ON equipment_inventories (owner_type, owner_id, equipment_id);
+CREATE INDEX polres_polda ON polres (polda_id);
+CREATE INDEX polsek_polres ON polsek (polres_id);
+CREATE INDEX subsatker_poldas_polda ON subsatker_poldas (polda_id);
+"""
+
+def build_dataset(path, scale):
+    """Hierarki POLDA/POLRES/Polsek + pohon Satker Mabes 3 level; sebagian equipment terhapus, sebagian unit tanpa inventaris"""
+    rng = random.Random(SEED)
+    conn = sqlite3.connect(path)
+    conn.executescript(SCHEMA)
+
+    equipment_ids = []
+    for type_id in range(1, 9):
+        conn.execute("INSERT INTO equipment_types VALUES (?, ?)", (type_id, f"Golongan {type_id}"))
+        for order in range(1, 25 * scale + 1):
+            equipment_id = len(equipment_ids) + 1
+            deleted_at = "2020-01-01" if equipment_id % 37 == 0 else None
+            conn.execute("INSERT INTO equipments VALUES (?, ?, ?, ?, ?)", (equipment_id, f"Materiil {type_id}-{order}", type_id, order, deleted_at))
+            equipment_ids.append(equipment_id)
+
+    rows = []
+    def add_inventory(level, owner_id, share=0.6):
+        for equipment_id in rng.sample(equipment_ids, int(len(equipment_ids) * share)):
+            # Kadang dua baris untuk (owner, equipment) yang sama: query harus menjumlahkan
+            for _ in range(1 + (rng.random() < 0.1)):
+                rows.append((equipment_id, OWNER_TYPES[level], owner_id, rng.randint(0, 9), rng.randint(0, 4), rng.randint(0, 2), "2025-01-01"))
+
+    polres_id = polsek_id = subsatker_id = 0
+    for polda_id in range(1, 4):
+        conn.execute("INSERT INTO polda VALUES (?, ?)", (polda_id, f"Polda {polda_id}"))
+        for s in range(4):
+            subsatker_id += 1
+            conn.execute("INSERT INTO subsatker_poldas VALUES (?, ?, ?)", (subsatker_id, f"Subsatker {polda_id}-{s}", polda_id))
+            add_inventory("subsatker", subsatker_id)
+        for r in range(6 * scale):
+            polres_id += 1
+            conn.execute("INSERT INTO polres VALUES (?, ?, ?)", (polres_id, f"Polres {polda_id}-{r}", polda_id))
+            add_inventory("polres", polres_id)
+            for k in range(8 * scale):
+                polsek_id += 1
+                conn.execute("INSERT INTO polsek VALUES (?, ?, ?)", (polsek_id, f"Polsek {polda_id}-{r}-{k}", polres_id))
+                if k % 5 != 4:
+                    add_inventory("polsek", polsek_id, share=0.3)
+
+    satker_id = 0
+    def add_satker(level, parent_id, name):
+        nonlocal satker_id
+        satker_id += 1
+        conn.execute("INSERT INTO satker_mabes VALUES (?, ?, ?, ?)", (satker_id, name, level, parent_id))
+        add_inventory("satker", satker_id, share=0.4)
+        return satker_id
+
+    for root in range(2):
+        root_id = add_satker(1, None, f"Satker Mabes {root}")
+        for biro in range(4):
+            biro_id = add_satker(2, root_id, f"Biro {root}-{biro}")
+            for bag in range(3 * scale):
+                add_satker(3, biro_id, f"Bagian {root}-{biro}-{bag}")
+
+    conn.executemany(
+        "INSERT INTO equipment_inventories (equipment_id, owner_type, owner_id, baik, rusak_ringan, rusak_berat, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        rows,
+    )
+    conn.commit()
+    conn.close()
+    return len(rows)
+
+# =========================================================
+# 🔌 SQLite lewat paramstyle pyformat (perilaku psycopg2)
+# =========================================================
+# psycopg2 memformat SETIAP statement dengan parameter (juga dict kosong dari exec_driver_sql):
+# '%' mentah di SQL menjadi placeholder dan query gagal. SQLite biasa menyembunyikan bug itu.
+class PyformatCursor:
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def execute(self, statement, parameters=None):
+        if parameters is not None:
+            if isinstance(parameters, dict):
+                statement = statement % {name: f":{name}" for name in parameters}
+            else:
+                statement = statement % tuple("?" for _ in parameters)
+        return self._cursor.execute(statement, parameters or ())
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+class PyformatConnection:
+    def __init__(self, connection):
+        self._connection = connection
+
+    def cursor(self, *args, **kwargs):
+        return PyformatCursor(self._connection.cursor(*args, **kwargs))
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+def pyformat_engine(path):
+    from sqlalchemy import create_engine
+
+    return create_engine(
+        "sqlite://", paramstyle="pyformat",
+        creator=lambda: PyformatConnection(sqlite3.connect(path, check_same_thread=False)),
+    )
@@ -0,0 +1,18 @@
+import os
+import sys
+import runpy
+
+import sqlalchemy
+
+# =========================================================
+# 🧪 Jalankan script export terhadap dataset SQLite (tanpa PostgreSQL / .env)
+# =========================================================
+# python tests/run_script.py <dataset.sqlite> <script.py> [argumen script...]
+# create_db_engine() membuat engine PostgreSQL dari .env; di sini create_engine diarahkan ke dataset.
+dataset, script = sys.argv[1], os.path.abspath(sys.argv[2])
+_create_engine = sqlalchemy.create_engine
+sqlalchemy.create_engine = lambda *args, **kwargs: _create_engine(f"sqlite:///{dataset}")
+
+sys.argv = [script] + sys.argv[3:]
+sys.path.insert(0, os.path.dirname(script))
+runpy.run_path(script, run_name="__main__")
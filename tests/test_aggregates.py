@@ -0,0 +1,53 @@
+import datetime
+
+import pandas as pd
+
+import aggregates
+from aggregates import AGGREGATE_VIEW, RAW_INVENTORY_TABLE, inventory_source
+from snapshot import InventorySnapshot
+
+T0 = datetime.datetime(2026, 1, 1, 8, 0)
+T1 = datetime.datetime(2026, 1, 1, 9, 0)
+
+def fake_postgres(monkeypatch, lag):
+    """aggregate_status/aggregate_lag palsu: view terisi, lag = [(view updated_at, tabel updated_at)]"""
+    calls = []
+    monkeypatch.setattr(aggregates, "aggregate_status", lambda engine: True)
+    monkeypatch.setattr(aggregates, "aggregate_lag", lambda engine: calls.append(1) or lag[0])
+    monkeypatch.setattr(aggregates, "_sources", {})
+    return calls
+
+def test_sqlite_reads_raw_table(engine):
+    assert inventory_source(engine) == RAW_INVENTORY_TABLE
+
+def test_stale_view_falls_back_to_raw_table(engine, monkeypatch, capsys):
+    fake_postgres(monkeypatch, [(T0, T1)])
+    assert inventory_source(engine) == RAW_INVENTORY_TABLE
+    assert "tertinggal" in capsys.readouterr().out
+
+def test_source_rechecked_after_ttl(engine, monkeypatch):
+    lag = [(T1, T1)]
+    calls = fake_postgres(monkeypatch, lag)
+    clock = [1000.0]
+    monkeypatch.setattr(aggregates.time, "monotonic", lambda: clock[0])
+
+    assert inventory_source(engine) == AGGREGATE_VIEW
+    lag[0] = (T0, T1)
+    assert inventory_source(engine) == AGGREGATE_VIEW
+    assert len(calls) == 1
+
+    clock[0] += aggregates.SOURCE_TTL + 1
+    assert inventory_source(engine) == RAW_INVENTORY_TABLE
+    assert len(calls) == 2
+
+def test_snapshot_never_reads_view(engine, monkeypatch):
+    # Snapshot = pembanding diff & riwayat: dari tabel mentah meski view dianggap segar
+    fake_postgres(monkeypatch, [(T1, T1)])
+    queries = []
+    read_sql = pd.read_sql
+    monkeypatch.setattr(pd, "read_sql", lambda query, *args, **kwargs: queries.append(str(query)) or read_sql(query, *args, **kwargs))
+
+    snapshot = InventorySnapshot.from_db(engine)
+
+    assert len(snapshot) > 0
+    assert queries and not any(AGGREGATE_VIEW in query for query in queries)
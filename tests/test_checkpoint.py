@@ -0,0 +1,83 @@
+import json
+import os
+
+from checkpoint import JOURNAL_FILENAME, LEGACY_JOURNAL_FILENAME, CheckpointJournal
+from output_manager import OutputManager
+from workbooks import folder_values
+
+MODE = {"polda": True, "selection": None}
+
+def journal(tmp_path, resume=False, mode=MODE):
+    return CheckpointJournal(str(tmp_path), mode, resume=resume, output=OutputManager(str(tmp_path), fsync=False))
+
+def test_mark_done_appends_one_line(tmp_path):
+    j = journal(tmp_path)
+    sizes = []
+    for i in range(50):
+        j.mark_done(f"polsek:{i}")
+        sizes.append(os.path.getsize(j.path))
+    # Pertumbuhan per unit konstan (satu baris), bukan menulis ulang seluruh journal
+    growth = {b - a for a, b in zip(sizes, sizes[1:])}
+    assert max(growth) - min(growth) <= 2
+    j.close()
+
+def test_resume_after_crash_with_torn_line(tmp_path):
+    j = journal(tmp_path)
+    j.mark_done("polda:1", None)
+    j.mark_done("polda:2", None)
+    j._file.write('{"unit": "polda:3", "fi')  # crash di tengah tulis
+    j._file.flush()
+
+    resumed = journal(tmp_path, resume=True)
+    assert resumed.completed == {"polda:1": None, "polda:2": None}
+    resumed.mark_done("polda:3")
+    resumed.close()
+    assert journal(tmp_path, resume=True).completed == {"polda:1": None, "polda:2": None, "polda:3": None}
+
+def test_close_compacts(tmp_path):
+    j = journal(tmp_path)
+    for _ in range(3):
+        j.mark_done("satker:1")
+    j.close()
+    with open(j.path, encoding="utf-8") as f:
+        lines = [json.loads(line) for line in f]
+    assert lines == [{"mode": MODE}, {"unit": "satker:1", "file": None}]
+
+def test_mode_change_starts_over(tmp_path):
+    j = journal(tmp_path)
+    j.mark_done("polda:1")
+    j.close()
+    assert journal(tmp_path, resume=True, mode={"polda": False}).completed == {}
+
+def test_resume_from_legacy_journal(tmp_path):
+    with open(tmp_path / LEGACY_JOURNAL_FILENAME, "w", encoding="utf-8") as f:
+        json.dump({"mode": MODE, "completed": {"polda:1": None}}, f, indent=2)
+
+    j = journal(tmp_path, resume=True)
+    assert j.is_done("polda:1")
+    assert not (tmp_path / LEGACY_JOURNAL_FILENAME).exists()
+    assert os.path.basename(j.path) == JOURNAL_FILENAME
+    j.close()
+
+def test_resume_ignores_journal_of_other_script(tmp_path, run_script):
+    # index.py (satker layout kolom) dan index-sheet-mabes.py (satu sheet per satker) memakai unit satker:{id}
+    # yang sama di folder exports yang sama: --resume tidak boleh melewati file ber-layout lain
+    fresh = tmp_path / "fresh"
+    fresh.mkdir()
+    run_script("index-sheet-mabes.py", "--satker-mabes-only", cwd=fresh)
+
+    resumed = tmp_path / "resumed"
+    resumed.mkdir()
+    run_script("index.py", "--satker-mabes-only", cwd=resumed)
+    result = run_script("index-sheet-mabes.py", "--satker-mabes-only", "--resume", cwd=resumed)
+
+    assert "Mode export berbeda" in result.stdout
+    expected = folder_values(fresh / "exports" / "satker_mabes")
+    assert folder_values(resumed / "exports" / "satker_mabes") == expected
+
+    # Arah sebaliknya: kembali ke index.py --resume menulis ulang layout kolom
+    columns = tmp_path / "columns"
+    columns.mkdir()
+    run_script("index.py", "--satker-mabes-only", cwd=columns)
+    run_script("index.py", "--satker-mabes-only", "--resume", cwd=resumed)
+    assert folder_values(resumed / "exports" / "satker_mabes") == folder_values(columns / "exports" / "satker_mabes")
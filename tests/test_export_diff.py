@@ -0,0 +1,99 @@
+import shutil
+import sqlite3
+
+import pandas as pd
+import pytest
+from openpyxl import load_workbook
+
+from dataset import OWNER_TYPES
+from snapshot import CHANGE_COLUMNS, SnapshotStore, load_latest_snapshot
+
+@pytest.fixture
+def db_path(dataset_path, tmp_path):
+    # Test mengubah inventaris: salinan dataset sendiri
+    path = str(tmp_path / "inventaris.sqlite")
+    shutil.copy(dataset_path, path)
+    return path
+
+def run_diff(run_script, tmp_path, db_path, *args):
+    """Satu run export_diff.py → (stdout, CSV, baris XLSX) file perubahan run ini (None jika tidak ditulis)"""
+    changes = tmp_path / "exports" / "changes"
+    for path in changes.glob("*"):
+        path.unlink()
+    result = run_script("export_diff.py", *args, cwd=tmp_path, db=db_path)
+    csv_files = list(changes.glob("*.csv"))
+    xlsx_files = list(changes.glob("*.xlsx"))
+    df = pd.read_csv(csv_files[0]) if csv_files else None
+    xlsx_rows = [list(row) for row in load_workbook(xlsx_files[0]).active.iter_rows(values_only=True)] if xlsx_files else None
+    return result.stdout, df, xlsx_rows
+
+def by_key(df):
+    return {(row["Level"], row["Owner ID"], row["Equipment ID"]): row for _, row in df.iterrows()}
+
+def test_diff_added_removed_changed(tmp_path, db_path, run_script):
+    stdout, df, _ = run_diff(run_script, tmp_path, db_path)
+    assert df is None and "Belum ada snapshot" in stdout
+
+    # Tanpa perubahan: file tetap ditulis, hanya header
+    stdout, df, xlsx_rows = run_diff(run_script, tmp_path, db_path)
+    assert "0 baris berubah" in stdout
+    assert list(df.columns) == CHANGE_COLUMNS and df.empty
+    assert xlsx_rows == [CHANGE_COLUMNS]
+
+    conn = sqlite3.connect(db_path)
+    polres = OWNER_TYPES["polres"]
+    owner_id, removed_equipment = conn.execute(
+        "SELECT owner_id, MIN(equipment_id) FROM equipment_inventories WHERE owner_type = ? GROUP BY owner_id ORDER BY owner_id LIMIT 1", (polres,)
+    ).fetchone()
+    removed = conn.execute(
+        "SELECT SUM(baik), SUM(rusak_ringan), SUM(rusak_berat) FROM equipment_inventories WHERE owner_type = ? AND owner_id = ? AND equipment_id = ?",
+        (polres, owner_id, removed_equipment),
+    ).fetchone()
+    conn.execute("DELETE FROM equipment_inventories WHERE owner_type = ? AND owner_id = ? AND equipment_id = ?", (polres, owner_id, removed_equipment))
+    added_equipment = conn.execute(
+        "SELECT MIN(id) FROM equipments WHERE deleted_at IS NULL AND id NOT IN (SELECT equipment_id FROM equipment_inventories WHERE owner_type = ? AND owner_id = ?)",
+        (polres, owner_id),
+    ).fetchone()[0]
+    conn.execute("INSERT INTO equipment_inventories (equipment_id, owner_type, owner_id, baik, rusak_ringan, rusak_berat, updated_at) VALUES (?, ?, ?, 3, 2, 1, '2026-01-01')",
+                 (added_equipment, polres, owner_id))
+    changed_owner, changed_equipment, baik = conn.execute(
+        "SELECT owner_id, equipment_id, SUM(baik) FROM equipment_inventories WHERE owner_type = ? GROUP BY owner_id, equipment_id ORDER BY owner_id, equipment_id LIMIT 1",
+        (OWNER_TYPES["satker"],),
+    ).fetchone()
+    conn.execute("UPDATE equipment_inventories SET baik = baik + 5 WHERE id = (SELECT MIN(id) FROM equipment_inventories WHERE owner_type = ? AND owner_id = ? AND equipment_id = ?)",
+                 (OWNER_TYPES["satker"], changed_owner, changed_equipment))
+    conn.commit()
+    conn.close()
+
+    stdout, df, xlsx_rows = run_diff(run_script, tmp_path, db_path)
+    assert "3 baris berubah" in stdout
+    rows = by_key(df)
+    assert set(rows) == {("polres", owner_id, removed_equipment), ("polres", owner_id, added_equipment), ("satker", changed_owner, changed_equipment)}
+
+    gone = rows[("polres", owner_id, removed_equipment)]
+    assert [gone["Baik Lama"], gone["Rusak Ringan Lama"], gone["Rusak Berat Lama"]] == list(removed)
+    assert [gone["Baik Baru"], gone["Rusak Ringan Baru"], gone["Rusak Berat Baru"]] == [0, 0, 0]
+    assert gone["Selisih Baik"] == -removed[0]
+
+    new = rows[("polres", owner_id, added_equipment)]
+    assert [new["Baik Lama"], new["Baik Baru"], new["Selisih Baik"], new["Selisih Rusak Ringan"], new["Selisih Rusak Berat"]] == [0, 3, 3, 2, 1]
+    assert isinstance(new["Jenis Materil"], str) and isinstance(new["Nama Unit"], str)
+
+    changed = rows[("satker", changed_owner, changed_equipment)]
+    assert [changed["Baik Lama"], changed["Baik Baru"], changed["Selisih Baik"], changed["Selisih Rusak Ringan"]] == [baik, baik + 5, 5, 0]
+
+    assert xlsx_rows[0] == CHANGE_COLUMNS
+    assert [list(row) for row in df.itertuples(index=False)] == xlsx_rows[1:]
+
+    # Setiap run masuk riwayat --as-of; pembanding = run terakhir
+    entries = SnapshotStore(str(tmp_path / "exports")).entries()
+    assert len(entries) == 3
+    assert load_latest_snapshot(str(tmp_path / "exports")).taken_at == entries[-1][0]
+
+def test_keep_baseline(tmp_path, db_path, run_script):
+    run_diff(run_script, tmp_path, db_path)
+    baseline = load_latest_snapshot(str(tmp_path / "exports")).taken_at
+    _, df, xlsx_rows = run_diff(run_script, tmp_path, db_path, "--keep-baseline", "--format", "csv")
+    assert df is not None and xlsx_rows is None
+    assert load_latest_snapshot(str(tmp_path / "exports")).taken_at == baseline
+    assert len(SnapshotStore(str(tmp_path / "exports")).entries()) == 2
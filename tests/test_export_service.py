@@ -0,0 +1,84 @@
+import io
+import urllib.error
+import urllib.request
+
+import pytest
+from openpyxl import load_workbook
+
+from export_core import ExportData, build_polda_workbook, build_polres_workbook, build_satker_workbook
+from export_service import XLSX_CONTENT_TYPE
+from workbooks import workbook_values
+
+def request(url, method="GET"):
+    """(status, header, body); status 4xx/5xx tidak dilempar"""
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, method=method)) as response:
+            return response.status, response.headers, response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.headers, e.read()
+
+def values_of(body, tmp_path, name):
+    path = tmp_path / name
+    path.write_bytes(body)
+    return workbook_values(str(path))
+
+def expected_values(wb, tmp_path, name):
+    path = str(tmp_path / name)
+    wb.save(path)
+    return workbook_values(path)
+
+@pytest.fixture(scope="module")
+def data(engine):
+    return ExportData(engine)
+
+def test_health(export_service):
+    base_url, _ = export_service
+    status, _, body = request(f"{base_url}/health")
+    assert (status, body) == (200, b"ok\n")
+
+def test_polda_polres_satker_match_builders(export_service, data, tmp_path):
+    base_url, _ = export_service
+    polres = data.polres_list(1).iloc[0]
+    df_all_satkers = data.satker_tree()
+    satker = df_all_satkers.iloc[0]
+    cases = [
+        ("/polda/1.xlsx", build_polda_workbook(data, 1, "Polda 1", polres_layout="polsek", rollup=data.polda_rollup(1))),
+        (f"/polres/{polres['polres_id']}.xlsx", build_polres_workbook(data, polres["polres_id"], polres["polres_name"], rollup=data.polda_rollup(1))),
+        (f"/satker/{satker['id']}", build_satker_workbook(data, satker, df_all_satkers, "columns", rollup=data.satker_rollup(df_all_satkers))),
+    ]
+    for i, (path, expected) in enumerate(cases):
+        status, headers, body = request(base_url + path)
+        assert status == 200, path
+        assert headers["Content-Type"] == XLSX_CONTENT_TYPE
+        assert headers["Content-Disposition"].endswith('.xlsx"')
+        assert values_of(body, tmp_path, f"got_{i}.xlsx") == expected_values(expected, tmp_path, f"expected_{i}.xlsx")
+
+def test_toc_links_back_to_service(export_service, data):
+    base_url, _ = export_service
+    status, _, body = request(f"{base_url}/toc/2.xlsx")
+    assert status == 200
+    ws = load_workbook(io.BytesIO(body)).active
+    targets = [cell.hyperlink.target for row in ws.iter_rows() for cell in row if cell.hyperlink]
+    assert len(targets) == len(data.polres_list(2))
+    assert all(target.startswith(f"{base_url}/polres/") for target in targets)
+
+@pytest.mark.parametrize("path", ["/polda/999.xlsx", "/polres/99999", "/satker/99999.xlsx", "/toc/999", "/polsek/1", "/polda/abc"])
+def test_unknown_unit_is_404(export_service, path):
+    base_url, _ = export_service
+    assert request(base_url + path)[0] == 404
+
+def test_invalidate_clears_cache(export_service):
+    base_url, service = export_service
+    assert request(f"{base_url}/polda/1.xlsx")[0] == 200
+    assert service.data._inventory and service.data._hierarchy is not None
+
+    status, _, body = request(f"{base_url}/invalidate?what=inventory", method="POST")
+    assert status == 200
+    assert not service.data._inventory and service.data._hierarchy is not None
+
+    assert request(f"{base_url}/polda/1.xlsx")[0] == 200
+    assert request(f"{base_url}/invalidate", method="POST")[0] == 200
+    assert not service.data._inventory and service.data._hierarchy is None
+
+    assert request(f"{base_url}/invalidate?what=semua", method="POST")[0] == 400
+    assert request(f"{base_url}/reload", method="POST")[0] == 404
@@ -0,0 +1,28 @@
+import io
+import urllib.request
+
+from openpyxl import load_workbook
+
+def fetch(url):
+    with urllib.request.urlopen(url) as response:
+        return response.status, response.read()
+
+def test_lazy_requires_toc_base_url(tmp_path, run_script):
+    result = run_script("index-new.py", "--lazy", "--polda-only", cwd=tmp_path, check=False)
+    assert result.returncode == 2
+    assert "--toc-base-url" in result.stderr
+
+def test_every_toc_hyperlink_resolves(tmp_path, run_script, export_service, engine):
+    base_url, _ = export_service
+    run_script("index-new.py", "--lazy", "--polda-only", "--toc-base-url", base_url, cwd=tmp_path)
+
+    tocs = sorted((tmp_path / "exports").glob("POLDA */Daftar_Isi_POLDA_*.xlsx"))
+    assert len(tocs) == 3
+    for toc in tocs:
+        ws = load_workbook(toc).active
+        links = [(cell.value, cell.hyperlink.target) for row in ws.iter_rows() for cell in row if cell.hyperlink]
+        assert len(links) == ws.max_row - 2  # semua baris POLRES (tanpa header & Total POLDA)
+        for polres_name, target in links:
+            status, body = fetch(target)
+            assert status == 200
+            assert load_workbook(io.BytesIO(body)).sheetnames[0] == polres_name
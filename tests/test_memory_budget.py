@@ -0,0 +1,91 @@
+import gc
+
+from openpyxl import load_workbook
+
+from export_core import ExportData, SatkerSheetCache, build_satker_workbook
+from xlsx_writer import MemoryBudget, XlsxWorkbook
+
+class Owner:
+    pass
+
+def test_running_total():
+    budget = MemoryBudget(100)
+    a, b = Owner(), Owner()
+    assert budget.hold(a, 40) and budget.hold(b, 50)
+    assert budget.used == 90
+    assert not budget.hold(Owner(), 20)
+    assert budget.hold(a, 10)          # hold ulang menggantikan ukuran lama
+    assert budget.used == 60
+    budget.drop(b)
+    assert budget.used == 10
+    del a
+    gc.collect()
+    assert budget.used == 0
+
+def test_shared_content_counted_once():
+    from export_core import SheetContent
+
+    budget = MemoryBudget(10**6)
+    content = SheetContent("unit", [["No."]], [("row", [1, "a"])] * 10, [10, 10])
+    owner = Owner()
+    assert budget.hold(owner, budget.estimate(content), content)
+    wb = XlsxWorkbook(budget)
+    wb.active.content = content
+    assert budget.used == budget.estimate(content)
+    budget.drop(owner)
+    assert not budget.counted(content)
+
+def test_reassign_spilled_sheet_releases_old_spill(tmp_path):
+    from export_core import SheetContent
+
+    def content(n):
+        return SheetContent("unit", [["No.", "Jenis Materil"]], [("row", [i, f"Materiil {i}"]) for i in range(n)], [("A", 6), ("B", 14)])
+
+    budget = MemoryBudget(2000)
+    wb = XlsxWorkbook(budget)
+    ws = wb.active
+    ws.content = content(200)
+    assert ws.spilled and budget.used == 0
+    old_spill = ws._spill
+
+    ws.content = content(200)
+    assert old_spill.closed and ws.spilled and ws._spill is not old_spill
+
+    ws.content = content(2)
+    assert ws._spill is None and budget.used == budget.estimate(ws.content)
+    ws.content = None
+    assert budget.used == 0
+
+    ws.content = content(200)
+    wb.save(str(tmp_path / "spill.xlsx"))
+    rows = list(load_workbook(str(tmp_path / "spill.xlsx")).active.iter_rows(values_only=True))
+    assert len(rows) == 201 and list(rows[-1]) == [199, "Materiil 199"]
+
+def satker_workbooks(data, tmp_path, tag):
+    """Alur index-sheet-mabes: workbook 'sheets' per satker dengan satu SatkerSheetCache"""
+    df_all_satkers = data.satker_tree()
+    satkers = [satker for _, satker in df_all_satkers.iterrows()]
+    rollup = data.satker_rollup(df_all_satkers)
+    cache = SatkerSheetCache(data, satkers, rollup)
+    peak = 0
+    values = {}
+    for satker in satkers:
+        wb = build_satker_workbook(data, satker, df_all_satkers, "sheets", rollup=rollup, sheet_cache=cache)
+        if data.memory_budget is not None:
+            peak = max(peak, data.memory_budget.used)
+        path = tmp_path / f"{tag}_{satker['id']}.xlsx"
+        wb.save(str(path))
+        loaded = load_workbook(str(path))
+        values[int(satker["id"])] = {ws.title: [list(r) for r in ws.iter_rows(values_only=True)] for ws in loaded.worksheets}
+    return cache, peak, values
+
+def test_satker_cache_respects_budget(engine, tmp_path):
+    _, _, expected = satker_workbooks(ExportData(engine), tmp_path, "plain")
+
+    budget = MemoryBudget(200 * 1024, spill_dir=str(tmp_path))
+    cache, peak, values = satker_workbooks(ExportData(engine, memory_budget=budget), tmp_path, "budget")
+    assert values == expected
+    assert peak <= budget.max_bytes
+    assert budget.spilled_sheets > 0
+    # Setiap entri dilepas setelah workbook terakhir yang memakainya
+    assert not cache._content
@@ -0,0 +1,31 @@
+import os
+import stat
+
+from checkpoint import CheckpointJournal
+from output_manager import OutputManager, atomic_write
+
+def mode(path):
+    return stat.S_IMODE(os.stat(path).st_mode)
+
+def test_atomic_write_uses_regular_file_mode(tmp_path):
+    # Mode sama dengan file yang dibuat open() biasa (0666 & ~umask), bukan 0600 dari mkstemp
+    plain = tmp_path / "plain.txt"
+    plain.write_text("x")
+
+    target = tmp_path / "atomic.txt"
+    atomic_write(str(target), lambda tmp: open(tmp, "w").write("x"))
+    assert mode(target) == mode(plain)
+
+def test_workbook_and_journal_mode(tmp_path):
+    from xlsx_writer import XlsxWorkbook
+
+    plain = tmp_path / "plain.txt"
+    plain.write_text("x")
+    output = OutputManager(str(tmp_path), fsync=False)
+    journal = CheckpointJournal(str(tmp_path), {"test": True}, resume=False, output=output)
+    wb = XlsxWorkbook()
+    filename = str(tmp_path / "sub" / "book.xlsx")
+    journal.save(wb, "unit:1", filename)
+    assert mode(filename) == mode(plain)
+    assert mode(journal.path) == mode(plain)
+    assert not [name for name in os.listdir(tmp_path / "sub") if name.startswith(".tmp_")]
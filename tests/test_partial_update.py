@@ -0,0 +1,57 @@
+import shutil
+import sqlite3
+
+import pytest
+from openpyxl import load_workbook
+from sqlalchemy import create_engine
+
+from dataset import OWNER_TYPES
+from export_core import ExportData, build_polda_workbook
+from selection import ExportSelection, open_workbook_for_update
+
+POLDA_ID = 1
+
+@pytest.fixture
+def db_path(dataset_path, tmp_path):
+    # Test mengubah inventaris: salinan dataset sendiri
+    path = str(tmp_path / "inventaris.sqlite")
+    shutil.copy(dataset_path, path)
+    return path
+
+def build(data, path, wb=None, polres_list=None):
+    wb = build_polda_workbook(data, POLDA_ID, f"Polda {POLDA_ID}", polres_layout="unit", polres_list=polres_list, rollup=data.polda_rollup(POLDA_ID), wb=wb)
+    wb.save(path)
+
+def sheet_values(path):
+    wb = load_workbook(path)
+    return {ws.title: [list(row) for row in ws.iter_rows(values_only=True)] for ws in wb.worksheets}
+
+def test_missing_file_is_full_build(tmp_path):
+    assert open_workbook_for_update(str(tmp_path / "belum_ada.xlsx"), True) is None
+    assert open_workbook_for_update(str(tmp_path / "belum_ada.xlsx"), False) is None
+
+def test_partial_update_matches_full_rebuild(db_path, tmp_path):
+    engine = create_engine(f"sqlite:///{db_path}")
+    partial_path = str(tmp_path / "partial.xlsx")
+    build(ExportData(engine), partial_path)
+
+    conn = sqlite3.connect(db_path)
+    polres_id = conn.execute("SELECT MIN(id) + 1 FROM polres WHERE polda_id = ?", (POLDA_ID,)).fetchone()[0]
+    conn.execute("UPDATE equipment_inventories SET baik = baik + 100 WHERE owner_type = ? AND owner_id = ?", (OWNER_TYPES["polres"], polres_id))
+    conn.commit()
+    conn.close()
+
+    selection = ExportSelection(polres_ids=[polres_id])
+    data = ExportData(engine, selection)
+    wb = open_workbook_for_update(partial_path, selection.partial_polda)
+    assert wb is not None
+    build(data, partial_path, wb=wb, polres_list=data.polres_list(POLDA_ID))
+
+    full_path = str(tmp_path / "full.xlsx")
+    build(ExportData(engine), full_path)
+    partial, full = sheet_values(partial_path), sheet_values(full_path)
+    assert list(partial) == list(full)
+    # Sheet POLDA (Total Jajaran) dan sheet POLRES terpilih mengikuti data baru
+    for title in full:
+        assert partial[title] == full[title], title
+    assert load_workbook(partial_path).active.title == list(full)[0]
@@ -0,0 +1,286 @@
+import sqlite3
+import statistics
+import time
+import tracemalloc
+
+import pytest
+from openpyxl import load_workbook
+from sqlalchemy import event
+
+from dataset import OWNER_TYPES
+from export_core import (
+    INDEX_SHEET_TITLE, ExportData, add_polres_sheet, build_polda_workbook, build_polsek_workbook, build_satker_workbook,
+    get_all_children_recursive,
+)
+
+# =========================================================
+# 🧪 Regresi performa per layout export (dataset sintetis scale 1)
+# =========================================================
+# Setiap layout dibangun dengan builder export_core lalu diperiksa: jumlah query (tidak boleh tumbuh
+# per unit/sel), puncak memori (tracemalloc), median waktu, dan isi sel dibaca ulang dari .xlsx
+# dibandingkan jumlah yang dihitung langsung dari tabel inventaris. Batas waktu & memori absolut
+# (waktu ±5×, memori ±2× hasil ukur saat batas ditetapkan) agar CI yang lebih lambat tidak gagal karena noise.
+MAX_QUERIES = {
+    "polda_subsatker": 12,
+    "polres_polsek": 12,
+    # build_polsek_workbook: satu query inventaris per Polsek (8 Polsek per POLRES)
+    "polsek_workbook": 14,
+    "satker_columns": 8,
+    "satker_sheets": 8,
+}
+# (median detik, puncak byte tracemalloc) per writer; memori deterministik, batas waktu lebih longgar
+MIB = 1 << 20
+MAX_COST = {
+    "xml": {
+        "polda_subsatker": (0.25, 4 * MIB),
+        "polres_polsek": (0.35, 3.5 * MIB),
+        "polsek_workbook": (0.3, 1.5 * MIB),
+        "satker_columns": (0.3, 2.5 * MIB),
+        "satker_sheets": (0.5, 2.5 * MIB),
+    },
+    "openpyxl": {
+        "polda_subsatker": (0.45, 3.5 * MIB),
+        "polres_polsek": (0.65, 5 * MIB),
+        "polsek_workbook": (0.9, 5 * MIB),
+        "satker_columns": (1.7, 9 * MIB),
+        "satker_sheets": (2.5, 13 * MIB),
+    },
+}
+REPEAT = 3
+WRITERS = list(MAX_COST)
+
+# =========================================================
+# 1️⃣ Nilai yang diharapkan (langsung dari tabel, tanpa export_core)
+# =========================================================
+class Expected:
+    """Inventaris per owner + hierarki dari SQLite, dan id sampel untuk setiap layout"""
+
+    def __init__(self, path):
+        levels = {owner_type: level for level, owner_type in OWNER_TYPES.items()}
+        conn = sqlite3.connect(path)
+        catalog = conn.execute("""
+            SELECT e.id, et.name, e.name FROM equipments e
+            JOIN equipment_types et ON et.id = e.id_equipment_type
+            WHERE e.deleted_at IS NULL
+        """).fetchall()
+        rows_by_key = {equipment_id: (penggolongan, jenis) for equipment_id, penggolongan, jenis in catalog}
+        self.catalog_rows = set(rows_by_key.values())
+        self.totals = {}
+        for equipment_id, owner_type, owner_id, baik, rr, rb in conn.execute(
+            "SELECT equipment_id, owner_type, owner_id, baik, rusak_ringan, rusak_berat FROM equipment_inventories"
+        ):
+            if equipment_id not in rows_by_key:
+                continue
+            cell = self.totals.setdefault((levels[owner_type], owner_id), {}).setdefault(rows_by_key[equipment_id], [0, 0, 0])
+            cell[0] += baik
+            cell[1] += rr
+            cell[2] += rb
+        self.hierarchy = {
+            "polres": conn.execute("SELECT id, polda_id FROM polres").fetchall(),
+            "polsek": conn.execute("SELECT id, polres_id FROM polsek").fetchall(),
+            "subsatker": conn.execute("SELECT id, polda_id FROM subsatker_poldas").fetchall(),
+        }
+        self.polda_id = 1
+        self.polres_id = conn.execute("SELECT MIN(id) FROM polres WHERE polda_id = ?", (self.polda_id,)).fetchone()[0]
+        self.satker_id = conn.execute("SELECT MIN(id) FROM satker_mabes WHERE parent_id IS NULL").fetchone()[0]
+        conn.close()
+
+    def polda_jajaran(self, polda_id):
+        polres_ids = [i for i, parent in self.hierarchy["polres"] if parent == polda_id]
+        return ([("subsatker", i) for i, parent in self.hierarchy["subsatker"] if parent == polda_id]
+                + [("polres", i) for i in polres_ids]
+                + [("polsek", i) for i, parent in self.hierarchy["polsek"] if parent in polres_ids])
+
+    def polres_jajaran(self, polres_id):
+        return [("polres", polres_id)] + [("polsek", i) for i, parent in self.hierarchy["polsek"] if parent == polres_id]
+
+    def cells(self, owners):
+        """(penggolongan, jenis) → [baik, rr, rb, jumlah] dijumlah atas beberapa owner"""
+        cells = {}
+        for row in self.catalog_rows:
+            counts = [0, 0, 0]
+            for owner in owners:
+                for i, value in enumerate(self.totals.get(owner, {}).get(row, (0, 0, 0))):
+                    counts[i] += value
+            cells[row] = counts + [sum(counts)]
+        return cells
+
+@pytest.fixture(scope="module")
+def expected(dataset_path):
+    return Expected(dataset_path)
+
+# =========================================================
+# 2️⃣ Baca ulang isi sel dari file .xlsx
+# =========================================================
+def read_back(path):
+    """{judul sheet: (jumlah baris header, {(penggolongan, jenis): [nilai kolom 3..]})}"""
+    wb = load_workbook(path, read_only=True)
+    sheets = {}
+    for ws in wb.worksheets:
+        if ws.title == INDEX_SHEET_TITLE:
+            continue
+        header_rows = 0
+        penggolongan = None
+        rows = {}
+        for row in ws.iter_rows(values_only=True):
+            if row[0] == "No.":
+                header_rows = 1
+                continue
+            if header_rows == 1 and row[0] in (None, "") and row[2:6] == ("Baik", "Rusak Ringan", "Rusak Berat", "Jumlah"):
+                header_rows = 2
+                continue
+            if row[0] in (None, ""):
+                penggolongan = row[1]
+                continue
+            rows[(penggolongan, row[1])] = [0 if value in (None, "") else int(value) for value in row[2:]]
+        sheets[ws.title] = (header_rows, rows)
+    wb.close()
+    return sheets
+
+def check_sheet(expected, title, sheet, header_rows, column_groups):
+    """Setiap grup 4 kolom (Baik/RR/RB/Jumlah) = jumlah inventaris owner grup itu; kosong di sheet berarti 0"""
+    errors = []
+    actual_header_rows, rows = sheet
+    if actual_header_rows != header_rows:
+        errors.append(f"{title}: {actual_header_rows} baris header, seharusnya {header_rows}")
+    if set(rows) != expected.catalog_rows:
+        errors.append(f"{title}: {len(rows)} baris jenis materiil, seharusnya {len(expected.catalog_rows)}")
+        return errors
+    for g, owners in enumerate(column_groups):
+        cells = expected.cells(owners)
+        for row, values in rows.items():
+            actual = values[4 * g:4 * g + 4]
+            actual += [0] * (4 - len(actual))
+            if actual != cells[row]:
+                errors.append(f"{title} kolom grup {g + 1} {row[1]}: {actual} ≠ {cells[row]}")
+                break
+    return errors
+
+# =========================================================
+# 3️⃣ Layout yang diuji: (workbook, {judul sheet: (baris header, grup owner per kolom)})
+# =========================================================
+def layout_polda_subsatker(data, expected):
+    names = data.name_table()
+    polda_id = expected.polda_id
+    wb = build_polda_workbook(data, polda_id, f"Polda {polda_id}", rollup=data.polda_rollup(polda_id), names=names)
+    subsatkers = data.subsatkers(polda_id)["id"].tolist()
+    groups = [[("subsatker", int(i))] for i in subsatkers] + [expected.polda_jajaran(polda_id)]
+    return wb, {wb.active.title: (2, groups)}
+
+def layout_polres_polsek(data, expected):
+    names = data.name_table()
+    polres_id = expected.polres_id
+    rollup = data.polda_rollup(expected.polda_id)
+    wb = data.new_workbook()
+    wb.remove(wb.active)
+    ws = add_polres_sheet(wb, data, polres_id, names.full_names["polres"][polres_id], "polsek", rollup=rollup, names=names)
+    polsek_ids = data.polsek_list(polres_id)["id"].tolist()
+    groups = [[("polres", polres_id)]] + [[("polsek", int(i))] for i in polsek_ids] + [expected.polres_jajaran(polres_id)]
+    return wb, {ws.title: (2, groups)}
+
+def layout_polsek_workbook(data, expected):
+    names = data.name_table()
+    df_polsek_list = data.polsek_list(expected.polres_id)
+    wb = build_polsek_workbook(data, df_polsek_list, names=names)
+    sheets = {
+        names.sheet("polsek", i): (1, [[("polsek", int(i))]])
+        for i in df_polsek_list["id"] if ("polsek", int(i)) in expected.totals
+    }
+    return wb, sheets
+
+def satker_subtree(df_all_satkers, satker_id):
+    return [("satker", satker_id)] + [("satker", int(s["id"])) for s in get_all_children_recursive(satker_id, df_all_satkers)]
+
+def _satker(data, expected):
+    df_all_satkers = data.satker_tree()
+    satker = df_all_satkers[df_all_satkers["id"] == expected.satker_id].iloc[0]
+    related = [expected.satker_id] + [int(s["id"]) for s in get_all_children_recursive(expected.satker_id, df_all_satkers)]
+    return df_all_satkers, satker, related
+
+def layout_satker_columns(data, expected):
+    names = data.name_table()
+    df_all_satkers, satker, related = _satker(data, expected)
+    rollup = data.satker_rollup(df_all_satkers)
+    wb = build_satker_workbook(data, satker, df_all_satkers, "columns", rollup=rollup, names=names)
+    groups = [[("satker", i)] for i in related] + [satker_subtree(df_all_satkers, expected.satker_id)]
+    return wb, {wb.active.title: (2, groups)}
+
+def layout_satker_sheets(data, expected):
+    names = data.name_table()
+    df_all_satkers, satker, related = _satker(data, expected)
+    rollup = data.satker_rollup(df_all_satkers)
+    wb = build_satker_workbook(data, satker, df_all_satkers, "sheets", rollup=rollup, names=names)
+    sheets = {}
+    for i in related:
+        groups = [[("satker", i)]]
+        if rollup.has_children(i):
+            groups.append(satker_subtree(df_all_satkers, i))
+        sheets[names.sheet("satker", i)] = (1, groups)
+    return wb, sheets
+
+LAYOUTS = {
+    "polda_subsatker": layout_polda_subsatker,
+    "polres_polsek": layout_polres_polsek,
+    "polsek_workbook": layout_polsek_workbook,
+    "satker_columns": layout_satker_columns,
+    "satker_sheets": layout_satker_sheets,
+}
+
+# =========================================================
+# 4️⃣ Pengukuran
+# =========================================================
+class QueryCounter:
+    """Hitung statement SQL yang dikirim ke engine (PRAGMA dari pandas/SQLite tidak dihitung)"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+
+    def _count(self, conn, cursor, statement, parameters, context, executemany):
+        if not statement.lstrip().upper().startswith("PRAGMA"):
+            self.count += 1
+
+    def __enter__(self):
+        event.listen(self.engine, "before_cursor_execute", self._count)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, "before_cursor_execute", self._count)
+
+def run_layout(engine, writer, name, expected, path):
+    """Satu export dari nol (ExportData baru, katalog & nama dimuat ulang) sampai file tersimpan"""
+    data = ExportData(engine, writer=writer)
+    wb, sheets = LAYOUTS[name](data, expected)
+    wb.save(path)
+    return sheets
+
+@pytest.mark.parametrize("writer", WRITERS)
+@pytest.mark.parametrize("name", list(LAYOUTS))
+def test_layout(engine, expected, tmp_path, name, writer):
+    path = str(tmp_path / f"{name}.xlsx")
+    with QueryCounter(engine) as counter:
+        tracemalloc.start()
+        try:
+            sheets = run_layout(engine, writer, name, expected, path)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+    assert counter.count <= MAX_QUERIES[name], f"{counter.count} query > batas {MAX_QUERIES[name]}"
+
+    timings = []
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        run_layout(engine, writer, name, expected, path)
+        timings.append(time.perf_counter() - start)
+    seconds = statistics.median(timings)
+
+    actual = read_back(path)
+    assert sorted(actual) == sorted(sheets)
+    errors = []
+    for title, (header_rows, groups) in sheets.items():
+        errors += check_sheet(expected, title, actual[title], header_rows, groups)
+    assert not errors, "\n".join(errors)
+
+    max_seconds, max_peak = MAX_COST[writer][name]
+    assert seconds <= max_seconds, f"median {seconds:.3f}s > {max_seconds:.3f}s"
+    assert peak <= max_peak, f"puncak {peak / MIB:.1f} MiB > {max_peak / MIB:.1f} MiB"
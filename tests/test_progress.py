@@ -0,0 +1,42 @@
+import io
+import json
+import sys
+
+from progress import ExportProgress
+
+def test_quiet_stdout_is_scoped(monkeypatch):
+    stdout = io.StringIO()
+    monkeypatch.setattr(sys, "stdout", stdout)
+    progress = ExportProgress("json", quiet=True)
+    assert sys.stdout is stdout
+
+    with progress.quiet_stdout():
+        devnull = sys.stdout
+        print("log per unit")
+        progress.plan(["polda:1"])
+    assert sys.stdout is stdout
+    assert devnull.closed
+
+    print("setelah blok")
+    lines = stdout.getvalue().splitlines()
+    assert json.loads(lines[0])["event"] == "plan"
+    assert lines[1:] == ["setelah blok"]
+
+def test_not_quiet_keeps_stdout(monkeypatch):
+    stdout = io.StringIO()
+    monkeypatch.setattr(sys, "stdout", stdout)
+    with ExportProgress("off").quiet_stdout():
+        print("log per unit")
+    assert stdout.getvalue() == "log per unit\n"
+
+def test_quiet_fatal_error_goes_to_stderr(tmp_path, run_script):
+    # --as-of tanpa riwayat snapshot: cron dengan --quiet tetap melihat alasan gagal
+    result = run_script("index.py", "--quiet", "--as-of", "2020-01-01", cwd=tmp_path, check=False)
+    assert result.returncode == 1
+    assert result.stdout == ""
+    assert "❌" in result.stderr and "snapshot" in result.stderr
+
+def test_final_message_names_output_dir(tmp_path, run_script):
+    run_script("export_diff.py", cwd=tmp_path)  # snapshot pertama masuk riwayat --as-of
+    result = run_script("index.py", "--polda-only", "--polda-id", "1", "--as-of", "2099-01-01", cwd=tmp_path)
+    assert "folder 'exports/as_of_20990101-235959'" in result.stdout
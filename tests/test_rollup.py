@@ -0,0 +1,23 @@
+from sqlalchemy import event
+
+from export_core import ExportData
+from selection import ExportSelection
+
+def test_satker_rollup_without_satkers_skips_inventory_query(engine):
+    data = ExportData(engine, ExportSelection(satker_names=["Tidak Ada*"]))
+    df_all_satkers = data.satker_tree()
+    assert df_all_satkers.empty
+    data.equipment_ids()
+
+    statements = []
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        rollup = data.satker_rollup(df_all_satkers)
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+    assert not [s for s in statements if "equipment_inventories" in s]
+    assert rollup.totals(1, data.equipment_ids()).tolist() == [0, 0, 0]
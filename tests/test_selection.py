@@ -0,0 +1,29 @@
+import pytest
+
+from export_core import ExportData
+from selection import ExportSelection, glob_to_like
+
+def test_glob_to_like_escapes_like_wildcards():
+    assert glob_to_like("Jawa*") == "jawa%"
+    assert glob_to_like("a_b?%") == "a\\_b_\\%"
+    assert glob_to_like("O'Neil") == "o'neil"
+
+@pytest.mark.parametrize("engine_fixture", ["engine", "pyformat"])
+def test_name_filters(request, engine_fixture):
+    engine = request.getfixturevalue(engine_fixture)
+    selection = ExportSelection(polda_names=["polda 2", "*3"], polres_names=["Polres ?-1"], satker_names=["Biro 1-*"])
+    data = ExportData(engine, selection)
+
+    assert data.poldas()["id"].tolist() == [2, 3]
+    assert data.polres_list(2)["polres_name"].tolist() == ["Polres 2-1"]
+    satkers = data.satker_tree()
+    selected = satkers[satkers["selected"] == 1]
+    assert sorted(selected["name"])[:2] == ["Bagian 1-0-0", "Bagian 1-0-1"]
+    assert set(satkers.loc[satkers["selected"] == 0, "name"]) == {"Satker Mabes 1"}
+
+def test_pyformat_driver_rejects_raw_percent(pyformat):
+    # Penjaga fixture: '%' literal tanpa bind parameter memang gagal seperti di psycopg2
+    import pandas as pd
+
+    with pytest.raises(Exception):
+        pd.read_sql("SELECT id FROM polda WHERE name LIKE 'Polda%'", pyformat)
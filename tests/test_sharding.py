@@ -0,0 +1,122 @@
+import json
+import multiprocessing
+
+import numpy as np
+import pytest
+
+from export_core import ExportData, build_polda_workbook
+from sharding import MANIFEST_FILENAME, TIMING_SMOOTHING, ShardWorkspace, assign_shards, estimate_units, shard_loads
+from workbooks import workbook_values
+
+N_SHARDS = 3
+
+def claim_after(barrier, root, results):
+    barrier.wait()
+    results.put(ShardWorkspace(root, fsync=False).claim(1) is not None)
+
+def test_claim_race_has_one_winner(tmp_path):
+    # Banyak proses mengklaim shard yang sama bersamaan: tepat satu yang berhasil (O_EXCL)
+    n = 6
+    barrier = multiprocessing.Barrier(n)
+    results = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=claim_after, args=(barrier, str(tmp_path), results)) for _ in range(n)]
+    for p in processes:
+        p.start()
+    for p in processes:
+        p.join(30)
+    assert sorted(results.get(timeout=5) for _ in range(n)) == [False] * (n - 1) + [True]
+
+def test_plan_work_merge_matches_polda_workbook(tmp_path, run_script, engine):
+    run_script("export_shard.py", "plan", "--shards", N_SHARDS, cwd=tmp_path)
+
+    # Satu proses per shard (pengganti node) + worker kedua berebut shard 1
+    workers = [run_script("export_shard.py", "work", "--shard", f"{k}/{N_SHARDS}", cwd=tmp_path, background=True)
+               for k in [1, 1, *range(2, N_SHARDS + 1)]]
+    results = [(p.wait(120), *p.communicate()) for p in workers]
+    for code, stdout, stderr in results:
+        # Kalah klaim → exit 2; menang klaim setelah pemenang selesai → semua unit dilewati
+        assert code in (0, 2), stdout + stderr
+        if code == 2:
+            assert "sudah diklaim" in stderr
+    assert all(code == 0 for code, _, _ in results[2:])
+
+    workspace = ShardWorkspace(str(tmp_path / "exports"), fsync=False)
+    manifest = workspace.manifest()
+    assert {u["unit"] for u in manifest["units"]} == set(workspace.completed_units(N_SHARDS))
+    assert not (tmp_path / "exports" / ".shards" / "claims" / "shard-1.lock").exists()
+
+    run_script("export_shard.py", "merge", cwd=tmp_path)
+
+    data = ExportData(engine)
+    for polda in manifest["poldas"]:
+        expected_path = str(tmp_path / f"expected_{polda['id']}.xlsx")
+        build_polda_workbook(data, polda["id"], polda["name"], polres_layout="unit", rollup=data.polda_rollup(polda["id"])).save(expected_path)
+        merged_path = tmp_path / "exports" / f"POLDA {polda['name']}" / f"Inventaris_POLDA_{polda['name']}.xlsx"
+        assert workbook_values(str(merged_path)) == workbook_values(expected_path)
+
+    timings = json.loads((tmp_path / "exports" / ".shards" / "timings.json").read_text())
+    assert timings["runs"] == [manifest["created_at"]]
+
+def skewed_units():
+    # 4 POLDA dengan ukuran 1×..10×: unit besar dan banyak unit kecil
+    rng = np.random.default_rng(11)
+    units = []
+    for polda_id, size in enumerate([1, 2, 5, 10], start=1):
+        units.append({"unit": f"polda:{polda_id}", "kind": "polda", "cost": 100 * size})
+        for i in range(6 * size):
+            units.append({"unit": f"polres:{polda_id * 100 + i}", "kind": "polres", "cost": int(rng.integers(5, 40)) * size})
+    return units
+
+@pytest.mark.parametrize("n_shards", [2, 3, 4, 8])
+def test_lpt_loads_within_bound(n_shards):
+    units = estimate_units(skewed_units(), {"runs": [], "units": {}, "ratios": {}})
+    order = [u["unit"] for u in units]
+    assign_shards(units, n_shards)
+
+    assert [u["unit"] for u in units] == order
+    loads = shard_loads(units, n_shards)
+    assert sum(loads) == pytest.approx(sum(u["estimate"] for u in units))
+    # Graham: makespan LPT ≤ (4/3 − 1/3m) × optimum, optimum ≥ max(rata-rata beban, unit terbesar)
+    lower_bound = max(sum(loads) / n_shards, max(u["estimate"] for u in units))
+    assert max(loads) <= (4 / 3 - 1 / (3 * n_shards)) * lower_bound
+
+def test_measured_timings_override_cost():
+    units = [
+        {"unit": "polda:1", "kind": "polda", "cost": 1000},
+        {"unit": "polda:2", "kind": "polda", "cost": 500},
+        {"unit": "polres:7", "kind": "polres", "cost": 300},
+        {"unit": "satker:3", "kind": "satker", "cost": 100},
+    ]
+    timings = {"runs": ["x"], "units": {"polda:1": 2.5}, "ratios": {"polda": 0.01, "polres": 0.03}}
+    estimates = {u["unit"]: u["estimate"] for u in estimate_units(units, timings)}
+    assert estimates["polda:1"] == 2.5                        # durasi terukur
+    assert estimates["polda:2"] == pytest.approx(5.0)         # biaya × detik-per-biaya jenisnya
+    assert estimates["polres:7"] == pytest.approx(9.0)
+    assert estimates["satker:3"] == pytest.approx(2.0)        # jenis tanpa rasio: rata-rata rasio
+    assert {u["unit"]: u["estimate"] for u in estimate_units(units, {})}["polda:1"] == 1000
+
+def test_record_timings_once_per_manifest(tmp_path):
+    workspace = ShardWorkspace(str(tmp_path), fsync=False)
+    units = [{"unit": "polda:1", "kind": "polda", "cost": 100, "estimate": 100, "shard": 1},
+             {"unit": "polres:2", "kind": "polres", "cost": 50, "estimate": 50, "shard": 2}]
+    manifest = workspace.write_manifest([], units, 2)
+    workspace.save_progress(1, {"done": True, "units": {"polda:1": 4.0}})
+    workspace.save_progress(2, {"done": True, "units": {"polres:2": 1.0}})
+
+    timings = workspace.record_timings()
+    assert timings["runs"] == [manifest["created_at"]]
+    assert timings["units"] == {"polda:1": 4.0, "polres:2": 1.0}
+    assert timings["ratios"] == {"polda": pytest.approx(0.04), "polres": pytest.approx(0.02)}
+    # Merge/plan berikutnya untuk manifest yang sama tidak menghitung ulang
+    assert workspace.record_timings() == timings
+
+    # Manifest baru: durasi baru digabung dengan rata-rata eksponensial
+    workspace.reset()
+    manifest = workspace.write_manifest([], units, 2)
+    manifest["created_at"] = "2030-01-01 00:00:00"
+    workspace._write_json(workspace._path(MANIFEST_FILENAME), manifest)
+    workspace.save_progress(1, {"done": True, "units": {"polda:1": 2.0}})
+    timings = workspace.record_timings()
+    assert timings["runs"][-1] == "2030-01-01 00:00:00" and len(timings["runs"]) == 2
+    assert timings["units"]["polda:1"] == pytest.approx(TIMING_SMOOTHING * 2.0 + (1 - TIMING_SMOOTHING) * 4.0)
+    assert timings["units"]["polres:2"] == 1.0
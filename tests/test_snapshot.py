@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+
+import snapshot
+from export_core import ExportData, SnapshotExportData
+from snapshot import OWNER_LEVELS, InventorySnapshot, SnapshotStore, snapshot_keys
+
+TAKEN_AT = [f"2026-0{month}-01 08:00:00" for month in range(1, 8)]
+
+def random_snapshot(rng, taken_at, n=400):
+    levels = rng.integers(0, len(OWNER_LEVELS), n)
+    keys = np.unique(snapshot_keys(levels, rng.integers(1, 40, n), rng.integers(1, 30, n)))
+    counts = rng.integers(0, 20, (len(keys), 3))
+    # Sebagian key hilang/baru antar entri (unit dihapus, equipment ditambah)
+    keep = rng.random(len(keys)) > 0.1
+    return InventorySnapshot(keys[keep], counts[keep], taken_at)
+
+def assert_same(actual, expected):
+    assert actual.taken_at == expected.taken_at
+    assert np.array_equal(actual.keys, expected.keys)
+    assert np.array_equal(actual.counts, expected.counts)
+
+@pytest.fixture
+def history(tmp_path, monkeypatch):
+    monkeypatch.setattr(snapshot, "KEYFRAME_INTERVAL", 3)
+    rng = np.random.default_rng(7)
+    snapshots = [random_snapshot(rng, taken_at) for taken_at in TAKEN_AT]
+    store = SnapshotStore(str(tmp_path), fsync=False)
+    for s in snapshots:
+        store.append(s)
+    return store, snapshots
+
+def test_keyframes_and_deltas_reconstruct_every_entry(history):
+    store, snapshots = history
+    kinds = []
+    for _, path in store.entries():
+        with np.load(path) as f:
+            kinds.append(str(f["kind"]))
+    assert kinds == ["full", "delta", "delta", "full", "delta", "delta", "full"]
+
+    for s in snapshots:
+        assert_same(store.as_of(s.taken_at), s)
+    assert_same(store.head(), snapshots[-1])
+
+def test_as_of_between_entries_uses_previous_snapshot(history):
+    store, snapshots = history
+    assert_same(store.as_of("2026-03-15 12:00:00"), snapshots[2])
+    assert_same(store.as_of("2026-03-01 07:59:59"), snapshots[1])
+    assert_same(store.as_of("2030-01-01 00:00:00"), snapshots[-1])
+    with pytest.raises(ValueError):
+        store.as_of("2025-12-31 23:59:59")
+
+def test_rows_for_owner_ids_matches_filter():
+    rng = np.random.default_rng(3)
+    s = random_snapshot(rng, TAKEN_AT[0], n=2000)
+    for level in OWNER_LEVELS:
+        everything = s.rows(level)
+        for owner_ids in ([], [5], [1, 2, 3, 39], [7, 7, 1000], range(40)):
+            expected = everything[everything["owner_id"].isin(list(owner_ids))].reset_index(drop=True)
+            assert s.rows(level, owner_ids).equals(expected)
+
+def test_as_of_polda_rollup_matches_database(engine):
+    data = ExportData(engine)
+    snapshot_data = SnapshotExportData(engine, InventorySnapshot.from_db(engine))
+    equipment_ids = data.equipment_ids()
+    for polda_id in data.poldas()["id"]:
+        expected = data.polda_rollup(polda_id)
+        actual = snapshot_data.polda_rollup(polda_id)
+        assert actual.node_keys == expected.node_keys
+        assert np.array_equal(actual.cumulative, expected.cumulative)
+        assert actual.totals(("polda", polda_id), equipment_ids).sum() > 0
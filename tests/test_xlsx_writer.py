@@ -0,0 +1,76 @@
+import re
+import zipfile
+from xml.etree import ElementTree
+
+import pytest
+from openpyxl import load_workbook
+
+from export_core import ExportData, build_polda_workbook, build_polsek_workbook, build_satker_workbook
+
+MAIN_NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+
+def build_polda(data):
+    return build_polda_workbook(data, 1, "Polda 1", polres_layout="polsek", rollup=data.polda_rollup(1))
+
+def build_polsek(data):
+    polres_id = int(data.polres_list(1)["polres_id"].iloc[0])
+    return build_polsek_workbook(data, data.polsek_list(polres_id))
+
+def build_satker_sheets(data):
+    df_all_satkers = data.satker_tree()
+    satker = df_all_satkers[df_all_satkers["parent_id"].isna()].iloc[0]
+    return build_satker_workbook(data, satker, df_all_satkers, "sheets", rollup=data.satker_rollup(df_all_satkers))
+
+BUILDERS = {"polda": build_polda, "polsek": build_polsek, "satker_sheets": build_satker_sheets}
+
+def save(engine, writer, build, path):
+    build(ExportData(engine, writer=writer)).save(str(path))
+    return load_workbook(str(path))
+
+def sheet_summary(ws):
+    values = [["" if value is None else value for value in row] for row in ws.iter_rows(values_only=True)]
+    # Baris kosong di ujung kanan tidak berarti (openpyxl menulis "" sebagai sel)
+    values = [row[:max((i + 1 for i, value in enumerate(row) if value != ""), default=0)] for row in values]
+    widths = {letter: dim.width for letter, dim in ws.column_dimensions.items() if dim.customWidth}
+    return {
+        "values": values,
+        "merged": sorted(str(r) for r in ws.merged_cells.ranges),
+        "freeze_panes": ws.freeze_panes,
+        "widths": widths,
+    }
+
+def shared_strings(path):
+    with zipfile.ZipFile(path) as zf:
+        root = ElementTree.fromstring(zf.read("xl/sharedStrings.xml"))
+    strings = ["".join(t.text or "" for t in si.iter(f"{MAIN_NS}t")) for si in root.iter(f"{MAIN_NS}si")]
+    return strings, int(root.get("uniqueCount", len(strings)))
+
+@pytest.mark.parametrize("layout", list(BUILDERS))
+def test_xml_writer_matches_openpyxl(engine, tmp_path, layout):
+    xml_path, openpyxl_path = tmp_path / "xml.xlsx", tmp_path / "openpyxl.xlsx"
+    wb_xml = save(engine, "xml", BUILDERS[layout], xml_path)
+    wb_openpyxl = save(engine, "openpyxl", BUILDERS[layout], openpyxl_path)
+
+    assert wb_xml.sheetnames == wb_openpyxl.sheetnames
+    assert len(wb_xml.sheetnames) > 1
+    for title in wb_openpyxl.sheetnames:
+        xml_sheet, openpyxl_sheet = sheet_summary(wb_xml[title]), sheet_summary(wb_openpyxl[title])
+        for key in ("values", "merged", "freeze_panes", "widths"):
+            assert xml_sheet[key] == openpyxl_sheet[key], f"{title}: {key}"
+
+    # Shared string: setiap teks sekali (dedup) dan tepat teks yang ada di sel
+    strings, unique_count = shared_strings(xml_path)
+    assert len(strings) == len(set(strings)) == unique_count
+    texts = {value for ws in wb_openpyxl.worksheets for row in ws.iter_rows(values_only=True) for value in row if isinstance(value, str)}
+    assert set(strings) - {""} == texts - {""}
+
+def test_shared_strings_dedup_across_sheets(engine, tmp_path):
+    path = tmp_path / "polsek.xlsx"
+    save(engine, "xml", build_polsek, path)
+    strings, _ = shared_strings(path)
+    with zipfile.ZipFile(path) as zf:
+        sheets = [zf.read(name).decode("utf-8") for name in zf.namelist() if re.match(r"xl/worksheets/sheet\d+\.xml", name)]
+    # Nama jenis materiil dipakai di setiap sheet Polsek tapi disimpan sekali
+    string_cells = sum(sheet.count('t="s"') for sheet in sheets)
+    assert len(sheets) > 2
+    assert string_cells > len(strings)
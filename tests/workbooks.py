@@ -0,0 +1,18 @@
+import os
+
+from openpyxl import load_workbook
+
+def workbook_values(path):
+    """{judul sheet: baris nilai} satu workbook"""
+    wb = load_workbook(path)
+    return {ws.title: [list(row) for row in ws.iter_rows(values_only=True)] for ws in wb.worksheets}
+
+def folder_values(root):
+    """{path relatif: workbook_values} semua .xlsx di bawah root"""
+    values = {}
+    for folder, dirs, filenames in os.walk(root):
+        for name in filenames:
+            if name.endswith(".xlsx"):
+                path = os.path.join(folder, name)
+                values[os.path.relpath(path, root)] = workbook_values(path)
+    return values
@@ -0,0 +1,21 @@
+import time
+
+# =========================================================
+# ⏱️ Format waktu snapshot & --as-of
+# =========================================================
+# Tanpa numpy/pandas: dipakai argparse sebelum modul berat dimuat
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+FILE_STAMP_FORMAT = "%Y%m%d-%H%M%S"
+
+def file_stamp(timestamp):
+    return time.strftime(FILE_STAMP_FORMAT, time.strptime(timestamp, TIMESTAMP_FORMAT))
+
+def parse_as_of(value):
+    """'YYYY-MM-DD' (akhir hari) atau 'YYYY-MM-DD HH:MM:SS' → timestamp snapshot"""
+    for fmt, suffix in [(TIMESTAMP_FORMAT, ""), ("%Y-%m-%d", " 23:59:59")]:
+        try:
+            time.strptime(value, fmt)
+            return value + suffix
+        except ValueError:
+            continue
+    raise ValueError(f"Format --as-of tidak dikenal: {value!r} (gunakan YYYY-MM-DD atau 'YYYY-MM-DD HH:MM:SS')")
@@ -0,0 +1,487 @@
+import re
+import shutil
+import weakref
+import zipfile
+import tempfile
+import threading
+from functools import lru_cache
+
+# =========================================================
+# 📝 Penulis XLSX langsung (SpreadsheetML) untuk layout inventaris
+# =========================================================
+# Semua sheet export punya struktur tetap (header 1/2 baris, merge grup, baris penggolongan
+# tebal, angka dengan sel kosong untuk nol) sehingga XML bisa ditulis langsung tanpa objek
+# sel openpyxl. Tampilan sama dengan style_header / style_header_simple / auto_resize_columns.
+
+# Index cellXfs di STYLES_XML
+STYLE_DEFAULT = 0
+STYLE_HEADER_SIMPLE = 1   # bold + center (style_header_simple)
+STYLE_HEADER = 2          # bold + center + wrap (style_header)
+STYLE_BOLD = 3            # baris penggolongan
+STYLE_CENTER = 4          # kolom No.
+
+XML_HEADER = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+MAIN_NS = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+REL_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+PKG_REL_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+
+STYLES_XML = XML_HEADER + f"""<styleSheet xmlns="{MAIN_NS}">
+<fonts count="2"><font><sz val="11"/><name val="Calibri"/><family val="2"/><scheme val="minor"/></font><font><b val="1"/></font></fonts>
+<fills count="2"><fill><patternFill/></fill><fill><patternFill patternType="gray125"/></fill></fills>
+<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>
+<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>
+<cellXfs count="5">
+<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>
+<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1" applyAlignment="1"><alignment horizontal="center" vertical="center"/></xf>
+<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1" applyAlignment="1"><alignment horizontal="center" vertical="center" wrapText="1"/></xf>
+<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/>
+<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0" applyAlignment="1"><alignment horizontal="center" vertical="center"/></xf>
+</cellXfs>
+<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>
+</styleSheet>"""
+
+# Pane beku per layout: (pane, selection) sama seperti freeze_panes openpyxl
+FREEZE_XML = {
+    "group": '<pane xSplit="2" ySplit="2" topLeftCell="C3" activePane="bottomRight" state="frozen"/>'
+             '<selection pane="topRight"/><selection pane="bottomLeft"/>'
+             '<selection pane="bottomRight" activeCell="C3" sqref="C3"/>',
+    "unit": '<pane ySplit="1" topLeftCell="A2" activePane="bottomLeft" state="frozen"/>'
+            '<selection pane="bottomLeft" activeCell="A2" sqref="A2"/>',
+}
+
+WRITERS = ("xml", "openpyxl")
+
+def column_letter(index):
+    """1 → 'A', 27 → 'AA' (sama seperti openpyxl get_column_letter, tanpa memuat openpyxl)"""
+    letters = ""
+    while index > 0:
+        index, rest = divmod(index - 1, 26)
+        letters = chr(ord("A") + rest) + letters
+    return letters
+
+# Template per jumlah kolom: huruf kolom & merge header unit (baris 1, 4 kolom per grup mulai kolom C)
+@lru_cache(maxsize=None)
+def column_letters(width):
+    return tuple(column_letter(i) for i in range(1, width + 1))
+
+@lru_cache(maxsize=None)
+def group_header_merges(width):
+    return tuple((c, c + 3) for c in range(3, width + 1, 4))
+
+@lru_cache(maxsize=None)
+def _group_header_merge_refs(width):
+    letters = column_letters(width)
+    return tuple(f"{letters[start - 1]}1:{letters[end - 1]}1" for start, end in group_header_merges(width))
+
+ILLEGAL_CHARACTERS_RE = re.compile(r"[\000-\010]|[\013-\014]|[\016-\037]")
+
+# Escape XML seperti xml.sax.saxutils.escape (modul itu ikut memuat urllib/http.client saat start)
+TEXT_ESCAPES = str.maketrans({"&": "&amp;", "<": "&lt;", ">": "&gt;"})
+ATTR_ESCAPES = str.maketrans({"&": "&amp;", "<": "&lt;", ">": "&gt;", '"': "&quot;"})
+
+def _text(value):
+    return ILLEGAL_CHARACTERS_RE.sub("", str(value)).translate(TEXT_ESCAPES)
+
+def _attr(value):
+    return ILLEGAL_CHARACTERS_RE.sub("", str(value)).translate(ATTR_ESCAPES)
+
+class SharedString(str):
+    """Nama yang sudah di-intern: tetap str (untuk openpyxl/pandas) plus id integer global (sid)"""
+
+class StringTable:
+    """Intern nama (equipment, penggolongan, unit) ke id integer; satu objek per nama unik di seluruh proses"""
+
+    def __init__(self):
+        self._index = {}
+        self.strings = []
+        self._lock = threading.Lock()
+
+    def intern(self, value):
+        if not isinstance(value, str) or isinstance(value, SharedString):
+            return value
+        interned = self._index.get(value)
+        if interned is None:
+            with self._lock:
+                interned = self._index.get(value)
+                if interned is None:
+                    interned = SharedString(value)
+                    interned.sid = len(self.strings)
+                    self.strings.append(interned)
+                    self._index[value] = interned
+        return interned
+
+    def intern_column(self, df, column):
+        """Ganti kolom nama di DataFrame dengan objek yang di-intern (in place)"""
+        df[column] = [self.intern(value) for value in df[column]]
+        return df
+
+NAMES = StringTable()
+
+class SharedStrings:
+    """Tabel shared string per file: nama yang di-intern dipetakan lewat sid tanpa hashing teks"""
+
+    def __init__(self):
+        self.index = {}
+        self.sid_index = {}
+        self.strings = []
+
+    def add(self, value):
+        sid = getattr(value, "sid", None)
+        if sid is not None:
+            i = self.sid_index.get(sid)
+            if i is not None:
+                return i
+        # Teks di-hash hanya untuk string biasa / sid pertama kali: teks yang sama (di-intern atau tidak) satu entri
+        i = self.index.get(value)
+        if i is None:
+            i = self.index[value] = len(self.strings)
+            self.strings.append(value)
+        if sid is not None:
+            self.sid_index[sid] = i
+        return i
+
+    def to_xml(self, count):
+        parts = [XML_HEADER, f'<sst xmlns="{MAIN_NS}" count="{count}" uniqueCount="{len(self.strings)}">']
+        for value in self.strings:
+            text = _text(value)
+            space = ' xml:space="preserve"' if text != text.strip() else ""
+            parts.append(f"<si><t{space}>{text}</t></si>")
+        parts.append("</sst>")
+        return "".join(parts)
+
+# =========================================================
+# 🧮 Batas memori (--max-memory): spill isi sheet ke file sementara
+# =========================================================
+MEMORY_UNITS = {"K": 1 << 10, "M": 1 << 20, "G": 1 << 30}
+
+def parse_memory_size(value):
+    """'512M' / '3G' / '800000K' → byte; angka tanpa satuan dianggap MB (untuk argparse type=)"""
+    text = str(value).strip().upper().removesuffix("B")
+    unit = MEMORY_UNITS.get(text[-1:]) if text else None
+    number = text[:-1] if unit else text
+    try:
+        size = int(float(number) * (unit or MEMORY_UNITS["M"]))
+    except ValueError:
+        raise ValueError(f"Ukuran memori tidak valid: {value!r} (contoh: 512M, 3G)") from None
+    if size <= 0:
+        raise ValueError(f"Ukuran memori harus > 0: {value!r}")
+    return size
+
+class MemoryBudget:
+    """Perkiraan memori isi sheet yang belum disimpan (semua workbook yang masih hidup dalam proses)
+
+    Isi sheet dihitung per sel/baris; sheet yang membuat total melewati batas langsung dirender
+    ke file sementara (spill) dan hanya disalin ke zip saat workbook disimpan. Pemilik lain (mis.
+    SatkerSheetCache) bisa ikut mencatat isi yang disimpannya; sheet yang memakai isi itu tidak
+    dihitung dua kali. Pemilik yang sudah tidak dipakai (workbook dibuang / sheet dihapus) otomatis
+    keluar dari hitungan. Total disimpan berjalan, bukan dijumlah ulang setiap hold.
+    """
+
+    CELL_BYTES = 40    # int/None + slot list per sel
+    ROW_BYTES = 120    # list + tuple ('row', nilai) per baris
+
+    def __init__(self, max_bytes, spill_dir=None):
+        self.max_bytes = max_bytes
+        self.spill_dir = spill_dir
+        self.spilled_sheets = 0
+        self.spilled_bytes = 0
+        self._held = {}        # id(pemilik) → (weakref pemilik, ukuran, id isi bersama atau None)
+        self._contents = {}    # id(SheetContent) → id(pemilik) untuk isi yang dipakai bersama
+        self._used = 0
+        # RLock: callback weakref bisa terpanggil (GC) saat lock sedang dipegang thread yang sama
+        self._lock = threading.RLock()
+
+    @classmethod
+    def estimate(cls, content):
+        rows = len(content.headers) + len(content.items)
+        return rows * (cls.ROW_BYTES + content.width * cls.CELL_BYTES)
+
+    @property
+    def used(self):
+        return self._used
+
+    def hold(self, owner, size, content=None):
+        """Catat isi milik owner; False jika melewati batas (isi sheet harus di-spill)
+
+        content: isi yang dipakai bersama (mis. entri cache) → sheet dengan isi ini tidak dihitung lagi
+        """
+        key = id(owner)
+        with self._lock:
+            self._forget(key)
+            if self._used + size > self.max_bytes:
+                return False
+            ref = weakref.ref(owner, lambda ref, key=key: self._collected(key, ref))
+            self._held[key] = (ref, size, None if content is None else id(content))
+            if content is not None:
+                self._contents[id(content)] = key
+            self._used += size
+            return True
+
+    def counted(self, content):
+        """Isi ini sudah dicatat pemilik lain (dipakai bersama)"""
+        return id(content) in self._contents
+
+    def drop(self, owner):
+        with self._lock:
+            self._forget(id(owner))
+
+    def _forget(self, key):
+        entry = self._held.pop(key, None)
+        if entry is not None:
+            self._used -= entry[1]
+            if entry[2] is not None:
+                self._contents.pop(entry[2], None)
+
+    def _collected(self, key, ref):
+        with self._lock:
+            entry = self._held.get(key)
+            if entry is not None and entry[0] is ref:
+                self._forget(key)
+
+    def record_spill(self, size):
+        with self._lock:
+            self.spilled_sheets += 1
+            self.spilled_bytes += size
+
+    def summary(self):
+        return (f"{self.spilled_sheets} sheet di-spill ke disk ({self.spilled_bytes / MEMORY_UNITS['M']:.1f} MB XML), "
+                f"batas {self.max_bytes / MEMORY_UNITS['M']:.1f} MB")
+
+class XlsxSheet:
+    """Worksheet ringan: hanya judul + SheetContent, ditulis sebagai XML saat workbook disimpan
+
+    Dengan MemoryBudget, isi sheet yang melewati batas langsung ditulis ke file sementara;
+    yang tersisa di memori hanya layout/header/lebar kolom untuk bagian awal XML sheet.
+    """
+
+    def __init__(self, title, workbook=None):
+        self.title = title
+        self.workbook = workbook
+        self._content = None
+        self.rows = 0
+        self._spill = None
+        self._spill_strings = 0
+
+    @property
+    def content(self):
+        return self._content
+
+    @content.setter
+    def content(self, content):
+        budget = self.workbook.budget if self.workbook is not None else None
+        # Isi lama: tutup file spill-nya & keluarkan dari hitungan budget
+        self._release()
+        self._content = content
+        self.rows = 0 if content is None else len(content.headers) + len(content.items)
+        if budget is None:
+            return
+        if content is None or budget.counted(content):
+            # Isi bersama (mis. dari SatkerSheetCache) sudah dihitung pemiliknya
+            budget.drop(self)
+            return
+        size = budget.estimate(content)
+        if not budget.hold(self, size):
+            self._spill_content(budget)
+
+    @property
+    def spilled(self):
+        return self._spill is not None
+
+    def _spill_content(self, budget):
+        """Render sheetData + merge ke file sementara (shared string milik workbook), lepas item dari memori"""
+        spill = tempfile.TemporaryFile(prefix=".tmp_spill_", dir=budget.spill_dir)
+        self._spill_strings = _write_sheet_data(spill, self._content, self.workbook.shared)
+        budget.record_spill(spill.tell())
+        self._spill = spill
+        self._content = self._content._replace(items=())
+
+    def _release(self):
+        if self.workbook is not None and self.workbook.budget is not None:
+            self.workbook.budget.drop(self)
+        if self._spill is not None:
+            self._spill.close()
+            self._spill = None
+
+class XlsxWorkbook:
+    """Pengganti openpyxl Workbook untuk layout tetap (create_sheet/remove/active/save) dengan XML langsung"""
+
+    def __init__(self, budget=None):
+        self.budget = budget
+        self.shared = SharedStrings()
+        self._sheets = [XlsxSheet("Sheet", self)]
+        self._active = 0
+
+    @property
+    def worksheets(self):
+        return list(self._sheets)
+
+    @property
+    def sheetnames(self):
+        return [ws.title for ws in self._sheets]
+
+    @property
+    def active(self):
+        return self._sheets[self._active] if self._sheets else None
+
+    @active.setter
+    def active(self, value):
+        self._active = value if isinstance(value, int) else self._sheets.index(value)
+
+    def __getitem__(self, title):
+        for ws in self._sheets:
+            if ws.title == title:
+                return ws
+        raise KeyError(f"Worksheet {title} does not exist.")
+
+    def index(self, ws):
+        return self._sheets.index(ws)
+
+    def create_sheet(self, title=None, index=None):
+        ws = XlsxSheet(title or f"Sheet{len(self._sheets) + 1}", self)
+        if index is None:
+            self._sheets.append(ws)
+        else:
+            self._sheets.insert(index, ws)
+        return ws
+
+    def remove(self, ws):
+        i = self._sheets.index(ws)
+        self._sheets.remove(ws)
+        ws._release()
+        if self._active >= len(self._sheets) or self._active > i:
+            self._active = max(self._active - 1, 0)
+
+    def move_sheet(self, ws, offset=0):
+        i = self._sheets.index(ws)
+        self._sheets.insert(i + offset, self._sheets.pop(i))
+
+    # ----- Penulisan -----
+    def save(self, filename):
+        """Simpan ke path atau file-like (mis. BytesIO); sheet ditulis satu per satu ke zip (sheet spill disalin dari file sementara)"""
+        shared = self.shared
+        count = 0
+        with zipfile.ZipFile(filename, "w", zipfile.ZIP_DEFLATED) as zf:
+            for i, ws in enumerate(self._sheets, start=1):
+                with zf.open(f"xl/worksheets/sheet{i}.xml", "w") as f:
+                    count += _write_sheet(f, ws, shared, i - 1 == self._active)
+            zf.writestr("xl/sharedStrings.xml", shared.to_xml(count))
+            zf.writestr("xl/styles.xml", STYLES_XML)
+            zf.writestr("xl/workbook.xml", self._workbook_xml())
+            zf.writestr("xl/_rels/workbook.xml.rels", self._workbook_rels_xml())
+            zf.writestr("_rels/.rels", XML_HEADER + f'<Relationships xmlns="{PKG_REL_NS}">'
+                        f'<Relationship Id="rId1" Type="{REL_NS}/officeDocument" Target="xl/workbook.xml"/></Relationships>')
+            zf.writestr("[Content_Types].xml", self._content_types_xml())
+
+    def _workbook_xml(self):
+        sheets = "".join(
+            f'<sheet name="{_attr(ws.title)}" sheetId="{i}" r:id="rId{i}"/>' for i, ws in enumerate(self._sheets, start=1)
+        )
+        return (XML_HEADER + f'<workbook xmlns="{MAIN_NS}" xmlns:r="{REL_NS}">'
+                f'<bookViews><workbookView activeTab="{self._active}"/></bookViews>'
+                f"<sheets>{sheets}</sheets></workbook>")
+
+    def _workbook_rels_xml(self):
+        n = len(self._sheets)
+        rels = [f'<Relationship Id="rId{i}" Type="{REL_NS}/worksheet" Target="worksheets/sheet{i}.xml"/>' for i in range(1, n + 1)]
+        rels.append(f'<Relationship Id="rId{n + 1}" Type="{REL_NS}/styles" Target="styles.xml"/>')
+        rels.append(f'<Relationship Id="rId{n + 2}" Type="{REL_NS}/sharedStrings" Target="sharedStrings.xml"/>')
+        return XML_HEADER + f'<Relationships xmlns="{PKG_REL_NS}">' + "".join(rels) + "</Relationships>"
+
+    def _content_types_xml(self):
+        ct = "application/vnd.openxmlformats-officedocument.spreadsheetml"
+        sheets = "".join(
+            f'<Override PartName="/xl/worksheets/sheet{i}.xml" ContentType="{ct}.worksheet+xml"/>'
+            for i in range(1, len(self._sheets) + 1)
+        )
+        return (XML_HEADER + '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+                '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+                '<Default Extension="xml" ContentType="application/xml"/>'
+                f'<Override PartName="/xl/workbook.xml" ContentType="{ct}.sheet.main+xml"/>'
+                f'<Override PartName="/xl/styles.xml" ContentType="{ct}.styles+xml"/>'
+                f'<Override PartName="/xl/sharedStrings.xml" ContentType="{ct}.sharedStrings+xml"/>'
+                f"{sheets}</Types>")
+
+def _cell(ref, value, style, shared):
+    """XML satu sel; None/"" tanpa style tidak ditulis (sama seperti openpyxl)"""
+    s = f' s="{style}"' if style else ""
+    if value is None or value == "":
+        return f'<c r="{ref}"{s}/>' if style else "", 0
+    if isinstance(value, str):
+        return f'<c r="{ref}"{s} t="s"><v>{shared.add(value)}</v></c>', 1
+    return f'<c r="{ref}"{s}><v>{value}</v></c>', 0
+
+def _write_sheet(f, ws, shared, selected):
+    """Tulis satu worksheet XML ke stream zip; mengembalikan jumlah sel string (untuk count sst)"""
+    content = ws.content
+    tab_selected = ' tabSelected="1"' if selected else ""
+    if content is None:
+        f.write((XML_HEADER + f'<worksheet xmlns="{MAIN_NS}" xmlns:r="{REL_NS}">'
+                 f'<sheetViews><sheetView workbookViewId="0"{tab_selected}/></sheetViews>'
+                 "<sheetData/></worksheet>").encode("utf-8"))
+        return 0
+
+    width = content.width
+    letters = column_letters(width)
+    n_rows = ws.rows
+
+    f.write((XML_HEADER + f'<worksheet xmlns="{MAIN_NS}" xmlns:r="{REL_NS}">'
+             f'<dimension ref="A1:{letters[-1]}{n_rows}"/>'
+             f'<sheetViews><sheetView workbookViewId="0"{tab_selected}>'
+             f"{FREEZE_XML[content.layout]}</sheetView></sheetViews>"
+             '<sheetFormatPr baseColWidth="8" defaultRowHeight="15"/><cols>'
+             + "".join(f'<col min="{i}" max="{i}" width="{w}" customWidth="1"/>' for i, (_, w) in enumerate(content.widths, start=1))
+             + "</cols>").encode("utf-8"))
+
+    if ws.spilled:
+        ws._spill.seek(0)
+        shutil.copyfileobj(ws._spill, f)
+        return ws._spill_strings
+    return _write_sheet_data(f, content, shared)
+
+def _write_sheet_data(f, content, shared):
+    """Tulis sheetData + mergeCells + penutup worksheet; mengembalikan jumlah sel string"""
+    string_cells = 0
+    letters = column_letters(content.width)
+    header_style = STYLE_HEADER if content.layout == "group" else STYLE_HEADER_SIMPLE
+    f.write(b"<sheetData>")
+
+    merges = []
+    if content.layout == "group":
+        merges += _group_header_merge_refs(content.width)
+
+    r = 0
+    # Header: semua sel di baris header diberi style (termasuk sel merge), seperti style_header
+    for header in content.headers:
+        r += 1
+        cells = []
+        for letter, value in zip(letters, header):
+            xml, is_string = _cell(f"{letter}{r}", value, header_style, shared)
+            cells.append(xml)
+            string_cells += is_string
+        f.write(f'<row r="{r}">{"".join(cells)}</row>'.encode("utf-8"))
+
+    chunk = []
+    for kind, value in content.items:
+        r += 1
+        if kind == "penggolongan":
+            xml, is_string = _cell(f"B{r}", value, STYLE_BOLD, shared)
+            chunk.append(f'<row r="{r}">{xml}</row>')
+            merges.append(f"B{r}:{letters[-1]}{r}")
+            string_cells += is_string
+        else:
+            cells = []
+            for i, (letter, cell_value) in enumerate(zip(letters, value)):
+                xml, is_string = _cell(f"{letter}{r}", cell_value, STYLE_CENTER if i == 0 else STYLE_DEFAULT, shared)
+                cells.append(xml)
+                string_cells += is_string
+            chunk.append(f'<row r="{r}">{"".join(cells)}</row>')
+        if len(chunk) >= 256:
+            f.write("".join(chunk).encode("utf-8"))
+            chunk = []
+    f.write("".join(chunk).encode("utf-8"))
+    f.write(b"</sheetData>")
+
+    if merges:
+        f.write((f'<mergeCells count="{len(merges)}">' + "".join(f'<mergeCell ref="{m}"/>' for m in merges) + "</mergeCells>").encode("utf-8"))
+    f.write(b'<pageMargins left="0.75" right="0.75" top="1" bottom="1" header="0.5" footer="0.5"/></worksheet>')
+    return string_cells